@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Backend.settings')
 
 application = get_asgi_application()
+
+# Warm the in-memory building name index before the first request, see basic/autocomplete.py
+from basic.autocomplete import autocomplete # noqa: E402 (needs the apps loaded above)
+autocomplete.preload()
@@ -78,6 +78,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Transactions take the write lock when they start, so bookings
+            # (Reservation.save) check for overlaps one at a time
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20, # Seconds to wait for the lock before "database is locked"
+        },
     }
 }
 
@@ -122,3 +128,70 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Geocoding
+# Geocoders are tried in order, the first one that finds the address wins.
+# Results are cached in the database (basic.GeocodeCache)
+
+GEOCODER_PROVIDERS = [
+    'basic.geocoding.GazetteerGeocoder', # Local building list, only used when GEOCODER_GAZETTEER_PATH is set
+    'basic.geocoding.GeoDataGeocoder', # geodata.gov.hk, over the network
+]
+
+GEOCODER_GAZETTEER_PATH = None # CSV with name,easting,northing columns (HK1980 grid)
+
+GEOCODE_CACHE_TTL = 60 * 60 * 24 * 30 # Seconds before a cached address is looked up again
+
+GEOCODE_CACHE_MAX_ENTRIES = 10000 # Least recently used entries are evicted beyond this
+
+GEOCODE_ASYNC = False # Save accommodations immediately and geocode them with `manage.py geocode_worker`
+
+GEOCODE_JOB_MAX_ATTEMPTS = 5 # Background lookups before an accommodation is marked as failed
+
+GEOCODE_JOB_RETRY_DELAY = 30 # Seconds before the first retry, doubled after every failed attempt
+
+# Email notifications
+# Queued in the basic.NotificationOutbox table with the change they report and
+# sent by `manage.py send_notifications`, see basic/notifications.py
+
+NOTIFICATION_MAX_ATTEMPTS = 5 # Failed sends before a message is dead-lettered
+
+NOTIFICATION_RETRY_DELAY = 60 # Seconds before the first retry, doubled after every failed attempt
+
+# Django REST Framework
+# Every list endpoint is paginated with a keyset cursor, see basic/pagination.py
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'basic.pagination.KeysetPagination',
+    'PAGE_SIZE': 20, # Clients can ask for up to KeysetPagination.max_page_size with ?page_size=
+    'DEFAULT_RENDERER_CLASSES': [
+        'basic.renderers.FastJSONRenderer', # Same output as JSONRenderer, rendered with orjson when installed
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+FAST_LIST_RESPONSES = True # Serve list endpoints from .values() rows instead of model instances, see basic/fastpath.py
+
+# Conditional GET
+# Accommodation, reservation and rating responses carry ETag / Last-Modified
+# headers from version stamps bumped on every write (see basic/versions.py).
+# Rendered responses are cached under their ETag in the RESPONSE_CACHE cache.
+# The local memory cache is per process: use a shared backend such as Redis
+# or Memcached when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+RESPONSE_CACHE = 'default' # Cache alias for rendered responses, None to disable
+
+RESPONSE_CACHE_TIMEOUT = 300 # Seconds a rendered response is kept
+
+OCCUPANCY_MAX_ACCOMMODATIONS = 10000 # Accommodations whose bookings the calendar keeps in memory, see basic/occupancy.py
+
+AUTOCOMPLETE_REFRESH_INTERVAL = 10 # Seconds between checks for building names changed by other processes, see basic/autocomplete.py
+
+CATALOGUE_ENGINE = False # Answer ?active=true accommodation lists from typed arrays in memory, see basic/catalogue.py
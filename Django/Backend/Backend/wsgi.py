@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Backend.settings')
 
 application = get_wsgi_application()
+
+# Warm the in-memory building name index before the first request, see basic/autocomplete.py
+from basic.autocomplete import autocomplete # noqa: E402 (needs the apps loaded above)
+autocomplete.preload()
@@ -1,8 +1,12 @@
 from django.contrib import admin
-from .models import Accommodation, Member, Reservation, Rating
+from .models import Accommodation, Member, Reservation, Rating, GeocodeCache, Campus, CampusDistance, GeocodeJob
 
 # Register your models here to make them accessible in the Django admin interface
 admin.site.register(Accommodation)
 admin.site.register(Member)
 admin.site.register(Reservation)
-admin.site.register(Rating)
\ No newline at end of file
+admin.site.register(Rating)
+admin.site.register(GeocodeCache)
+admin.site.register(Campus)
+admin.site.register(CampusDistance)
+admin.site.register(GeocodeJob)
\ No newline at end of file
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BasicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'basic'
+
+    def ready(self):
+        from . import signals
+        signals.connect()
@@ -0,0 +1,277 @@
+"""
+In-memory autocomplete for building names.
+
+Every distinct Accommodation.building_name is kept in a NameIndex in each
+process: a prefix index over the name from the start of each of its words
+(so 'tin' finds "Sha Tin Point"), and a trigram index for misspellings
+('kenedy' finds "Kennedy Town Point"). A suggestion is answered from
+memory, without a query.
+
+The index is loaded on first use, or when the server starts (see wsgi.py
+and asgi.py), and changed in place when accommodations are created,
+renamed or deleted in this process (see signals.py). Those writes also
+bump the NAMES_KEY version stamp (see versions.py); every
+AUTOCOMPLETE_REFRESH_INTERVAL seconds a suggestion checks it and reloads
+the names when another process changed them.
+"""
+import bisect
+import heapq
+import math
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Count
+
+from .geocoding import normalize_address
+from .versions import bump, current_stamps
+
+DEFAULT_REFRESH_INTERVAL = 10 # Seconds between checks for names changed by other processes
+MAX_CACHED_SUGGESTIONS = 50 # Ranked names kept per prefix, the most a request can ask for
+MIN_SIMILARITY = 0.5 # Share of the input's trigrams a misspelled suggestion must contain
+MAX_CACHED_PREFIXES = 10000 # Prefixes whose best names are kept, all are dropped beyond this
+
+LAST_CHARACTER = chr(0x10ffff) # Sorts after anything a prefix can continue with
+
+NAMES_KEY = 'basic.accommodation.building_name'
+
+
+def normalize(name):
+    """
+    Case, accent, punctuation and whitespace insensitive form of a name.
+    """
+    name = normalize_address(name)
+    if name.isascii():
+        return name # Nothing to strip
+    name = unicodedata.normalize('NFKD', name)
+    return ''.join(char for char in name if not unicodedata.combining(char))
+
+
+def trigrams(text, partial=False):
+    """
+    Trigrams of each word padded with two spaces in front and one behind,
+    like PostgreSQL's pg_trgm. With partial the last word may be unfinished,
+    so it gets no trailing pad.
+    """
+    words = text.split()
+    found = set()
+    for i, word in enumerate(words):
+        padded = f'  {word}' if partial and i == len(words) - 1 else f'  {word} '
+        found.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return found
+
+
+class NameIndex:
+    """
+    Distinct names with the number of accommodations carrying each.
+    Not thread safe on its own, see Autocomplete.
+
+    The prefix trie is flattened into a sorted list of (key, name id): the
+    keys below a trie node, i.e. starting with a prefix, are one contiguous
+    slice found with two binary searches. The best names of each prefix
+    asked for are cached until the names change.
+    """
+
+    def __init__(self, counts=()):
+        self.names = [] # id -> name, None once removed
+        self.ids = {} # name -> id
+        self.counts = [] # id -> accommodations with the name
+        self.keys = [] # Sorted (key, id)
+        self.postings = {} # trigram -> ids
+        self.arrays = {} # trigram -> postings as an array, built on use
+        self.count_cache = None # counts as an array, built on use
+        self.best = {} # prefix -> best ids
+        for name, count in dict(counts).items():
+            self.add(name, count, sort=False)
+        self.keys.sort()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def name_keys(self, normalized):
+        """
+        The normalized name from the start of each of its words.
+        """
+        words = normalized.split()
+        return [' '.join(words[i:]) for i in range(len(words))]
+
+    def add(self, name, count=1, sort=True):
+        if not name:
+            return
+        self.best.clear() # Rankings depend on the counts
+        self.count_cache = None
+        if name in self.ids:
+            self.counts[self.ids[name]] += count
+            return
+        name_id = len(self.names)
+        self.names.append(name)
+        self.counts.append(count)
+        self.ids[name] = name_id
+        normalized = normalize(name)
+        for key in self.name_keys(normalized):
+            if sort:
+                bisect.insort(self.keys, (key, name_id))
+            else:
+                self.keys.append((key, name_id))
+        for trigram in trigrams(normalized):
+            self.postings.setdefault(trigram, set()).add(name_id)
+            self.arrays.pop(trigram, None)
+
+    def remove(self, name, count=1):
+        name_id = self.ids.get(name)
+        if name_id is None:
+            return
+        self.best.clear()
+        self.count_cache = None
+        self.counts[name_id] -= count
+        if self.counts[name_id] > 0:
+            return
+        del self.ids[name]
+        self.names[name_id] = None
+        normalized = normalize(name)
+        for key in self.name_keys(normalized):
+            del self.keys[bisect.bisect_left(self.keys, (key, name_id))]
+        for trigram in trigrams(normalized):
+            self.postings[trigram].discard(name_id)
+            self.arrays.pop(trigram, None)
+
+    def rank_key(self, name_id):
+        return (-self.counts[name_id], self.names[name_id])
+
+    def starting_with(self, prefix):
+        """
+        The best MAX_CACHED_SUGGESTIONS ids with a key starting with prefix,
+        most accommodations first.
+        """
+        best = self.best.get(prefix)
+        if best is None:
+            first = bisect.bisect_left(self.keys, (prefix,))
+            last = bisect.bisect_left(self.keys, (prefix + LAST_CHARACTER,), first)
+            ids = {name_id for _, name_id in self.keys[first:last]}
+            best = heapq.nsmallest(MAX_CACHED_SUGGESTIONS, ids, key=self.rank_key)
+            if len(self.best) >= MAX_CACHED_PREFIXES:
+                self.best.clear()
+            self.best[prefix] = best
+        return best
+
+    def suggest(self, text, limit=10):
+        """
+        Up to limit [(name, accommodations)]: names with a word starting with
+        text first, then names similar to it.
+        """
+        query = normalize(text)
+        if not query:
+            return []
+        chosen = self.starting_with(query)[:limit]
+        if len(chosen) < limit:
+            chosen += self.similar(query, limit - len(chosen), exclude=set(chosen))
+        return [(self.names[name_id], self.counts[name_id]) for name_id in chosen]
+
+    def posting_array(self, trigram):
+        array = self.arrays.get(trigram)
+        if array is None:
+            array = self.arrays[trigram] = np.fromiter(self.postings.get(trigram, ()), dtype=np.intp)
+        return array
+
+    def count_array(self):
+        if self.count_cache is None:
+            self.count_cache = np.array(self.counts, dtype=np.int64)
+        return self.count_cache
+
+    def similar(self, query, limit, exclude=()):
+        """
+        Ids of the names containing at least MIN_SIMILARITY of the trigrams
+        of query, the most similar first.
+        """
+        wanted = [self.posting_array(trigram) for trigram in trigrams(query, partial=True)]
+        needed = max(2, math.ceil(MIN_SIMILARITY * len(wanted)))
+        if len(wanted) < needed:
+            return []
+        # Counting in numpy: common trigrams are shared by thousands of names
+        hits = np.bincount(np.concatenate(wanted), minlength=len(self.names))
+        hits[list(exclude)] = 0
+        found = np.flatnonzero(hits >= needed)
+        if len(found) > limit:
+            # Keep the best limit by (hits, accommodations) and whatever ties with them
+            score = hits[found] * 2**32 + np.minimum(self.count_array()[found], 2**32 - 1)
+            found = found[score >= np.partition(score, len(score) - limit)[len(score) - limit]]
+        return heapq.nsmallest(limit, found.tolist(), key=lambda name_id: (-hits[name_id], *self.rank_key(name_id)))
+
+
+class Autocomplete:
+    """
+    The process wide NameIndex, loaded lazily and kept current.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.version = None # Of the NAMES_KEY stamp the index reflects
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def load(self):
+        from .models import Accommodation
+
+        stamp, = current_stamps([NAMES_KEY], ensure=[NAMES_KEY])
+        counts = Accommodation.objects.values_list('building_name').annotate(count=Count('pk')).order_by()
+        index = NameIndex(counts)
+        with self.lock:
+            self.index, self.version = index, stamp.version
+            self.checked_at = time.monotonic()
+
+    def preload(self):
+        """
+        Load at server start, unless the database is not ready (not migrated yet).
+        """
+        try:
+            self.load()
+        except DatabaseError:
+            pass
+
+    def clear(self):
+        with self.lock:
+            self.index = self.version = None
+
+    def suggest(self, text, limit=10):
+        interval = getattr(settings, 'AUTOCOMPLETE_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL)
+        if self.index is None:
+            self.load()
+        elif interval is not None and time.monotonic() - self.checked_at > interval:
+            self.checked_at = time.monotonic()
+            stamp, = current_stamps([NAMES_KEY])
+            if stamp is None or stamp.version != self.version:
+                self.load()
+        with self.lock:
+            return self.index.suggest(text, limit)
+
+    def changed(self, removed=(), added=()):
+        """
+        Record names removed from and added to accommodations (one entry per
+        accommodation). The index follows once the transaction commits.
+        """
+        removed, added = Counter(name for name in removed if name), Counter(name for name in added if name)
+        if not removed and not added:
+            return
+        bump(NAMES_KEY) # For the other processes
+        transaction.on_commit(lambda: self.apply(removed, added))
+
+    def apply(self, removed, added):
+        stamp, = current_stamps([NAMES_KEY])
+        with self.lock:
+            if self.index is None:
+                return # Not loaded yet, the changes are read with everything else
+            for name, count in removed.items():
+                self.index.remove(name, count)
+            for name, count in added.items():
+                self.index.add(name, count)
+            # Still current if only this change bumped the stamp, otherwise reloaded at the next check
+            if self.version is not None and stamp is not None and stamp.version == self.version + 1:
+                self.version = stamp.version
+
+
+autocomplete = Autocomplete()
@@ -0,0 +1,542 @@
+"""
+In-memory catalogue of the active accommodations.
+
+Almost every request reads a catalogue that changes a few hundred times a
+day. With CATALOGUE_ENGINE on, each process keeps the active accommodations
+as typed NumPy arrays, one per serialized field, instead of model
+instances: numbers and booleans as they are, prices as integer cents, dates
+as day numbers and text dictionary encoded (int32 codes into the list of
+distinct strings). AccommodationViewSet.list() answers ?active=true
+requests from it. Filters are vectorized comparisons, each ordering is a
+permutation of the rows computed once, and only the rows of the page are
+turned into the dicts the .values() fast path reads, so the response is the
+same to the byte. Whatever it cannot reproduce exactly (?search=, a campus
+without a distance column, a cursor holding unexpected types) is left to
+the ORM.
+
+Every write to an accommodation is logged in CatalogueChange, whose ids
+count the changes: record_changes() is called right before the version
+stamps are bumped. The list's ETag already looks up the accommodation
+collection stamp; while it is the one the catalogue was built at no other
+query is made. When it moved, the catalogue reads the changes logged since
+and re-reads just those rows into a copy of the arrays. Only a write that
+may touch every row (a campus moving) or falling more than
+MAX_LOGGED_CHANGES behind reloads everything.
+
+Text is ordered by code point, like SQLite's default BINARY collation.
+`python manage.py check_catalogue` compares the catalogue with the ORM, row
+by row and request by request, and reports its memory use.
+"""
+import bisect
+import datetime
+import sys
+import threading
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import Max
+
+from .distances import LEGACY_DISTANCE_FIELDS
+from .facets import CATEGORICAL_FACETS
+from .versions import collection_key, current_stamps
+
+MAX_LOGGED_CHANGES = 10000 # Changes kept in CatalogueChange, a catalogue further behind reloads everything
+
+EPOCH = datetime.date(1970, 1, 1)
+
+# ListFilterSerializer fields matching() knows how to apply
+FILTERS = {'active', 'min_price', 'max_price', 'campus', 'max_distance', 'ordering', *CATEGORICAL_FACETS}
+
+
+def enabled():
+    return getattr(settings, 'CATALOGUE_ENGINE', False)
+
+
+def record_changes(pks=None):
+    """
+    Log writes to the accommodations with these pks (None: possibly to all
+    of them). Called before their version stamps are bumped, so a process
+    seeing the new stamp also sees the change.
+    """
+    from .models import CatalogueChange
+
+    if not enabled():
+        return
+    pks = None if pks is None else list(dict.fromkeys(pks))
+    if pks is not None and not pks:
+        return
+    if pks is None or None in pks or len(pks) > MAX_LOGGED_CHANGES:
+        changes = [CatalogueChange()] # Everything is reloaded anyway
+    else:
+        changes = [CatalogueChange(accommodation_id=pk) for pk in pks]
+    CatalogueChange.objects.bulk_create(changes)
+    newest = changes[-1].pk or CatalogueChange.objects.aggregate(newest=Max('pk'))['newest']
+    CatalogueChange.objects.filter(pk__lte=newest - MAX_LOGGED_CHANGES).delete()
+
+
+def isin(array, values):
+    """
+    np.isin(), which sorts for every call, is slower than a few comparisons.
+    """
+    if len(values) > 8:
+        return np.isin(array, values)
+    found = np.zeros(len(array), dtype=bool)
+    for value in values:
+        found |= array == value
+    return found
+
+
+class Unsupported(Exception):
+    """
+    A request the catalogue cannot answer exactly, left to the ORM.
+    """
+
+
+class NumberColumn:
+    """
+    Integers, floats or booleans. Floats keep None as NaN, the others in a
+    null mask.
+    """
+
+    def __init__(self, array, nulls=None):
+        self.array = array
+        self.nulls = nulls # Boolean mask, None when nothing is null
+
+    @classmethod
+    def build(cls, values, dtype):
+        if np.dtype(dtype).kind == 'f':
+            return cls(np.array(values, dtype=dtype))
+        if None not in values:
+            return cls(np.array(values, dtype=dtype))
+        nulls = np.array([value is None for value in values])
+        return cls(np.array([0 if value is None else value for value in values], dtype=dtype), nulls)
+
+    def __len__(self):
+        return len(self.array)
+
+    @property
+    def nbytes(self):
+        return self.array.nbytes + (self.nulls.nbytes if self.nulls is not None else 0)
+
+    def take(self, rows):
+        return type(self)(self.array[rows], self.nulls[rows] if self.nulls is not None else None)
+
+    def concat(self, other):
+        nulls = None
+        if self.nulls is not None or other.nulls is not None:
+            nulls = np.concatenate([column.null_mask() for column in (self, other)])
+        return type(self)(np.concatenate([self.array, other.array]), nulls)
+
+    def null_mask(self):
+        if self.nulls is not None:
+            return self.nulls
+        if self.array.dtype.kind == 'f':
+            return np.isnan(self.array)
+        return np.zeros(len(self.array), dtype=bool)
+
+    def python(self, rows):
+        """
+        The values of rows as .values() returns them.
+        """
+        values = self.to_python(self.array[rows].tolist())
+        if self.array.dtype.kind == 'f':
+            return [None if value != value else value for value in values] # NaN
+        if self.nulls is not None:
+            return [None if null else value for value, null in zip(values, self.nulls[rows].tolist())]
+        return values
+
+    def to_python(self, values):
+        return values
+
+    def key(self):
+        """
+        Numbers ordered like the values, for sorting.
+        """
+        if self.nulls is not None or (self.array.dtype.kind == 'f' and np.isnan(self.array).any()):
+            raise Unsupported("NULLs cannot be paginated over")
+        return self.array
+
+    def parse(self, value):
+        """
+        value (from a filter or a cursor) in the terms of key(), if it is of
+        the type this column holds.
+        """
+        kind = self.array.dtype.kind
+        if isinstance(value, bool) != (kind == 'b') or not isinstance(value, int if kind in 'bi' else (int, float)):
+            raise Unsupported(value)
+        return value
+
+    def compare(self, value):
+        """
+        (rows below value, rows equal to value), in the terms of parse().
+        """
+        below, equal = self.array < value, self.array == value
+        if self.nulls is not None:
+            below &= ~self.nulls
+            equal &= ~self.nulls
+        return below, equal
+
+    def isin(self, values):
+        found = isin(self.array, [self.parse(value) for value in values])
+        return found & ~self.nulls if self.nulls is not None else found
+
+
+class DecimalColumn(NumberColumn):
+    """
+    Decimals with PLACES decimal places as integers, e.g. cents.
+    """
+    PLACES = 2
+
+    @classmethod
+    def build(cls, values, dtype):
+        return super().build([None if value is None else int(value.scaleb(cls.PLACES)) for value in values], dtype)
+
+    def to_python(self, values):
+        return [Decimal(value).scaleb(-self.PLACES) for value in values]
+
+    def parse(self, value):
+        if isinstance(value, bool) or not isinstance(value, (Decimal, str)):
+            raise Unsupported(value)
+        try:
+            scaled = Decimal(value).scaleb(self.PLACES)
+        except InvalidOperation:
+            raise Unsupported(value)
+        if not scaled.is_finite() or scaled != scaled.to_integral_value():
+            raise Unsupported(value)
+        return int(scaled)
+
+
+class DateColumn(NumberColumn):
+    """
+    Dates as days since 1970-01-01.
+    """
+
+    @classmethod
+    def build(cls, values, dtype):
+        return super().build([None if value is None else (value - EPOCH).days for value in values], dtype)
+
+    def to_python(self, values):
+        return [EPOCH + datetime.timedelta(days=value) for value in values]
+
+    def parse(self, value):
+        if isinstance(value, str) and len(value) == 10:
+            try:
+                value = datetime.date.fromisoformat(value)
+            except ValueError:
+                raise Unsupported(value)
+        if type(value) is not datetime.date:
+            raise Unsupported(value)
+        return (value - EPOCH).days
+
+
+class TextColumn:
+    """
+    Strings as int32 codes into values (-1: None). Columns taken from one
+    another share values and lookup, which are never changed in place.
+    """
+
+    def __init__(self, codes, values, lookup, ranks=None):
+        self.codes = codes
+        self.values = values # Code -> string
+        self.lookup = lookup # String -> code
+        self.ranks = ranks # (rank of each code, values sorted), computed when first needed
+
+    @classmethod
+    def build(cls, values, dtype=None):
+        lookup = {}
+        codes = np.array([-1 if value is None else lookup.setdefault(value, len(lookup)) for value in values], dtype=np.int32)
+        return cls(codes, list(lookup), lookup)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        strings = sum(sys.getsizeof(value) for value in self.values)
+        return self.codes.nbytes + strings + sys.getsizeof(self.values) + sys.getsizeof(self.lookup)
+
+    def take(self, rows):
+        return TextColumn(self.codes[rows], self.values, self.lookup, self.ranks)
+
+    def concat(self, other):
+        values, lookup, ranks = self.values, self.lookup, self.ranks
+        added = [value for value in other.values if value not in lookup]
+        if added:
+            values, lookup, ranks = values + added, dict(lookup), None
+            for value in added:
+                lookup[value] = len(lookup)
+        recode = np.array([lookup[value] for value in other.values] + [-1], dtype=np.int32) # [-1] keeps None
+        return TextColumn(np.concatenate([self.codes, recode[other.codes]]), values, lookup, ranks)
+
+    def python(self, rows):
+        values = self.values
+        return [values[code] if code >= 0 else None for code in self.codes[rows].tolist()]
+
+    def sorted_values(self):
+        if self.ranks is None:
+            order = sorted(range(len(self.values)), key=self.values.__getitem__)
+            ranks = np.empty(len(order), dtype=np.int32)
+            ranks[order] = np.arange(len(order), dtype=np.int32)
+            self.ranks = ranks, [self.values[code] for code in order]
+        return self.ranks
+
+    def key(self):
+        if (self.codes < 0).any():
+            raise Unsupported("NULLs cannot be paginated over")
+        ranks, _ = self.sorted_values()
+        return ranks[self.codes]
+
+    def parse(self, value):
+        if not isinstance(value, str):
+            raise Unsupported(value)
+        _, ordered = self.sorted_values()
+        return bisect.bisect_left(ordered, value), bisect.bisect_right(ordered, value)
+
+    def compare(self, value):
+        first, after = value # Ranks of value, or where it would go
+        key = self.key()
+        return key < first, (key >= first) & (key < after)
+
+    def isin(self, values):
+        return isin(self.codes, [self.lookup[value] for value in values if value in self.lookup])
+
+
+def column_type(field):
+    """
+    (column class, dtype) holding a model field, None if none can.
+    """
+    if isinstance(field, (models.CharField, models.TextField)):
+        return TextColumn, None
+    if isinstance(field, models.DecimalField):
+        return (DecimalColumn, np.int64) if field.decimal_places == DecimalColumn.PLACES else None
+    if isinstance(field, models.DateTimeField):
+        return None
+    if isinstance(field, models.DateField):
+        return DateColumn, np.int32
+    if isinstance(field, models.BooleanField):
+        return NumberColumn, np.bool_
+    if isinstance(field, models.FloatField):
+        return NumberColumn, np.float64
+    if isinstance(field, models.BigIntegerField): # Includes BigAutoField
+        return NumberColumn, np.int64
+    if isinstance(field, models.IntegerField):
+        return NumberColumn, np.int32
+    return None
+
+
+def catalogue_fields():
+    """
+    {field name: (column class, dtype)} of the serialized accommodation fields a column can hold.
+    """
+    from .models import Accommodation
+    from .serializers import AccommodationSerializer
+
+    fields = {}
+    for serializer_field in AccommodationSerializer().fields.values():
+        try:
+            field = Accommodation._meta.get_field(serializer_field.source)
+        except FieldDoesNotExist:
+            continue
+        if column_type(field) is not None:
+            fields[field.attname] = column_type(field)
+    return fields
+
+
+class Catalogue:
+    """
+    Columns of the active accommodations, row i of each being the same
+    accommodation. Never changed once built: refreshes make a new one.
+    """
+
+    def __init__(self, columns, version=None, change_id=0):
+        self.columns = columns # Field name -> column, 'id' included
+        self.version = version # (version, updated_at) of the accommodation collection stamp
+        self.change_id = change_id # Newest CatalogueChange included
+        self.permutations = {} # Ordering -> rows in that order
+
+    @classmethod
+    def load(cls, queryset, version=None, change_id=0):
+        fields = catalogue_fields()
+        rows = list(queryset.order_by().values_list(*fields))
+        columns = {}
+        for (name, (column_class, dtype)), values in zip(fields.items(), zip(*rows) if rows else [()] * len(fields)):
+            columns[name] = column_class.build(list(values), dtype)
+        return cls(columns, version, change_id)
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def replace(self, pks, fresh, version, change_id):
+        """
+        A new catalogue with the rows of pks replaced by those of fresh.
+        """
+        keep = ~np.isin(self.columns['id'].array, list(pks))
+        columns = {name: column.take(keep).concat(fresh.columns[name]) for name, column in self.columns.items()}
+        return Catalogue(columns, version, change_id)
+
+    def column(self, name):
+        try:
+            return self.columns['id' if name == 'pk' else name]
+        except KeyError:
+            raise Unsupported(name)
+
+    def matching(self, filters):
+        """
+        Boolean mask of the rows matching the ListFilterSerializer filters,
+        applied as FacetedSearch does.
+        """
+        unknown = {name for name, value in filters.items() if value not in (None, [])} - FILTERS
+        if filters.get('active') is not True or unknown:
+            raise Unsupported(unknown or 'active') # Only active rows are held
+        mask = np.ones(len(self), dtype=bool)
+        for name in CATEGORICAL_FACETS:
+            if filters.get(name):
+                mask &= self.column(name).isin(filters[name])
+        price = self.column('price_per_month')
+        if filters.get('min_price') is not None:
+            below, _ = price.compare(price.parse(filters['min_price']))
+            mask &= ~below
+        if filters.get('max_price') is not None:
+            below, _ = price.compare(price.parse(filters['max_price']))
+            mask &= below
+        if filters.get('max_distance') is not None:
+            campus = filters.get('campus')
+            field = LEGACY_DISTANCE_FIELDS.get(campus.code if campus is not None else 'HKU')
+            if field is None:
+                raise Unsupported(campus.code) # Distances in CampusDistance only
+            below, equal = self.column(field).compare(float(filters['max_distance']))
+            mask &= below | equal
+        return mask
+
+    def permutation(self, ordering):
+        """
+        Row numbers in ordering (a keyset ordering, its last field unique).
+        """
+        flipped = tuple(name[1:] if name.startswith('-') else '-' + name for name in ordering)
+        if tuple(ordering) not in self.permutations and flipped in self.permutations:
+            return self.permutations[flipped][::-1]
+        if tuple(ordering) not in self.permutations:
+            keys = []
+            for name in ordering:
+                key = self.column(name.lstrip('-')).key()
+                if name.startswith('-'):
+                    key = -key if key.dtype.kind == 'f' else -key.astype(np.int64)
+                keys.append(key)
+            self.permutations[tuple(ordering)] = np.lexsort(keys[::-1])
+        return self.permutations[tuple(ordering)]
+
+    def after(self, ordering, position):
+        """
+        Boolean mask of the rows after position in ordering, the comparison
+        KeysetPagination.after() makes in SQL.
+        """
+        found = np.zeros(len(self), dtype=bool)
+        equal_so_far = np.ones(len(self), dtype=bool)
+        for name, value in zip(ordering, position):
+            column = self.column(name.lstrip('-'))
+            below, equal = column.compare(column.parse(value))
+            found |= equal_so_far & (below if name.startswith('-') else ~below & ~equal)
+            equal_so_far &= equal
+        return found
+
+    def fetch(self, mask, names, ordering, position, limit):
+        """
+        The first limit rows of mask after position in ordering, as
+        .values(*names) dicts.
+        """
+        names = list(dict.fromkeys(names))
+        columns = [self.column(name) for name in names]
+        order = self.permutation(ordering)
+        if position is not None:
+            mask = mask & self.after(ordering, position)
+        rows = order[mask[order]][:limit]
+        return [dict(zip(names, values)) for values in zip(*(column.python(rows) for column in columns))]
+
+    def differences(self, queryset):
+        """
+        [(pk, field, held value, database value)] wherever the catalogue and
+        the rows of queryset (the active accommodations) disagree.
+        """
+        names = list(self.columns)
+        database = {row['id']: row for row in queryset.order_by().values(*names)}
+        found = []
+        held = self.fetch(np.ones(len(self), dtype=bool), names, ('pk',), None, len(self))
+        for row in held:
+            expected = database.pop(row['id'], None)
+            if expected is None:
+                found.append((row['id'], None, 'held', 'missing'))
+                continue
+            found.extend((row['id'], name, row[name], expected[name]) for name in names if row[name] != expected[name])
+        found.extend((pk, None, 'missing', 'present') for pk in database)
+        return found
+
+
+class CatalogueEngine:
+    """
+    The process wide Catalogue, kept current with the change log.
+    """
+
+    def __init__(self):
+        self.catalogue = None
+        self.lock = threading.Lock()
+
+    def current(self, stamp=None):
+        """
+        The catalogue as of the accommodation collection stamp (looked up
+        if not given): no query while nothing changed.
+        """
+        from .models import Accommodation
+
+        if stamp is None:
+            key = collection_key(Accommodation)
+            stamp, = current_stamps([key], ensure=[key])
+        version = (stamp.version, stamp.updated_at)
+        catalogue = self.catalogue
+        if catalogue is not None and catalogue.version == version:
+            return catalogue
+        with self.lock:
+            if self.catalogue is None:
+                self.catalogue = self.load(version)
+            elif self.catalogue.version != version:
+                self.catalogue = self.refresh(self.catalogue, version)
+            return self.catalogue
+
+    def load(self, version):
+        from .models import Accommodation, CatalogueChange
+
+        # Read first: changes logged while loading are applied again later
+        change_id = CatalogueChange.objects.aggregate(newest=Max('pk'))['newest'] or 0
+        return Catalogue.load(Accommodation.objects.filter(active=True), version, change_id)
+
+    def refresh(self, catalogue, version):
+        """
+        Apply the changes logged since catalogue was built.
+        """
+        from .models import Accommodation, CatalogueChange
+
+        changes = list(CatalogueChange.objects.filter(pk__gt=catalogue.change_id).order_by('pk').values_list('pk', 'accommodation_id'))
+        if not changes:
+            unchanged = Catalogue(catalogue.columns, version, catalogue.change_id)
+            unchanged.permutations = catalogue.permutations # Same rows
+            return unchanged
+        newest = changes[-1][0]
+        pks = {pk for _, pk in changes}
+        # Logged changes are only pruned MAX_LOGGED_CHANGES behind the newest
+        if None in pks or newest - MAX_LOGGED_CHANGES > catalogue.change_id:
+            return self.load(version)
+        fresh = Catalogue.load(Accommodation.objects.filter(active=True, pk__in=pks))
+        return catalogue.replace(pks, fresh, version, newest)
+
+    def clear(self):
+        with self.lock:
+            self.catalogue = None
+
+
+engine = CatalogueEngine()
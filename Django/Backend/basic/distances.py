@@ -0,0 +1,139 @@
+"""
+Distance calculations between accommodations and campuses.
+
+Campuses live in the Campus table and the distance from every geocoded
+accommodation to every campus is stored in CampusDistance. The seven
+original campuses also keep their dedicated distance_to_* columns on
+Accommodation, see LEGACY_DISTANCE_FIELDS.
+"""
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from .versions import bump_all
+
+EARTH_RADIUS_KM = 6371
+
+# Campus code -> Accommodation column that mirrors its distance
+LEGACY_DISTANCE_FIELDS = {
+    'HKU': 'distance_to_HKUcampus',
+    'HKU_sassoon': 'distance_to_HKUcampus_sassoon',
+    'HKU_swire': 'distance_to_HKUcampus_swire',
+    'HKU_kadoorie': 'distance_to_HKUcampus_kadoorie',
+    'HKU_dentistry': 'distance_to_HKUcampus_dentistry',
+    'CUHK': 'distance_to_CUHKcampus',
+    'HKUST': 'distance_to_HKUSTcampus',
+}
+
+# Rows written per executemany() call when rebuilding a campus
+INSERT_BATCH_SIZE = 5000
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km. Works on scalars and on NumPy arrays,
+    broadcasting like any other NumPy expression.
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = np.radians(np.subtract(lat2, lat1))
+    delta_lambda = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def round_sig(values, digits=4):
+    """
+    Round to a number of significant digits, the vectorized equivalent of
+    float('{:.4g}'.format(value)) which the distance fields have always used.
+    The two can only disagree on values lying exactly on a rounding boundary.
+    """
+    values = np.asarray(values, dtype=float)
+    with np.errstate(divide='ignore'):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    magnitude = np.where(np.isfinite(magnitude), magnitude, 0)
+    scale = 10.0 ** (digits - 1 - magnitude)
+    return np.round(values * scale) / scale
+
+
+def distances_from(latitude, longitude, campuses):
+    """
+    Return {campus: distance in km} from one point to each of the given campuses.
+    """
+    campuses = list(campuses)
+    if not campuses:
+        return {}
+    lats = np.array([campus.latitude for campus in campuses])
+    lons = np.array([campus.longitude for campus in campuses])
+    distances = round_sig(haversine(latitude, longitude, lats, lons))
+    return {campus: float(distance) for campus, distance in zip(campuses, distances)}
+
+
+def distance_matrix(latitudes, longitudes, campuses):
+    """
+    Return an (accommodations x campuses) array of rounded distances in km.
+    """
+    lats = np.asarray(latitudes, dtype=float)[:, np.newaxis]
+    lons = np.asarray(longitudes, dtype=float)[:, np.newaxis]
+    campus_lats = np.array([campus.latitude for campus in campuses], dtype=float)[np.newaxis, :]
+    campus_lons = np.array([campus.longitude for campus in campuses], dtype=float)[np.newaxis, :]
+    return round_sig(haversine(lats, lons, campus_lats, campus_lons))
+
+
+def insert_distances(rows):
+    """
+    Insert (accommodation_id, campus_id, distance) tuples into CampusDistance.
+    Plain executemany() is used because building 100k model instances for
+    bulk_create() costs far more than computing the distances.
+    """
+    from .models import CampusDistance
+
+    table = connection.ops.quote_name(CampusDistance._meta.db_table)
+    columns = ', '.join(
+        connection.ops.quote_name(CampusDistance._meta.get_field(name).column)
+        for name in ('accommodation', 'campus', 'distance')
+    )
+    sql = f"INSERT INTO {table} ({columns}) VALUES (%s, %s, %s)"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            cursor.executemany(sql, rows[start:start + INSERT_BATCH_SIZE])
+
+
+def recompute_campus_distances(campus):
+    """
+    Recompute the distance from every geocoded accommodation to one campus,
+    using the stored coordinates (no geocoding). Returns the number of rows written.
+    """
+    from .catalogue import record_changes # catalogue imports this module
+    from .models import Accommodation, CampusDistance
+
+    located = Accommodation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    rows = list(located.values_list('pk', 'latitude', 'longitude'))
+    with transaction.atomic():
+        CampusDistance.objects.filter(campus=campus).delete()
+        if rows:
+            ids, lats, lons = (np.array(column) for column in zip(*rows))
+            distances = round_sig(haversine(lats, lons, campus.latitude, campus.longitude))
+            insert_distances(list(zip(ids.tolist(), [campus.pk] * len(ids), distances.tolist())))
+
+        legacy_field = LEGACY_DISTANCE_FIELDS.get(campus.code)
+        if legacy_field:
+            # Copy the new distances into the mirrored column in a single UPDATE
+            distance = CampusDistance.objects.filter(accommodation=OuterRef('pk'), campus=campus).values('distance')[:1]
+            located.update(**{legacy_field: Subquery(distance)})
+            record_changes() # Reload everything
+            bump_all(Accommodation) # Every serialized accommodation may have changed
+    return len(rows)
+
+
+def store_accommodation_distances(accommodation, distances):
+    """
+    Replace the CampusDistance rows of one accommodation with {campus: km}.
+    """
+    from .models import CampusDistance
+
+    CampusDistance.objects.filter(accommodation=accommodation).delete()
+    CampusDistance.objects.bulk_create([
+        CampusDistance(accommodation=accommodation, campus=campus, distance=distance)
+        for campus, distance in distances.items()
+    ])
@@ -0,0 +1,132 @@
+"""
+Faceted search over accommodations.
+
+A faceted search returns the accommodations matching every selected filter
+and, for each filter, the number of results each of its options would
+give, so a client can grey out the options that would leave nothing. As
+usual for facets the counts of one filter apply all the other filters but
+not its own selection: picking 'Studio' does not turn the other types'
+counts into 0.
+
+Counting every option with its own COUNT would be a query per option.
+Here each categorical facet is one GROUP BY, and the price ranges, the
+distance steps and the total are conditional counts of a single aggregate.
+The type, beds and manager GROUP BYs are read in order from covering
+indexes led by their column (the accom_*_facet_idx indexes), which also
+hold the distance to the default HKU campus; no_of_bedrooms, for which an
+index did not pay off, scans the table, as does any distance to another
+campus.
+"""
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Value
+
+from .distances import LEGACY_DISTANCE_FIELDS
+
+# Facets counted per stored value
+CATEGORICAL_FACETS = ('type_of_accommodation', 'number_of_beds', 'no_of_bedrooms', 'managed_by')
+
+# Price facet options, min included and max excluded (None: unbounded)
+PRICE_RANGES = ((None, 3000), (3000, 5000), (5000, 8000), (8000, 12000), (12000, None))
+
+# Distance facet options: km from the campus
+DISTANCE_STEPS = (1, 2, 5, 10)
+
+MAX_FACET_VALUES = 100 # Values listed per categorical facet, the ones with the most results
+
+
+def distance_expression(campus):
+    """
+    Distance in km to campus (None: the default HKU campus) of each row.
+    """
+    from .models import CampusDistance
+
+    code = campus.code if campus is not None else 'HKU'
+    if code in LEGACY_DISTANCE_FIELDS:
+        return F(LEGACY_DISTANCE_FIELDS[code])
+    return Subquery(CampusDistance.objects.filter(accommodation=OuterRef('pk'), campus=campus).values('distance'))
+
+
+def price_condition(low, high):
+    # SQLite gets decimals as text and would convert the bound again for every row compared
+    condition = Q()
+    if low is not None:
+        condition &= Q(price_per_month__gte=Value(float(low), output_field=FloatField()))
+    if high is not None:
+        condition &= Q(price_per_month__lt=Value(float(high), output_field=FloatField()))
+    return condition
+
+
+def count_where(condition):
+    return Count('pk', filter=condition or None)
+
+
+class FacetedSearch:
+    """
+    The selected filters (FacetFilterSerializer data) applied to queryset.
+    The ordering is dropped, the rows are counted or paginated.
+    """
+
+    def __init__(self, queryset, filters):
+        self.queryset = queryset.alias(campus_distance=distance_expression(filters.get('campus'))).order_by()
+        self.filters = filters
+        self.conditions = {} # Facet -> condition of its selection
+        for name in CATEGORICAL_FACETS:
+            if filters.get(name):
+                self.conditions[name] = Q(**{f'{name}__in': filters[name]})
+        price = price_condition(filters.get('min_price'), filters.get('max_price'))
+        if price:
+            self.conditions['price_per_month'] = price
+        if filters.get('max_distance') is not None:
+            self.conditions['distance'] = Q(campus_distance__lte=filters['max_distance'])
+
+    def condition(self, exclude=()):
+        """
+        The conditions of every selection but those of the facets in exclude.
+        """
+        condition = Q()
+        for name, selected in self.conditions.items():
+            if name not in exclude:
+                condition &= selected
+        return condition
+
+    def results(self):
+        """
+        The rows matching every selection.
+        """
+        return self.queryset.filter(self.condition())
+
+    def counts(self):
+        """
+        Return (number of results, {facet: options with their counts}).
+        """
+        price = self.conditions.get('price_per_month', Q())
+        distance = self.conditions.get('distance', Q())
+        aggregates = {'total': count_where(price & distance)}
+        for i, (low, high) in enumerate(PRICE_RANGES):
+            aggregates[f'price_{i}'] = count_where(price_condition(low, high) & distance)
+        for i, step in enumerate(DISTANCE_STEPS):
+            aggregates[f'distance_{i}'] = count_where(Q(campus_distance__lte=step) & price)
+        found = self.queryset.filter(self.condition(exclude=('price_per_month', 'distance'))).aggregate(**aggregates)
+
+        facets = {name: self.value_counts(name) for name in CATEGORICAL_FACETS}
+        facets['price_per_month'] = [
+            {'min': low, 'max': high, 'count': found[f'price_{i}']} for i, (low, high) in enumerate(PRICE_RANGES)
+        ]
+        facets['distance'] = [
+            {'max_distance': step, 'count': found[f'distance_{i}']} for i, step in enumerate(DISTANCE_STEPS)
+        ]
+        return found['total'], facets
+
+    def value_counts(self, name):
+        """
+        [{'value', 'count'}] of a categorical facet ordered by value. Selected
+        values are always listed, with a count of 0 if nothing has them.
+        """
+        rows = self.queryset.filter(self.condition(exclude=(name,))).values_list(name).annotate(count=Count('pk'))
+        counts = dict(rows)
+        for value in self.filters.get(name, ()):
+            counts.setdefault(value, 0)
+        if len(counts) > MAX_FACET_VALUES:
+            selected = set(self.filters.get(name, ()))
+            kept = sorted(counts, key=lambda value: (value not in selected, -counts[value]))[:max(MAX_FACET_VALUES, len(selected))]
+            counts = {value: counts[value] for value in kept}
+        return [{'value': value, 'count': counts[value]} for value in sorted(counts)]
@@ -0,0 +1,144 @@
+"""
+Fast read path for list endpoints.
+
+Serializing a page through a ModelSerializer builds a model instance per
+row and calls every field's to_representation(). For plain columns that is
+wasted work: the database already returns the final value. ValuesSerializer
+reads .values() rows instead and only converts the columns whose JSON form
+differs from the Python value (decimals, dates), producing exactly the
+dicts the ModelSerializer would. Rendering is left to the configured
+renderer, see renderers.FastJSONRenderer.
+
+FastListMixin uses it for list() and for custom actions that call
+paginated_response(), when FAST_LIST_RESPONSES is on (the default) and the
+response is JSON. The browsable API and serializers with fields it cannot
+read from .values() (nested serializers, method fields, dotted sources) use
+the normal path.
+"""
+import datetime
+import decimal
+
+from django.conf import settings
+from rest_framework import ISO_8601, serializers, relations
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Serializer fields whose representation is the database value itself
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField, # Includes EmailField, SlugField, ...
+    serializers.ChoiceField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    relations.PrimaryKeyRelatedField,
+)
+
+
+def converter_for(field):
+    """
+    Return a function turning a database value into field.to_representation()'s
+    result, or None when the value is already the representation.
+    """
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        return field.pk_field.to_representation if field.pk_field is not None else None
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    if isinstance(field, serializers.DecimalField) and field.decimal_places is not None:
+        coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if coerce_to_string and not field.localize and not field.normalize_output:
+            # Columns come back with decimal_places digits already, so this is exact
+            exponent = decimal.Decimal(1).scaleb(-field.decimal_places)
+            return lambda value: format(value.quantize(exponent, rounding=field.rounding), 'f')
+    if type(field) is serializers.DateField:
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if output_format is not None and output_format.lower() == ISO_8601:
+            return datetime.date.isoformat
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Serialize .values() rows the way a ModelSerializer instance would
+    serialize the model instances.
+    """
+
+    def __init__(self, serializer):
+        self.columns = [] # (output name, values() key, converter or None)
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if not self.can_read(field):
+                raise ValueError(f"{type(serializer).__name__}.{name} cannot be read from values()")
+            self.columns.append((name, field.source, converter_for(field)))
+
+    @staticmethod
+    def can_read(field):
+        if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField, relations.ManyRelatedField)):
+            return False
+        if isinstance(field, relations.RelatedField) and not isinstance(field, relations.PrimaryKeyRelatedField):
+            return False
+        return field.source != '*' and '.' not in field.source
+
+    @classmethod
+    def supports(cls, serializer):
+        return all(field.write_only or cls.can_read(field) for field in serializer.fields.values())
+
+    @property
+    def sources(self):
+        return [source for _, source, _ in self.columns]
+
+    def to_representation(self, rows, extra=()):
+        """
+        Return a list of dicts, one per row. Names in extra (annotations)
+        are copied after the serializer fields.
+        """
+        columns = self.columns
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, convert in columns:
+                value = row[source]
+                item[name] = value if value is None or convert is None else convert(value)
+            for name in extra:
+                item[name] = row[name]
+            data.append(item)
+        return data
+
+
+class FastListMixin:
+    """
+    Viewset mixin serving paginated lists from .values() rows when possible.
+    """
+
+    def use_values_path(self, serializer):
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        return (
+            getattr(settings, 'FAST_LIST_RESPONSES', True)
+            and renderer is not None and renderer.format == 'json'
+            and ValuesSerializer.supports(serializer)
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.paginated_response(self.filter_queryset(self.get_queryset()))
+
+    def paginated_response(self, queryset, ordering=None, extra=()):
+        """
+        Paginate and serialize queryset. ordering overrides the view's
+        keyset_ordering; extra names annotations added to every item.
+        """
+        serializer = self.get_serializer()
+        if self.paginator is None:
+            return Response(self.get_serializer(queryset, many=True).data)
+        if not self.use_values_path(serializer):
+            page = self.paginator.paginate_queryset(queryset, self.request, view=self, ordering=ordering)
+            data = self.get_serializer(page, many=True).data
+            for item, obj in zip(data, page):
+                for name in extra:
+                    item[name] = getattr(obj, name)
+            return self.get_paginated_response(data)
+
+        values_serializer = ValuesSerializer(serializer)
+        keys = [field.lstrip('-') for field in ordering or getattr(self, 'keyset_ordering', ('pk',))]
+        names = dict.fromkeys([*values_serializer.sources, *keys, *extra])
+        rows = self.paginator.paginate_queryset(queryset.values(*names), self.request, view=self, ordering=ordering)
+        return self.get_paginated_response(values_serializer.to_representation(rows, extra))
@@ -0,0 +1,134 @@
+"""
+Database backed queue for resolving accommodation locations in the background.
+
+With GEOCODE_ASYNC enabled, Accommodation.save() does not wait for the
+GeoData API: the row is stored with geocode_status='pending' and a
+GeocodeJob is queued. The geocode_worker command picks up due jobs, resolves
+their buildings and fills in the coordinates and campus distances, retrying
+failed lookups with exponential backoff.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .distances import LEGACY_DISTANCE_FIELDS, distances_from, store_accommodation_distances
+from .geocoding import geocode_many, normalize_address
+from .spatial import grid_cell
+from .catalogue import record_changes
+from .versions import bump_objects
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_DELAY = 30 # Seconds before the first retry, doubled on every attempt
+MAX_RETRY_DELAY = 60 * 60
+
+# How long a worker owns a job it has picked up before others may retry it
+LEASE = datetime.timedelta(minutes=5)
+
+
+def enqueue_geocode(accommodation):
+    """
+    Queue (or re-queue) background geocoding for an accommodation.
+    """
+    from .models import GeocodeJob
+
+    GeocodeJob.objects.update_or_create(
+        accommodation=accommodation,
+        defaults={
+            'building_name': accommodation.building_name,
+            'attempts': 0,
+            'next_attempt_at': timezone.now(),
+            'last_error': '',
+        },
+    )
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'GEOCODE_JOB_RETRY_DELAY', DEFAULT_RETRY_DELAY)
+    return datetime.timedelta(seconds=min(base * 2 ** (attempts - 1), MAX_RETRY_DELAY))
+
+
+def process_geocode_jobs(batch_size=50, workers=8):
+    """
+    Process up to batch_size due jobs. Returns {'resolved': n, 'retried': n, 'failed': n}.
+    """
+    from .models import Campus, GeocodeJob
+
+    now = timezone.now()
+    due = GeocodeJob.objects.filter(next_attempt_at__lte=now).order_by('next_attempt_at')[:batch_size]
+    # Claim each job by pushing its next attempt out, so concurrent workers skip it
+    claimed = [
+        job for job in due
+        if GeocodeJob.objects.filter(pk=job.pk, next_attempt_at=job.next_attempt_at).update(next_attempt_at=now + LEASE)
+    ]
+    counts = {'resolved': 0, 'retried': 0, 'failed': 0}
+    if not claimed:
+        return counts
+
+    coordinates = geocode_many([job.building_name for job in claimed], max_workers=workers)
+    campuses = list(Campus.objects.all())
+    max_attempts = getattr(settings, 'GEOCODE_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    for job in claimed:
+        location = coordinates.get(normalize_address(job.building_name))
+        if location is not None:
+            _resolve(job, location, campuses)
+            counts['resolved'] += 1
+        elif job.attempts + 1 >= max_attempts:
+            _give_up(job, now)
+            counts['failed'] += 1
+        else:
+            _retry(job, now)
+            counts['retried'] += 1
+    return counts
+
+
+def _current(model, job, **lookups):
+    # Rows are matched on the queued building name, so a job that was
+    # re-queued for a new address in the meantime is left alone
+    return model.objects.filter(building_name=job.building_name, **lookups)
+
+
+def _resolve(job, location, campuses):
+    from .models import Accommodation, GeocodeJob
+
+    latitude, longitude = location
+    distances = distances_from(latitude, longitude, campuses)
+    values = {
+        'latitude': latitude, 'longitude': longitude,
+        'grid_cell': grid_cell(latitude, longitude), 'geocode_status': 'resolved',
+    }
+    for campus, distance in distances.items():
+        if campus.code in LEGACY_DISTANCE_FIELDS:
+            values[LEGACY_DISTANCE_FIELDS[campus.code]] = distance
+    with transaction.atomic():
+        if _current(Accommodation, job, pk=job.accommodation_id).update(**values):
+            store_accommodation_distances(Accommodation(pk=job.accommodation_id), distances)
+            record_changes([job.accommodation_id])
+            bump_objects(Accommodation, [job.accommodation_id]) # update() sends no post_save
+        _current(GeocodeJob, job, pk=job.pk).delete()
+
+
+def _retry(job, now):
+    from .models import GeocodeJob
+
+    attempts = job.attempts + 1
+    _current(GeocodeJob, job, pk=job.pk).update(
+        attempts=attempts,
+        next_attempt_at=now + retry_delay(attempts),
+        last_error=f"Could not find location for address: {job.building_name}",
+    )
+
+
+def _give_up(job, now):
+    from .models import Accommodation, GeocodeJob
+
+    with transaction.atomic():
+        _current(GeocodeJob, job, pk=job.pk).update(
+            attempts=job.attempts + 1,
+            next_attempt_at=None,
+            last_error=f"Could not find location for address: {job.building_name}",
+        )
+        if _current(Accommodation, job, pk=job.accommodation_id).update(geocode_status='failed'):
+            record_changes([job.accommodation_id])
+            bump_objects(Accommodation, [job.accommodation_id])
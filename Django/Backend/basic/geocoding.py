@@ -0,0 +1,413 @@
+"""
+Geocoding helpers used by the Accommodation model.
+
+Addresses are resolved by the geocoders listed in GEOCODER_PROVIDERS, tried
+in order: by default a local gazetteer of well-known buildings (when
+GEOCODER_GAZETTEER_PATH is set) and then the Hong Kong government's GeoData
+API. Results are cached in the GeocodeCache table keyed by the normalized address,
+so saving another flat in a building we have already seen does not need a
+network round trip.
+"""
+import abc
+import bisect
+import csv
+import datetime
+import logging
+import re
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyproj
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import Count, F, Sum
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Defaults used when the settings below are not configured
+DEFAULT_GEOCODE_CACHE_TTL = 60 * 60 * 24 * 30 # 30 days, in seconds
+DEFAULT_GEOCODE_CACHE_MAX_ENTRIES = 10000
+
+HK1980_CRS = "EPSG:2326" # Hong Kong 1980 Grid, used by the GeoData API
+WGS84_CRS = "EPSG:4326"
+
+logger = logging.getLogger(__name__)
+
+# pyproj transformers must not be shared between threads, so each thread
+# lazily builds its own and reuses it for the lifetime of the process
+_transformers = threading.local()
+
+DEFAULT_GEOCODER_PROVIDERS = [
+    'basic.geocoding.GazetteerGeocoder',
+    'basic.geocoding.GeoDataGeocoder',
+]
+
+# Process-wide geocoder built from GEOCODER_PROVIDERS, see get_geocoder()
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+# Keys per "address IN (...)" query, below SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+# Process-wide hit/miss counters for the geocode cache
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def normalize_address(address):
+    """
+    Normalize an address so that trivial differences in case, punctuation
+    and whitespace map to the same cache key.
+    """
+    address = re.sub(r"['’]", '', address.casefold()) # "Mary's" -> "marys"
+    address = re.sub(r'[^\w\s]', ' ', address)
+    return ' '.join(address.split())
+
+
+def get_transformer():
+    """
+    Return the HK1980 -> WGS84 transformer for the current thread, building it on first use.
+    """
+    transformer = getattr(_transformers, 'transformer', None)
+    if transformer is None:
+        transformer = pyproj.Transformer.from_crs(HK1980_CRS, WGS84_CRS, always_xy=True) # Ensure (lon, lat) order for WGS84
+        _transformers.transformer = transformer
+    return transformer
+
+
+def hk1980_to_wgs84(easting, northing):
+    """
+    Convert a single HK1980 easting/northing pair to (latitude, longitude).
+    """
+    lon, lat = get_transformer().transform(easting, northing)
+    return lat, lon
+
+
+def hk1980_to_wgs84_many(eastings, northings):
+    """
+    Convert arrays of HK1980 eastings and northings to (latitudes, longitudes)
+    in a single vectorized call. Returns two NumPy arrays.
+    """
+    eastings = np.asarray(eastings, dtype=float)
+    northings = np.asarray(northings, dtype=float)
+    lons, lats = get_transformer().transform(eastings, northings)
+    return np.asarray(lats), np.asarray(lons)
+
+
+class Geocoder(abc.ABC):
+    """
+    Base class for geocoder providers.
+    """
+
+    @abc.abstractmethod
+    def lookup(self, address):
+        """
+        Return (latitude, longitude) for an address.
+        Raises ValueError if the location cannot be found.
+        """
+
+
+class GeoDataGeocoder(Geocoder):
+    """
+    Looks addresses up with the GeoData API over the network.
+    """
+
+    def lookup(self, address):
+        return geodata_lat_long(address)
+
+
+class GazetteerGeocoder(Geocoder):
+    """
+    Looks addresses up in a local gazetteer of building names, held in memory.
+
+    The gazetteer is a CSV file with a header row and the columns
+    name, easting, northing (HK1980 grid coordinates). An address matches a
+    building with the same normalized name, or failing that the only
+    building whose normalized name starts with it. An address several
+    buildings start with is a miss, left to the next provider.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = getattr(settings, 'GEOCODER_GAZETTEER_PATH', None)
+        self.locations = {}
+        if path:
+            self.load(path)
+        self.names = sorted(self.locations) # For prefix lookups with bisect
+
+    def load(self, path):
+        names, eastings, northings = [], [], []
+        with open(path, newline='', encoding='utf-8') as handle:
+            for row in csv.DictReader(handle):
+                names.append(normalize_address(row['name']))
+                eastings.append(float(row['easting']))
+                northings.append(float(row['northing']))
+        if names:
+            lats, lons = hk1980_to_wgs84_many(eastings, northings)
+            self.locations.update(zip(names, zip(lats.tolist(), lons.tolist())))
+
+    def __len__(self):
+        return len(self.locations)
+
+    def lookup(self, address):
+        key = normalize_address(address)
+        location = self.locations.get(key)
+        if location is not None:
+            return location
+        if key:
+            index = bisect.bisect_left(self.names, key)
+            # Names starting with key are adjacent; a prefix of two of them could be either, do not guess
+            matches = [name for name in self.names[index:index + 2] if name.startswith(key)]
+            if len(matches) == 1:
+                return self.locations[matches[0]]
+        raise ValueError(f"Could not find location for address: {address} in the gazetteer")
+
+
+class ChainGeocoder(Geocoder):
+    """
+    Tries each geocoder in turn and returns the first location found.
+    """
+
+    def __init__(self, geocoders):
+        self.geocoders = list(geocoders)
+
+    def lookup(self, address):
+        for geocoder in self.geocoders:
+            try:
+                return geocoder.lookup(address)
+            except ValueError:
+                continue
+        raise ValueError(f"Could not find location for address: {address} Hong Kong")
+
+
+def get_geocoder():
+    """
+    Return the process-wide geocoder built from GEOCODER_PROVIDERS,
+    creating it (and loading any gazetteer) on first use.
+    """
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                providers = getattr(settings, 'GEOCODER_PROVIDERS', DEFAULT_GEOCODER_PROVIDERS)
+                _geocoder = ChainGeocoder(import_string(provider)() for provider in providers)
+    return _geocoder
+
+
+@receiver(setting_changed)
+def _reset_geocoder(setting, **kwargs):
+    global _geocoder
+    if setting in ('GEOCODER_PROVIDERS', 'GEOCODER_GAZETTEER_PATH'):
+        _geocoder = None
+
+
+def get_lat_long(address):
+    """
+    Resolve an address to (latitude, longitude) with the configured geocoders.
+    Raises ValueError if the location cannot be found.
+    """
+    return get_geocoder().lookup(address)
+
+
+def geodata_lat_long(address):
+    """
+    Resolve an address to (latitude, longitude) using the GeoData API.
+    Raises ValueError if the location cannot be found.
+    """
+    # Append " Hong Kong" to the address for better geocoding
+    full_address = address + " Hong Kong"
+    # URL encode the address to handle spaces and special characters
+    encoded_address = urllib.parse.quote(full_address)
+    url = f"https://geodata.gov.hk/gs/api/v1.0.0/locationSearch?q={encoded_address}"
+
+    try:
+        # Add a timeout to the request
+        response = requests.get(url, timeout=10)
+        logger.debug("GeoData request %s: status %s", response.url, response.status_code)
+
+        response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
+
+        data = response.json()
+
+        # Function to process a result dictionary and perform transformation
+        def process_result(result_dict):
+            if isinstance(result_dict, dict):
+                northing = result_dict.get("y") # HK1980 Northing
+                easting = result_dict.get("x")  # HK1980 Easting
+                if northing is not None and easting is not None:
+                    try:
+                        # Transform coordinates: easting (x) maps to longitude, northing (y) maps to latitude
+                        return hk1980_to_wgs84(easting, northing)
+                    except Exception as transform_err:
+                        logger.warning("Error during coordinate transformation: %s", transform_err)
+                        return None
+                else:
+                    logger.warning("Easting ('x') or Northing ('y') not found in the result.")
+            else:
+                logger.warning("Result item is not a dictionary, but type %s. Content: %r", type(result_dict), result_dict)
+            return None
+
+        # Check if data itself is the list of results
+        if isinstance(data, list) and data:
+            coords = process_result(data[0])
+            if coords:
+                return coords
+        # Handle cases where the API might return a dict containing results
+        elif isinstance(data, dict) and data.get("results") and isinstance(data["results"], list) and data["results"]:
+            coords = process_result(data["results"][0])
+            if coords:
+                return coords
+        else:
+            logger.warning("No valid results found in the response for %s. Data received: %r", full_address, data)
+
+    except requests.exceptions.Timeout:
+        logger.warning("Request timed out for address: %s", full_address)
+    except requests.exceptions.HTTPError as http_err:
+        logger.warning("HTTP error occurred: %s - Status Code: %s. Response text: %s", http_err, response.status_code, response.text)
+    except requests.exceptions.RequestException as req_err:
+        logger.warning("Error during requests to %s: %s", url, req_err)
+    except requests.exceptions.JSONDecodeError:
+        # Check if response exists before accessing its text attribute
+        resp_text = response.text if 'response' in locals() and hasattr(response, 'text') else "N/A"
+        logger.warning("Failed to decode JSON response. Response text: %s", resp_text)
+    except Exception as e:
+        logger.warning("An unexpected error occurred: %s", e)
+
+    # Raise ValueError if coordinates couldn't be obtained for any reason
+    raise ValueError(f"Could not find location for address: {full_address}")
+
+
+def _record(outcome, count=1):
+    with _stats_lock:
+        _stats[outcome] += count
+
+
+def cache_stats():
+    """
+    Return the hit/miss counters of this process, along with the number of
+    cached entries and the hits recorded on them by every process.
+    """
+    from .models import GeocodeCache
+
+    with _stats_lock:
+        stats = dict(_stats)
+    totals = GeocodeCache.objects.aggregate(entries=Count('pk'), stored_hits=Sum('hits'))
+    stats['entries'] = totals['entries']
+    stats['stored_hits'] = totals['stored_hits'] or 0
+    return stats
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats['hits'] = 0
+        _stats['misses'] = 0
+
+
+def lookup_cached(address):
+    """
+    Return the cached (latitude, longitude) for an address, or None if it
+    is not cached or has expired. Never calls the GeoData API.
+    """
+    from .models import GeocodeCache
+
+    now = timezone.now()
+    ttl = getattr(settings, 'GEOCODE_CACHE_TTL', DEFAULT_GEOCODE_CACHE_TTL)
+    entry = GeocodeCache.objects.filter(address=normalize_address(address)).first()
+    if entry is None or now - entry.created_at >= datetime.timedelta(seconds=ttl):
+        _record('misses')
+        return None
+    _record('hits')
+    GeocodeCache.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used=now)
+    return entry.latitude, entry.longitude
+
+
+def geocode(address):
+    """
+    Resolve an address to (latitude, longitude), going through the geocode
+    cache first. Expired entries are refreshed from the GeoData API and the
+    least recently used entries are evicted once the cache is full.
+    """
+    from .models import GeocodeCache
+
+    cached = lookup_cached(address)
+    if cached is not None:
+        return cached
+
+    latitude, longitude = get_lat_long(address)
+    now = timezone.now()
+    GeocodeCache.objects.update_or_create(
+        address=normalize_address(address),
+        defaults={'latitude': latitude, 'longitude': longitude, 'hits': 0, 'created_at': now, 'last_used': now},
+    )
+    evict_geocode_cache()
+    return latitude, longitude
+
+
+def evict_geocode_cache():
+    """
+    Delete the least recently used entries until the cache fits its size limit.
+    """
+    from .models import GeocodeCache
+
+    max_entries = getattr(settings, 'GEOCODE_CACHE_MAX_ENTRIES', DEFAULT_GEOCODE_CACHE_MAX_ENTRIES)
+    overflow = GeocodeCache.objects.count() - max_entries
+    if overflow > 0:
+        stale = GeocodeCache.objects.order_by('last_used').values_list('pk', flat=True)[:overflow]
+        GeocodeCache.objects.filter(pk__in=list(stale)).delete()
+
+
+def _try_get_lat_long(address):
+    try:
+        return get_lat_long(address)
+    except ValueError:
+        return None
+
+
+def geocode_many(addresses, max_workers=8):
+    """
+    Resolve many addresses at once. Each distinct normalized address is
+    looked up once: cached entries are read in bulk and the misses are sent
+    to the GeoData API through a bounded thread pool.
+
+    Returns {normalized address: (latitude, longitude) or None if not found}.
+    """
+    from .models import GeocodeCache
+
+    pending = {}
+    for address in addresses:
+        pending.setdefault(normalize_address(address), address)
+    now = timezone.now()
+    ttl = getattr(settings, 'GEOCODE_CACHE_TTL', DEFAULT_GEOCODE_CACHE_TTL)
+    fresh_since = now - datetime.timedelta(seconds=ttl)
+
+    results = {}
+    keys = list(pending)
+    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        entries = GeocodeCache.objects.filter(address__in=keys[start:start + LOOKUP_CHUNK_SIZE], created_at__gt=fresh_since)
+        for pk, key, latitude, longitude in entries.values_list('pk', 'address', 'latitude', 'longitude'):
+            results[key] = (latitude, longitude)
+            del pending[key]
+        entries.update(hits=F('hits') + 1, last_used=now)
+    _record('hits', len(results))
+    _record('misses', len(pending))
+
+    if pending:
+        # Only the network calls run in the pool, the database is touched from this thread
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            fetched = dict(zip(pending, pool.map(_try_get_lat_long, pending.values())))
+        found = {key: coords for key, coords in fetched.items() if coords is not None}
+        found_keys = list(found)
+        for start in range(0, len(found_keys), LOOKUP_CHUNK_SIZE):
+            # Expired entries for these addresses are replaced
+            GeocodeCache.objects.filter(address__in=found_keys[start:start + LOOKUP_CHUNK_SIZE]).delete()
+        GeocodeCache.objects.bulk_create([
+            GeocodeCache(address=key, latitude=latitude, longitude=longitude, created_at=now, last_used=now)
+            for key, (latitude, longitude) in found.items()
+        ], batch_size=LOOKUP_CHUNK_SIZE)
+        evict_geocode_cache()
+        results.update(fetched)
+    return results
@@ -0,0 +1,313 @@
+"""
+Bulk import of accommodations and ratings from CSV or JSON Lines.
+
+Rows are read as a stream and processed in batches. Each accommodation batch
+is validated with AccommodationSerializer, its distinct buildings are
+geocoded once (through the geocode cache, then a bounded thread pool for
+misses) and the rows are written with bulk_create() instead of one
+Accommodation.save() each. Rating batches are checked for eligibility and
+duplicates with a few set-wise queries instead of Rating.clean()'s queries
+per row. A bad row is reported and skipped without aborting the rest of the
+import.
+"""
+import csv
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .autocomplete import autocomplete
+from .catalogue import record_changes
+from .distances import LEGACY_DISTANCE_FIELDS, distance_matrix, insert_distances
+from .geocoding import geocode_many, normalize_address
+from .models import Accommodation, Campus, Member, Rating, Reservation
+from .ratings import update_rating_totals
+from .search import index_for
+from .serializers import AccommodationSerializer, RatingImportSerializer
+from .spatial import grid_cell
+from .versions import bump_objects
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_WORKERS = 8
+
+# Maximum number of row errors kept in a report
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_csv(lines):
+    """
+    Yield one dict per CSV row. Empty cells are dropped so that optional
+    fields fall back to their defaults instead of failing validation.
+    """
+    for row in csv.DictReader(lines):
+        yield {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def read_jsonl(lines):
+    """
+    Yield one dict per non-blank JSON Lines row. A line that is not valid
+    JSON is yielded as the exception so it can be reported against its row.
+    """
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+class IngestReport:
+    """
+    Counts and per-row errors collected during an import.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.buildings = 0 # Distinct buildings looked up, found or not
+        self.errors = []
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'failed': self.failed,
+            'buildings': self.buildings,
+            'errors': self.errors,
+        }
+
+
+class RatingIngestReport(IngestReport):
+
+    def as_dict(self):
+        data = super().as_dict()
+        del data['buildings'] # Nothing is geocoded
+        return data
+
+
+def batches(rows, batch_size, report):
+    """
+    Yield lists of (row number, row), counting the rows in report.
+    Row numbers start at 1.
+    """
+    batch = []
+    for row_number, row in enumerate(rows, start=1):
+        report.rows += 1
+        batch.append((row_number, row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def validate_rows(batch, serializer, report):
+    """
+    Return [(row number, validated data)] for the rows of batch that pass
+    serializer, reporting the others.
+    """
+    valid = []
+    for row_number, row in batch:
+        if isinstance(row, Exception):
+            report.add_error(row_number, {'non_field_errors': [f"Invalid JSON: {row}"]})
+            continue
+        if not isinstance(row, dict):
+            report.add_error(row_number, {'non_field_errors': ["Expected an object."]})
+            continue
+        try:
+            valid.append((row_number, serializer.run_validation(row)))
+        except serializers.ValidationError as e:
+            report.add_error(row_number, e.detail)
+    return valid
+
+
+def ingest_accommodations(rows, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, report=None):
+    """
+    Import an iterable of row dicts and return an IngestReport.
+    Row numbers in the report start at 1.
+    """
+    report = report or IngestReport()
+    importer = _Importer(report, workers)
+    for batch in batches(rows, batch_size, report):
+        importer.ingest_batch(batch)
+    return report
+
+
+def ingest_ratings(rows, batch_size=DEFAULT_BATCH_SIZE, report=None):
+    """
+    Import an iterable of rating row dicts and return a RatingIngestReport.
+    Row numbers in the report start at 1.
+    """
+    report = report or RatingIngestReport()
+    importer = _RatingImporter(report)
+    for batch in batches(rows, batch_size, report):
+        importer.ingest_batch(batch)
+    return report
+
+
+class _Importer:
+    """
+    State shared by the batches of one import.
+    """
+
+    def __init__(self, report, workers):
+        self.report = report
+        self.workers = workers
+        self.campuses = list(Campus.objects.all())
+        # One serializer validates every row, so its fields are only built once
+        self.serializer = AccommodationSerializer()
+        # Normalized address -> (latitude, longitude) or None, across batches
+        self.coordinates = {}
+
+    def ingest_batch(self, batch):
+        report = self.report
+        valid = validate_rows(batch, self.serializer, report)
+
+        unresolved = {
+            data['building_name'] for _, data in valid
+            if normalize_address(data['building_name']) not in self.coordinates
+        }
+        if unresolved:
+            self.coordinates.update(geocode_many(unresolved, max_workers=self.workers))
+            report.buildings = len(self.coordinates)
+
+        self.save(valid)
+
+    def save(self, valid):
+        report = self.report
+        campuses = self.campuses
+        accommodations = []
+        for row_number, data in valid:
+            location = self.coordinates.get(normalize_address(data['building_name']))
+            if location is None:
+                report.add_error(row_number, {'building_name': [f"Could not find location for address: {data['building_name']}"]})
+                continue
+            # Derived fields are always computed, never taken from the input
+            data = {key: value for key, value in data.items() if key not in Accommodation.LOCATION_FIELDS}
+            accommodation = Accommodation(**data)
+            accommodation.latitude, accommodation.longitude = location
+            accommodation.grid_cell = grid_cell(*location)
+            accommodations.append(accommodation)
+        if not accommodations:
+            return
+
+        distances = None
+        if campuses:
+            distances = distance_matrix(
+                [accommodation.latitude for accommodation in accommodations],
+                [accommodation.longitude for accommodation in accommodations],
+                campuses,
+            )
+            for accommodation, row in zip(accommodations, distances.tolist()):
+                for campus, distance in zip(campuses, row):
+                    if campus.code in LEGACY_DISTANCE_FIELDS:
+                        setattr(accommodation, LEGACY_DISTANCE_FIELDS[campus.code], distance)
+
+        with transaction.atomic():
+            Accommodation.objects.bulk_create(accommodations)
+            if distances is not None:
+                insert_distances([
+                    (accommodation.pk, campus.pk, distance)
+                    for accommodation, row in zip(accommodations, distances.tolist())
+                    for campus, distance in zip(campuses, row)
+                ])
+            # bulk_create() sends no post_save
+            record_changes([accommodation.pk for accommodation in accommodations])
+            bump_objects(Accommodation)
+            index_for(Accommodation).index(accommodations)
+            autocomplete.changed(added=[accommodation.building_name for accommodation in accommodations])
+        report.created += len(accommodations)
+
+
+class _RatingImporter:
+    """
+    State shared by the batches of one rating import.
+    """
+
+    def __init__(self, report):
+        self.report = report
+        self.serializer = RatingImportSerializer()
+        self.today = timezone.now().date()
+        # (accommodation id, member id) of every row imported so far, to report repeats across batches
+        self.imported = set()
+
+    def ingest_batch(self, batch):
+        valid = validate_rows(batch, self.serializer, self.report)
+        if not valid:
+            return
+        # The checks and the insert share a transaction, so no concurrent write slips in between
+        with transaction.atomic():
+            ratings = [
+                Rating(
+                    accommodation_id=data['accommodation'], member_id=data['member'],
+                    **{key: value for key, value in data.items() if key not in ('accommodation', 'member')},
+                )
+                for _, data in self.check(valid)
+            ]
+            if not ratings:
+                return
+            Rating.objects.bulk_create(ratings)
+            # bulk_create() skips Rating.save() and post_save
+            update_rating_totals(added=[rating.counted() for rating in ratings if rating.counted()])
+            bump_objects(Rating)
+            index_for(Rating).index(ratings)
+        self.report.created += len(ratings)
+
+    def check(self, valid):
+        """
+        Return the rows of valid whose accommodation and member exist, whose
+        member may rate the accommodation (the rule of Rating.clean()) and
+        that are not rated yet, reporting the others.
+        """
+        report = self.report
+        accommodation_ids = {data['accommodation'] for _, data in valid}
+        member_ids = {data['member'] for _, data in valid}
+        # Every (accommodation, member) pair with a completed active reservation, in one query
+        eligible = set(Reservation.objects.filter(
+            accommodation__in=accommodation_ids, member__in=member_ids,
+            active=True, end_date__lt=self.today,
+        ).values_list('accommodation', 'member').order_by().distinct())
+        rated = set(Rating.objects.filter(
+            accommodation__in=accommodation_ids, member__in=member_ids,
+        ).values_list('accommodation', 'member'))
+        known_accommodations = known_members = None
+
+        accepted = []
+        for row_number, data in valid:
+            pair = (data['accommodation'], data['member'])
+            if pair not in eligible:
+                if known_accommodations is None: # Only looked up when some row is not eligible
+                    known_accommodations = set(Accommodation.objects.filter(pk__in=accommodation_ids).values_list('pk', flat=True))
+                    known_members = set(Member.objects.filter(pk__in=member_ids).values_list('pk', flat=True))
+                errors = {
+                    field: [f'Invalid pk "{pk}" - object does not exist.']
+                    for field, pk, known in (
+                        ('accommodation', pair[0], known_accommodations), ('member', pair[1], known_members),
+                    )
+                    if pk not in known
+                }
+                report.add_error(row_number, errors or {
+                    'non_field_errors': ["You can only rate an accommodation after your reservation period has ended."],
+                })
+            elif pair in rated or pair in self.imported:
+                report.add_error(row_number, {'non_field_errors': ["The fields accommodation, member must make a unique set."]})
+            else:
+                self.imported.add(pair)
+                accepted.append((row_number, data))
+        return accepted
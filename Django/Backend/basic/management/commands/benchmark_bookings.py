@@ -0,0 +1,125 @@
+import collections
+import datetime
+import random
+import threading
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Exists, OuterRef
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from basic.models import Accommodation, Member, Reservation
+
+BENCHMARK_MANAGER = 'Booking Benchmark'
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire many simultaneous POST /reservations/ requests for a few accommodations "
+        "and report the throughput and any double bookings. Benchmark rows are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--accommodations', type=int, default=5,
+                            help="Fewer accommodations means more requests competing for the same dates.")
+        parser.add_argument('--url', help="Base URL of a running server, e.g. http://localhost:8000. "
+                                          "Requests are handled in this process when omitted.")
+
+    def handle(self, *args, **options):
+        accommodations, member = self.create_fixtures(options['accommodations'])
+        try:
+            bookings = [self.random_booking(accommodations, member) for _ in range(options['requests'])]
+            elapsed, statuses = self.fire(bookings, options['threads'], options['url'])
+            self.report(accommodations, elapsed, statuses, len(bookings))
+        finally:
+            Accommodation.objects.filter(pk__in=[accommodation.pk for accommodation in accommodations]).delete()
+            member.delete()
+
+    def create_fixtures(self, count):
+        today = datetime.date.today()
+        member = Member.objects.create(
+            name=BENCHMARK_MANAGER, contact='0', institute='HKU', email='benchmark@example.com',
+        )
+        # Created without save() so nothing is geocoded
+        accommodations = Accommodation.objects.bulk_create([
+            Accommodation(
+                flat_number='A', floor_number=i, building_name=f"{BENCHMARK_MANAGER} {i}",
+                availability_start=today, availability_end=today + datetime.timedelta(days=365),
+                type_of_accommodation='Single', price_per_month=5000, managed_by=BENCHMARK_MANAGER,
+                latitude=22.2830891, longitude=114.1365621,
+            )
+            for i in range(count)
+        ])
+        return accommodations, member
+
+    def random_booking(self, accommodations, member):
+        start = datetime.date.today() + datetime.timedelta(days=random.randint(0, 60))
+        return {
+            'accommodation': random.choice(accommodations).pk,
+            'member': member.pk,
+            'start_date': start.isoformat(),
+            'end_date': (start + datetime.timedelta(days=random.randint(3, 10))).isoformat(),
+            'status': 'Not Signed',
+        }
+
+    def fire(self, bookings, threads, url):
+        """
+        POST the bookings from threads started together. Returns (seconds, Counter of status codes).
+        """
+        statuses = collections.Counter()
+        lock = threading.Lock()
+        start = threading.Barrier(threads + 1)
+        chunks = [bookings[i::threads] for i in range(threads)]
+
+        def worker(chunk):
+            if url:
+                session = requests.Session()
+                post = lambda data: session.post(f"{url.rstrip('/')}/api/v1/reservations/", json=data).status_code
+            else:
+                client = APIClient(raise_request_exception=False) # Count errors as 500s, like a server would
+                post = lambda data: client.post('/api/v1/reservations/', data, format='json').status_code
+            start.wait()
+            try:
+                for data in chunk:
+                    try:
+                        status = post(data)
+                    except Exception as e:
+                        status = type(e).__name__
+                    with lock:
+                        statuses[status] += 1
+            finally:
+                connection.close() # Each thread has its own connection
+
+        workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for thread in workers:
+                thread.start()
+            start.wait()
+            started = time.perf_counter()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        return elapsed, statuses
+
+    def report(self, accommodations, elapsed, statuses, total):
+        reservations = Reservation.objects.filter(accommodation__in=accommodations, active=True)
+        overlapping = reservations.filter(Exists(
+            Reservation.objects.filter(
+                accommodation=OuterRef('accommodation'), active=True,
+                start_date__lt=OuterRef('end_date'), end_date__gt=OuterRef('start_date'),
+            ).exclude(pk=OuterRef('pk'))
+        ))
+        double_booked = overlapping.count()
+        self.stdout.write(f"{total} requests in {elapsed:.2f} s ({total / elapsed:.0f} requests/s)")
+        for status, count in sorted(statuses.items(), key=lambda item: str(item[0])):
+            self.stdout.write(f"  {status}: {count}")
+        self.stdout.write(f"Reservations stored: {reservations.count()}")
+        if double_booked:
+            self.stderr.write(f"Double booked: {double_booked} reservations overlap another one!")
+        else:
+            self.stdout.write("Double booked: none")
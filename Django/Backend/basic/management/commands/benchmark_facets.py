@@ -0,0 +1,119 @@
+import random
+
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.core.management.base import BaseCommand
+
+from basic.facets import FacetedSearch
+from basic.models import Accommodation, Campus
+
+from .benchmark_lists import best_of, synthetic_accommodations
+
+
+class _Rollback(Exception):
+    pass
+
+
+# Facet index tried on top of the model's: no_of_bedrooms has none
+CANDIDATE_INDEX = models.Index(
+    fields=['no_of_bedrooms', 'number_of_beds', 'type_of_accommodation', 'price_per_month', 'managed_by', 'active', 'distance_to_HKUcampus'],
+    name='accom_bedrooms_facet_idx',
+)
+
+# faceted_search filters timed, as validated by FacetFilterSerializer
+SAMPLE_FILTERS = [
+    {},
+    {'min_price': 5000, 'max_price': 10000, 'number_of_beds': [1, 2]},
+    {'type_of_accommodation': ['Double'], 'managed_by': ['Manager 1'], 'max_distance': 5},
+    {'campus': 'CUHK', 'max_distance': 10, 'no_of_bedrooms': [2]},
+    {'number_of_beds': [2], 'no_of_bedrooms': [1], 'type_of_accommodation': ['Double']},
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time faceted_search's counts and accommodation writes with the model's facet indexes, without each "
+        "of them, with one more for no_of_bedrooms and with none. Synthetic rows and index changes are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000)
+        parser.add_argument('--writes', type=int, default=2000, help="Single row price updates timed per layout.")
+        parser.add_argument('--repeat', type=int, default=3, help="Best of this many runs is reported.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['rows'], options['writes'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, rows, writes, repeat):
+        missing = rows - Accommodation.objects.count()
+        if missing > 0:
+            self.stdout.write(f"Creating {missing} synthetic accommodations (rolled back afterwards)...")
+            Accommodation.objects.bulk_create(varied(synthetic_accommodations(missing)), batch_size=1000)
+        campuses = {campus.code: campus for campus in Campus.objects.all()}
+        filters = [
+            {**sample, 'campus': campuses[sample['campus']]} if 'campus' in sample else sample
+            for sample in SAMPLE_FILTERS if sample.get('campus', 'HKU') in campuses
+        ]
+        active = Accommodation.objects.filter(active=True)
+        ids = list(Accommodation.objects.values_list('pk', flat=True))
+        sample_ids = random.sample(ids, min(writes, len(ids)))
+
+        def counts():
+            for selected in filters:
+                FacetedSearch(active, selected).counts()
+
+        def write():
+            for pk in sample_ids:
+                Accommodation.objects.filter(pk=pk).update(price_per_month=F('price_per_month') + 1)
+
+        model_indexes = [index for index in Accommodation._meta.indexes if index.name.endswith('_facet_idx')]
+        layouts = [
+            ("model's facet indexes", [], []),
+            *((f"without {index.name}", [], [index]) for index in model_indexes),
+            (f"with {CANDIDATE_INDEX.name} too", [CANDIDATE_INDEX], []),
+            ("no facet indexes", [], model_indexes),
+        ]
+        for label, added, removed in layouts:
+            change_indexes(added, removed)
+            analyze()
+            count_time, write_time = best_of(counts, repeat), best_of(write, repeat)
+            self.stdout.write(
+                f"{label}:\n"
+                f"  facet counts: {count_time / len(filters) * 1000:8.1f} ms per search ({len(filters)} searches)\n"
+                f"  writes:       {write_time / len(sample_ids) * 1e6:8.1f} us per row ({len(sample_ids)} updates)"
+            )
+            change_indexes(removed, added)
+
+
+def varied(accommodations):
+    """
+    Spread the synthetic rows over the facets' values.
+    """
+    for accommodation in accommodations:
+        accommodation.number_of_beds = random.randint(1, 4)
+        accommodation.no_of_bedrooms = random.randint(1, 3)
+        accommodation.type_of_accommodation = random.choice(['Single', 'Double', 'Studio', 'Shared'])
+        accommodation.managed_by = f"Manager {random.randint(1, 50)}"
+        yield accommodation
+
+
+def change_indexes(added, removed):
+    # Statements only: SQLite's schema editor cannot be entered inside the rolled back transaction
+    editor = connection.SchemaEditorClass(connection, collect_sql=True)
+    with connection.cursor() as cursor:
+        for index in added:
+            cursor.execute(str(index.create_sql(Accommodation, editor)))
+        for index in removed:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+
+
+def analyze():
+    # Fresh planner statistics, so each layout is planned as it would be in production
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
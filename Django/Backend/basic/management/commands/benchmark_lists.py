@@ -0,0 +1,117 @@
+import datetime
+import random
+import time
+
+from django.db import transaction
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from basic.distances import LEGACY_DISTANCE_FIELDS
+from basic.fastpath import ValuesSerializer
+from basic.models import Accommodation
+from basic.renderers import FastJSONRenderer, orjson
+from basic.serializers import AccommodationSerializer
+from basic.spatial import grid_cell
+from basic.views import AccommodationViewSet
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ModelSerializer + JSONRenderer with the .values() fast path + FastJSONRenderer "
+        "on N accommodations. Synthetic rows are created if needed and rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3, help="Best of this many runs is reported.")
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write("orjson is not installed, FastJSONRenderer falls back to JSONRenderer.")
+        try:
+            with transaction.atomic():
+                self.run(options['rows'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, rows, repeat):
+        missing = rows - Accommodation.objects.count()
+        if missing > 0:
+            self.stdout.write(f"Creating {missing} synthetic accommodations (rolled back afterwards)...")
+            Accommodation.objects.bulk_create(synthetic_accommodations(missing), batch_size=1000)
+
+        queryset = Accommodation.objects.order_by('building_name', 'floor_number', 'flat_number', 'pk')[:rows]
+        for label, fields in [('all fields', None), ('list fields', AccommodationSerializer.LIST_FIELDS)]:
+            serializer = AccommodationSerializer(fields=fields)
+            values_serializer = ValuesSerializer(serializer)
+
+            def slow():
+                return JSONRenderer().render(AccommodationSerializer(queryset, many=True, fields=fields).data)
+
+            def fast():
+                return FastJSONRenderer().render(values_serializer.to_representation(queryset.values(*values_serializer.sources)))
+
+            if slow() != fast():
+                self.stderr.write(f"{label}: outputs differ!")
+            self.report(f"Serialize {rows} rows, {label}", best_of(slow, repeat), best_of(fast, repeat), rows)
+
+        # Walk the paginated list endpoint, as a client would
+        view = AccommodationViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+
+        def walk():
+            seen = 0
+            url = '/api/v1/accommodations/?page_size=100'
+            while url and seen < rows:
+                response = view(factory.get(url))
+                response.render()
+                seen += len(response.data['results'])
+                url = response.data['next']
+            return seen
+
+        with override_settings(ALLOWED_HOSTS=['testserver'], RESPONSE_CACHE=None): # Time the views, not the cache
+            with override_settings(FAST_LIST_RESPONSES=False):
+                slow_time = best_of(walk, repeat)
+            fast_time = best_of(walk, repeat)
+        self.report(f"GET /accommodations/ pages of 100, {rows} rows", slow_time, fast_time, rows)
+
+    def report(self, label, slow_time, fast_time, rows):
+        self.stdout.write(
+            f"{label}:\n"
+            f"  ModelSerializer: {slow_time * 1000:8.1f} ms ({rows / slow_time:9.0f} rows/s)\n"
+            f"  fast path:       {fast_time * 1000:8.1f} ms ({rows / fast_time:9.0f} rows/s)  x{slow_time / fast_time:.1f}"
+        )
+
+
+def best_of(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def synthetic_accommodations(count):
+    today = datetime.date.today()
+    for i in range(count):
+        latitude, longitude = random.uniform(22.2, 22.45), random.uniform(114.05, 114.3)
+        accommodation = Accommodation(
+            flat_number=random.choice('ABCDEFGH'), floor_number=random.randint(1, 40),
+            building_name=f"Benchmark Building {i % 2000}", room_number=random.choice([None, 1, 2, 3]),
+            availability_start=today, availability_end=today + datetime.timedelta(days=365),
+            type_of_accommodation=random.choice(['Single', 'Double', 'Shared']),
+            price_per_month=random.randint(3000, 20000), managed_by='Benchmark',
+            latitude=latitude, longitude=longitude, grid_cell=grid_cell(latitude, longitude),
+        )
+        for field in LEGACY_DISTANCE_FIELDS.values():
+            setattr(accommodation, field, round(random.uniform(0.1, 40), 3))
+        yield accommodation
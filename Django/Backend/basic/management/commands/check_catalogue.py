@@ -0,0 +1,95 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from basic.catalogue import engine
+from basic.models import Accommodation
+from basic.views import AccommodationViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the in-memory accommodation catalogue (CATALOGUE_ENGINE) with the database: every row, "
+        "then list pages read through both paths. Reports the catalogue's memory use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=3, help="Pages followed per list request.")
+
+    def handle(self, *args, **options):
+        engine.clear()
+        started = time.perf_counter()
+        catalogue = engine.current()
+        elapsed = time.perf_counter() - started
+        rows = len(catalogue)
+        per_row = catalogue.nbytes / rows if rows else 0
+        self.stdout.write(
+            f"Loaded {rows} active accommodations in {elapsed * 1000:.0f} ms: {catalogue.nbytes / 2 ** 20:.1f} MiB, "
+            f"{per_row:.0f} bytes per row ({per_row * 100000 / 2 ** 20:.1f} MiB per 100k rows)"
+        )
+
+        differences = catalogue.differences(Accommodation.objects.filter(active=True))
+        for pk, field, held, stored in differences[:10]:
+            self.stderr.write(f"  accommodation {pk} {field or ''}: catalogue {held!r}, database {stored!r}")
+        self.stdout.write(f"Rows: {len(differences)} difference(s)")
+
+        requests = mismatches = 0
+        for params in self.sample_requests():
+            compared, differ = self.compare(params, options['pages'])
+            requests += compared
+            if differ:
+                mismatches += 1
+                self.stderr.write(f"  ?{'&'.join(f'{k}={v}' for k, v in params.items())} differs at page {compared}")
+        self.stdout.write(f"Requests: {requests} pages compared, {mismatches} differ")
+        if differences or mismatches:
+            raise CommandError("The catalogue does not match the database.")
+
+    def sample_requests(self):
+        """
+        Every list ordering, unfiltered and with filters taken from the data.
+        """
+        active = Accommodation.objects.filter(active=True).order_by()
+
+        def most_common(field):
+            row = active.values_list(field).annotate(count=Count('pk')).order_by('-count', field).first()
+            return row[0] if row else None
+
+        filters = [
+            {},
+            {'type_of_accommodation': most_common('type_of_accommodation'), 'number_of_beds': most_common('number_of_beds')},
+            {'managed_by': most_common('managed_by'), 'min_price': 5000, 'max_price': 12000},
+            {'max_distance': 5, 'no_of_bedrooms': most_common('no_of_bedrooms')},
+            {'campus': 'CUHK', 'max_distance': 10},
+        ]
+        for ordering in [None, *AccommodationViewSet.list_orderings]:
+            for extra in filters:
+                params = {'active': 'true', **{name: value for name, value in extra.items() if value is not None}}
+                if ordering:
+                    params['ordering'] = ordering
+                yield params
+
+    def compare(self, params, pages):
+        """
+        Follow pages next links then one previous link through both paths.
+        Returns (pages compared, whether a page differed).
+        """
+        view = AccommodationViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+
+        def get(url, enabled):
+            with override_settings(CATALOGUE_ENGINE=enabled, ALLOWED_HOSTS=['testserver'], RESPONSE_CACHE=None):
+                response = view(factory.get(url) if url.startswith('http') else factory.get(url, params))
+                response.render()
+                return response
+
+        url, compared = '/api/v1/accommodations/', 0
+        while url and compared <= pages:
+            database, memory = get(url, False), get(url, True)
+            compared += 1
+            if database.content != memory.content:
+                return compared, True
+            url = database.data.get('next' if compared < pages else 'previous') if compared <= pages else None
+        return compared, False
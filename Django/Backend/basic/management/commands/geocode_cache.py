@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from basic.geocoding import cache_stats, evict_geocode_cache
+from basic.models import GeocodeCache
+
+
+class Command(BaseCommand):
+    help = "Show statistics for the geocode cache, or clear it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help="Delete every cached address.")
+        parser.add_argument('--evict', action='store_true', help="Evict least recently used entries beyond GEOCODE_CACHE_MAX_ENTRIES.")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted, _ = GeocodeCache.objects.all().delete()
+            self.stdout.write(f"Deleted {deleted} cached addresses.")
+        elif options['evict']:
+            evict_geocode_cache()
+
+        stats = cache_stats()
+        self.stdout.write(f"Entries: {stats['entries']}  Hits served from cache: {stats['stored_hits']}")
+        # Counters are per process, so this only reflects lookups made by this command
+        self.stdout.write(f"Hits: {stats['hits']}  Misses: {stats['misses']}")
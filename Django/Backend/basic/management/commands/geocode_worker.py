@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from basic.geocode_queue import process_geocode_jobs
+
+
+class Command(BaseCommand):
+    help = "Resolve accommodations saved with geocode_status='pending' (see GEOCODE_ASYNC)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process the jobs that are due and exit.")
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent geocoding requests.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep when no job is due.")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = process_geocode_jobs(batch_size=options['batch_size'], workers=options['workers'])
+            if any(counts.values()):
+                self.stdout.write(
+                    f"Resolved {counts['resolved']}, retrying {counts['retried']}, failed {counts['failed']}."
+                )
+            if options['once']:
+                if not any(counts.values()):
+                    return
+            elif not any(counts.values()):
+                time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from basic.ingest import DEFAULT_BATCH_SIZE, READERS, ingest_ratings
+
+
+class Command(BaseCommand):
+    help = "Bulk import ratings from a CSV or JSON Lines file ('-' reads stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin.")
+        parser.add_argument('--format', choices=sorted(READERS), help="Input format. Guessed from the file extension by default.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format']
+        if input_format is None:
+            input_format = 'csv' if path.lower().endswith('.csv') else 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson')) else None
+        if input_format is None:
+            raise CommandError("Cannot guess the input format, pass --format csv or --format jsonl.")
+
+        started = time.perf_counter()
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            report = ingest_ratings(READERS[input_format](stream), batch_size=options['batch_size'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = time.perf_counter() - started
+
+        for error in report.errors:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(f"Imported {report.created} of {report.rows} rows in {elapsed:.1f}s ({report.failed} failed).")
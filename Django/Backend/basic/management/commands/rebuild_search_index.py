@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from basic.search import INDEXES, fts_available
+
+
+class Command(BaseCommand):
+    help = "Refill the full-text search tables from the accommodation, member and rating tables."
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError("The database has no full-text search tables (SQLite with FTS5 is required).")
+        with transaction.atomic():
+            for index in INDEXES.values():
+                self.stdout.write(f"{index.table}: {index.rebuild()} rows")
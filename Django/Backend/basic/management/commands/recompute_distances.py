@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from basic.distances import recompute_campus_distances
+from basic.models import Campus
+
+
+class Command(BaseCommand):
+    help = "Recompute accommodation distances to campuses from stored coordinates (no geocoding)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campus', action='append', dest='campuses', metavar='CODE',
+                            help="Only recompute this campus code. Can be given more than once.")
+
+    def handle(self, *args, **options):
+        campuses = Campus.objects.all()
+        if options['campuses']:
+            campuses = campuses.filter(code__in=options['campuses'])
+            missing = set(options['campuses']) - set(campuses.values_list('code', flat=True))
+            if missing:
+                raise CommandError(f"Unknown campus code(s): {', '.join(sorted(missing))}")
+
+        for campus in campuses:
+            started = time.perf_counter()
+            count = recompute_campus_distances(campus)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{campus.code}: {count} accommodations in {elapsed:.3f}s")
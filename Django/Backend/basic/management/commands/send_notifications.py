@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from basic.notifications import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = "Send the emails queued in the notification outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Send the messages that are due and exit.")
+        parser.add_argument('--batch-size', type=int, default=100, help="Messages sent over one mail connection.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep when no message is due.")
+
+    def handle(self, *args, **options):
+        while True:
+            counts = send_queued_emails(batch_size=options['batch_size'])
+            if any(counts.values()):
+                self.stdout.write(
+                    f"Sent {counts['sent']}, retrying {counts['retried']}, dead-lettered {counts['failed']}."
+                )
+            if options['once']:
+                if not any(counts.values()):
+                    return
+            elif not any(counts.values()):
+                time.sleep(options['interval'])
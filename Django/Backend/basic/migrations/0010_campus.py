@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0009_geocodecache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=30, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+            ],
+            options={
+                'verbose_name_plural': 'campuses',
+                'ordering': ['code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CampusDistance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.FloatField()),
+                ('accommodation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='campus_distances', to='basic.accommodation')),
+                ('campus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distances', to='basic.campus')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['campus', 'distance'], name='basic_campu_campus__aedad9_idx')],
+                'unique_together': {('accommodation', 'campus')},
+            },
+        ),
+    ]
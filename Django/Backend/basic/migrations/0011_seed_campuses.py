@@ -0,0 +1,66 @@
+import math
+
+from django.db import migrations
+
+EARTH_RADIUS_KM = 6371
+
+# The campuses that used to be hard-coded in Accommodation.save()
+CAMPUSES = [
+    ('HKU', 'HKU Main Campus', 22.2830891, 114.1365621),
+    ('HKU_sassoon', 'HKU Sassoon Road Campus', 22.2675, 114.12881),
+    ('HKU_swire', 'HKU Swire Institute of Marine Science', 22.20805, 114.26021),
+    ('HKU_kadoorie', 'HKU Kadoorie Centre', 22.43022, 114.11429),
+    ('HKU_dentistry', 'HKU Prince Philip Dental Hospital', 22.28649, 114.14426),
+    ('CUHK', 'CUHK Campus', 22.396428, 114.200203),
+    ('HKUST', 'HKUST Campus', 22.335, 114.265),
+]
+
+
+# Distance helpers as they were when this migration was written, copied so
+# later changes to basic/distances.py do not alter it
+def haversine(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lon2 - lon1)
+    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def round_sig(value):
+    return float('{:.4g}'.format(value))
+
+
+def seed_campuses(apps, schema_editor):
+    Campus = apps.get_model('basic', 'Campus')
+    CampusDistance = apps.get_model('basic', 'CampusDistance')
+    Accommodation = apps.get_model('basic', 'Accommodation')
+
+    campuses = [
+        Campus.objects.create(code=code, name=name, latitude=latitude, longitude=longitude)
+        for code, name, latitude, longitude in CAMPUSES
+    ]
+    # Fill the distance table from the coordinates already stored on each accommodation
+    located = Accommodation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    CampusDistance.objects.bulk_create([
+        CampusDistance(
+            accommodation_id=pk, campus=campus,
+            distance=round_sig(haversine(latitude, longitude, campus.latitude, campus.longitude)),
+        )
+        for pk, latitude, longitude in located.values_list('pk', 'latitude', 'longitude')
+        for campus in campuses
+    ], batch_size=1000)
+
+
+def remove_campuses(apps, schema_editor):
+    apps.get_model('basic', 'Campus').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0010_campus'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_campuses, remove_campuses),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0011_seed_campuses'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accommodation',
+            name='geocode_status',
+            field=models.CharField(choices=[('resolved', 'Resolved'), ('pending', 'Pending'), ('failed', 'Failed')], default='resolved', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='GeocodeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('building_name', models.CharField(max_length=100)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('accommodation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='geocode_job', to='basic.accommodation')),
+            ],
+        ),
+    ]
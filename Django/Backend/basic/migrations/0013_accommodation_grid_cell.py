@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:37
+
+import math
+
+from django.db import migrations, models
+
+# The grid as this migration created it, copied so later changes to basic/spatial.py do not alter it
+GRID_SIZE = 0.01
+GRID_COLUMNS = 36000
+
+
+def grid_cell(latitude, longitude):
+    row = math.floor((latitude + 90) / GRID_SIZE)
+    column = min(math.floor((longitude + 180) / GRID_SIZE), GRID_COLUMNS - 1)
+    return row * GRID_COLUMNS + column
+
+
+def fill_grid_cells(apps, schema_editor):
+    Accommodation = apps.get_model('basic', 'Accommodation')
+    located = Accommodation.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    for accommodation in located.only('pk', 'latitude', 'longitude').iterator():
+        accommodation.grid_cell = grid_cell(accommodation.latitude, accommodation.longitude)
+        accommodation.save(update_fields=['grid_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0012_geocode_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accommodation',
+            name='grid_cell',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['grid_cell', 'active', 'latitude', 'longitude'], name='accommodation_grid_idx'),
+        ),
+        migrations.RunPython(fill_grid_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0013_accommodation_grid_cell'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='campusdistance',
+            name='basic_campu_campus__aedad9_idx',
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['distance_to_HKUcampus', 'id'], name='accom_hku_dist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['distance_to_HKUcampus_sassoon', 'id'], name='accom_sassoon_dist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['distance_to_HKUcampus_swire', 'id'], name='accom_swire_dist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['distance_to_HKUcampus_kadoorie', 'id'], name='accom_kadoorie_dist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['distance_to_HKUcampus_dentistry', 'id'], name='accom_dentistry_dist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['distance_to_CUHKcampus', 'id'], name='accom_cuhk_dist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['distance_to_HKUSTcampus', 'id'], name='accom_hkust_dist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campusdistance',
+            index=models.Index(fields=['campus', 'distance', 'accommodation'], name='basic_campu_campus__4aa5b7_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0014_accommodation_distance_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['building_name', 'floor_number', 'flat_number', 'id'], name='accom_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['name', 'id'], name='member_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['rating', 'id'], name='rating_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['start_date', 'id'], name='reservation_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'start_date', 'id'], name='reservation_status_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0016_resourceversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['accommodation', 'active', 'start_date', 'end_date'], name='reservation_overlap_idx'),
+        ),
+    ]
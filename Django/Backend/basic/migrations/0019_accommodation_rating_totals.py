@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+def fill_rating_totals(apps, schema_editor):
+    # The one GROUP BY: from here on the totals are kept current incrementally
+    Accommodation = apps.get_model('basic', 'Accommodation')
+    Rating = apps.get_model('basic', 'Rating')
+    totals = Rating.objects.filter(active=True).values('accommodation').annotate(
+        count=models.Count('pk'), total=models.Sum('rating'),
+    ).order_by()
+    for row in totals.iterator():
+        Accommodation.objects.filter(pk=row['accommodation']).update(
+            rating_count=row['count'], rating_sum=row['total'], rating_avg=row['total'] / row['count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0018_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accommodation',
+            name='rating_avg',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='accommodation',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='accommodation',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['rating_avg', 'rating_count', 'id'], name='accom_rating_idx'),
+        ),
+        migrations.RunPython(fill_rating_totals, migrations.RunPython.noop),
+    ]
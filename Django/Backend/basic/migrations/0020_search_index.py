@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:02
+
+from django.db import OperationalError, migrations
+
+# FTS5 table -> (table it indexes, indexed columns), see basic/search.py
+SEARCH_TABLES = {
+    'basic_accommodation_fts': ('basic_accommodation', ['building_name', 'managed_by']),
+    'basic_member_fts': ('basic_member', ['name']),
+    'basic_rating_fts': ('basic_rating', ['comment']),
+}
+
+
+def create_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return # Searched with LIKE
+    with schema_editor.connection.cursor() as cursor:
+        for table, (source, columns) in SEARCH_TABLES.items():
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {table} USING fts5({', '.join(columns)}, "
+                    f"tokenize = 'unicode61 remove_diacritics 2')"
+                )
+            except OperationalError:
+                return # SQLite built without FTS5, searched with LIKE
+            values = ', '.join(f"COALESCE({column}, '')" for column in columns)
+            cursor.execute(f"INSERT INTO {table} (rowid, {', '.join(columns)}) SELECT id, {values} FROM {source}")
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in SEARCH_TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0019_accommodation_rating_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
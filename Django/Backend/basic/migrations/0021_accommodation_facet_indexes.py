@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0020_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['type_of_accommodation', 'number_of_beds', 'no_of_bedrooms', 'price_per_month', 'managed_by', 'active', 'distance_to_HKUcampus'], name='accom_type_facet_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['number_of_beds', 'no_of_bedrooms', 'type_of_accommodation', 'price_per_month', 'managed_by', 'active', 'distance_to_HKUcampus'], name='accom_beds_facet_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['no_of_bedrooms', 'number_of_beds', 'type_of_accommodation', 'price_per_month', 'managed_by', 'active', 'distance_to_HKUcampus'], name='accom_bedrooms_facet_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['managed_by', 'type_of_accommodation', 'number_of_beds', 'no_of_bedrooms', 'price_per_month', 'active', 'distance_to_HKUcampus'], name='accom_manager_facet_idx'),
+        ),
+    ]
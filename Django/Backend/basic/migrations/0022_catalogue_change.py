@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0021_accommodation_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('accommodation_id', models.BigIntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['price_per_month', 'id'], name='accom_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accommodation',
+            index=models.Index(fields=['availability_start', 'id'], name='accom_start_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+import re
+
+from django.db import migrations
+
+
+# geocoding.normalize_address before and after apostrophes were dropped,
+# copied so later changes to basic/geocoding.py do not alter this migration
+def old_key(address):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', address.casefold()).split()) # "Mary's" -> "mary s"
+
+
+def new_key(address):
+    return old_key(re.sub(r"['’]", '', address.casefold())) # "Mary's" -> "marys"
+
+
+def rekey_geocode_cache(apps, schema_editor):
+    """
+    Move the cache entries of building names with an apostrophe to their new
+    key, so they are found again instead of lingering until LRU eviction.
+    Only names still used by an accommodation can be recovered. The old key
+    of "Mary's" was also that of "Mary S", which is looked up again once.
+    """
+    Accommodation = apps.get_model('basic', 'Accommodation')
+    GeocodeCache = apps.get_model('basic', 'GeocodeCache')
+
+    names = Accommodation.objects.filter(building_name__regex=r"['’]").values_list('building_name', flat=True).distinct()
+    for name in names:
+        old, new = old_key(name), new_key(name)
+        entry = GeocodeCache.objects.filter(address=old).first()
+        if entry is None:
+            continue
+        if GeocodeCache.objects.filter(address=new).exists():
+            entry.delete() # Already looked up again under the new key
+        else:
+            entry.address = new
+            entry.save(update_fields=['address'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0022_catalogue_change'),
+    ]
+
+    operations = [
+        migrations.RunPython(rekey_geocode_cache, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:04
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('basic', '0023_rekey_geocode_cache'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='accommodation',
+            name='accom_bedrooms_facet_idx',
+        ),
+    ]
@@ -0,0 +1,105 @@
+"""
+Transactional outbox for email notifications.
+
+queue_email() stores the message as a NotificationOutbox row, inside the
+caller's transaction: it is only sent if the change it reports is
+committed, and a failing mail server neither slows down nor breaks the
+request. The send_notifications command drains the outbox in batches over
+a single mail connection, retrying failed messages with exponential
+backoff and dead-lettering them (next_attempt_at set to NULL, the error
+kept) after NOTIFICATION_MAX_ATTEMPTS attempts.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_DELAY = 60 # Seconds before the first retry, doubled on every attempt
+MAX_RETRY_DELAY = 6 * 60 * 60
+
+# How long a worker owns a message it has picked up before others may retry it
+LEASE = datetime.timedelta(minutes=5)
+
+
+def queue_email(subject, message, recipient_list):
+    """
+    Queue one email per recipient. Call it inside the transaction that makes the change.
+    """
+    queue_emails([(subject, message, recipient_list)])
+
+
+def queue_emails(emails):
+    """
+    Queue many (subject, message, recipient_list) emails with one INSERT.
+    """
+    from .models import NotificationOutbox
+
+    now = timezone.now()
+    NotificationOutbox.objects.bulk_create([
+        NotificationOutbox(recipient=recipient, subject=subject, body=message, next_attempt_at=now)
+        for subject, message, recipient_list in emails
+        for recipient in recipient_list
+    ])
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'NOTIFICATION_RETRY_DELAY', DEFAULT_RETRY_DELAY)
+    return datetime.timedelta(seconds=min(base * 2 ** (attempts - 1), MAX_RETRY_DELAY))
+
+
+def send_queued_emails(batch_size=100):
+    """
+    Send up to batch_size due messages. Returns {'sent': n, 'retried': n, 'failed': n}.
+    """
+    from .models import NotificationOutbox
+
+    now = timezone.now()
+    due = NotificationOutbox.objects.filter(next_attempt_at__lte=now).order_by('next_attempt_at')[:batch_size]
+    # Claim each message by pushing its next attempt out, so concurrent workers skip it
+    claimed = [
+        message for message in due
+        if NotificationOutbox.objects.filter(pk=message.pk, next_attempt_at=message.next_attempt_at).update(next_attempt_at=now + LEASE)
+    ]
+    counts = {'sent': 0, 'retried': 0, 'failed': 0}
+    if not claimed:
+        return counts
+
+    max_attempts = getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e: # Mail server unreachable, every message is retried
+        for message in claimed:
+            counts[_failed(message, e, now, max_attempts)] += 1
+        return counts
+
+    try:
+        sent = []
+        for message in claimed:
+            email = EmailMessage(message.subject, message.body, settings.DEFAULT_FROM_EMAIL, [message.recipient], connection=connection)
+            try:
+                email.send()
+            except Exception as e:
+                counts[_failed(message, e, now, max_attempts)] += 1
+            else:
+                sent.append(message.pk)
+        NotificationOutbox.objects.filter(pk__in=sent).delete()
+        counts['sent'] = len(sent)
+    finally:
+        connection.close()
+    return counts
+
+
+def _failed(message, error, now, max_attempts):
+    from .models import NotificationOutbox
+
+    attempts = message.attempts + 1
+    give_up = attempts >= max_attempts
+    NotificationOutbox.objects.filter(pk=message.pk).update(
+        attempts=attempts,
+        next_attempt_at=None if give_up else now + retry_delay(attempts),
+        last_error=f"{type(error).__name__}: {error}",
+    )
+    return 'failed' if give_up else 'retried'
@@ -0,0 +1,149 @@
+"""
+In-memory index of booked periods, for occupancy calendars.
+
+For every accommodation it keeps the active reservations as half-open
+[start_date, end_date) intervals sorted by start, with the running maximum
+of their end dates (the augmentation an interval tree keeps per node). The
+intervals overlapping a range are then found with two binary searches
+instead of a query per accommodation.
+
+Entries are loaded on demand and kept current through the version stamps
+in versions.py: every reservation write bumps the stamp of its
+accommodation's bookings (see signals.py), and a lookup reloads, in one
+query, only the accommodations whose stamp moved since they were loaded.
+Writes made by other processes are picked up the same way.
+"""
+import bisect
+import datetime
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .versions import collection_key, current_stamps
+
+DEFAULT_MAX_ACCOMMODATIONS = 10000 # Least recently used entries are dropped beyond this
+
+
+def bookings_key(accommodation_id):
+    """
+    Stamp key bumped whenever a reservation of this accommodation changes.
+    """
+    from .models import Reservation
+
+    return f'{collection_key(Reservation)}@{accommodation_id}'
+
+
+class Intervals:
+    """
+    Sorted [start, end) intervals of one accommodation.
+    """
+
+    def __init__(self, periods):
+        periods = sorted(periods)
+        self.starts = [start for start, _ in periods]
+        self.ends = [end for _, end in periods]
+        self.max_ends = []
+        latest = None
+        for end in self.ends:
+            latest = end if latest is None else max(latest, end)
+            self.max_ends.append(latest)
+
+    def overlapping(self, start, end):
+        """
+        Yield the (start, end) intervals overlapping [start, end).
+        """
+        # Every interval before first ends by start, every one from last on starts at end or later
+        first = bisect.bisect_right(self.max_ends, start)
+        last = bisect.bisect_left(self.starts, end)
+        for i in range(first, last):
+            if self.ends[i] > start:
+                yield self.starts[i], self.ends[i]
+
+
+class OccupancyIndex:
+
+    def __init__(self):
+        self.entries = OrderedDict() # accommodation id -> (stamp, Intervals)
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def intervals(self, accommodation_ids):
+        """
+        Return {accommodation id: Intervals}, reloading stale entries.
+        """
+        from .models import Reservation
+
+        accommodation_ids = list(dict.fromkeys(accommodation_ids))
+        stamps = current_stamps([bookings_key(pk) for pk in accommodation_ids])
+        current = {
+            pk: (stamp.version, stamp.updated_at) if stamp else None
+            for pk, stamp in zip(accommodation_ids, stamps)
+        }
+        found, stale = {}, []
+        with self.lock:
+            for pk in accommodation_ids:
+                entry = self.entries.get(pk)
+                if entry is not None and entry[0] == current[pk]:
+                    self.entries.move_to_end(pk)
+                    found[pk] = entry[1]
+                else:
+                    stale.append(pk)
+
+        if stale:
+            periods = {pk: [] for pk in stale}
+            rows = Reservation.objects.filter(accommodation__in=stale, active=True).values_list(
+                'accommodation', 'start_date', 'end_date',
+            )
+            for pk, start, end in rows.iterator():
+                periods[pk].append((start, end))
+            limit = getattr(settings, 'OCCUPANCY_MAX_ACCOMMODATIONS', DEFAULT_MAX_ACCOMMODATIONS)
+            with self.lock:
+                for pk in stale:
+                    found[pk] = Intervals(periods[pk])
+                    self.entries[pk] = (current[pk], found[pk])
+                while len(self.entries) > limit:
+                    self.entries.popitem(last=False)
+        return found
+
+
+occupancy = OccupancyIndex()
+
+
+def month_starts(start, end):
+    """
+    First day of every month from start's month to end's month.
+    """
+    month = start.replace(day=1)
+    while month <= end:
+        yield month
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def day_bitmap(intervals, start, end):
+    """
+    '0'/'1' per day from start to end inclusive, '1' for booked days.
+    """
+    days = (end - start).days + 1
+    bits = bytearray(b'0' * days)
+    for booked_from, booked_until in intervals.overlapping(start, end + datetime.timedelta(days=1)):
+        first = max((booked_from - start).days, 0)
+        last = min((booked_until - start).days, days) # Exclusive, the end date is the day it is free again
+        bits[first:last] = b'1' * (last - first)
+    return bits.decode('ascii')
+
+
+def month_bitmap(intervals, start, end):
+    """
+    '0'/'1' per month from start's month to end's month, '1' when any day
+    of the month within start..end is booked.
+    """
+    bits = []
+    for month in month_starts(start, end):
+        month_end = (month + datetime.timedelta(days=32)).replace(day=1)
+        range_start, range_end = max(month, start), min(month_end, end + datetime.timedelta(days=1))
+        bits.append('1' if next(intervals.overlapping(range_start, range_end), None) else '0')
+    return ''.join(bits)
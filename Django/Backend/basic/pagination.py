@@ -0,0 +1,186 @@
+"""
+Keyset (cursor) pagination.
+
+A page is read with WHERE (ordering keys) > (last row's keys) ... LIMIT n
+instead of OFFSET, so page 1000 costs the same as page 1 as long as the
+ordering is backed by an index. The cursor is the ordering values of the
+first or last row of the current page, base64 encoded JSON.
+
+Unlike rest_framework.pagination.CursorPagination, which keys on the first
+ordering field only and falls back to an offset for ties, every ordering
+field is part of the key. The last field must be unique (normally 'pk') and
+none of them may be NULL.
+
+This is the default pagination class (see REST_FRAMEWORK in settings.py).
+Views set keyset_ordering to an ordering backed by an index, and may set
+allow_count = True to let clients ask for an exact total with ?count=true.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate on a composite key. The ordering is taken from the ordering
+    argument, the view's keyset_ordering attribute or self.ordering, in that order.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering = ('pk',)
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None, ordering=None):
+        def fetch(ordering, position, limit):
+            rows = queryset.order_by(*ordering)
+            if position is not None:
+                try:
+                    rows = rows.filter(self.after(ordering, position))
+                except (TypeError, ValueError, ValidationError):
+                    # A cursor from another endpoint, or one that was edited by hand
+                    raise NotFound(self.invalid_cursor_message)
+            return list(rows[:limit])
+
+        return self.paginate(fetch, request, view=view, ordering=ordering, count=queryset.count)
+
+    def paginate(self, fetch, request, view=None, ordering=None, count=None):
+        """
+        Paginate rows read by fetch(ordering, position, limit): the first
+        limit rows after position (None: from the start) in ordering. count
+        returns the total for ?count=true.
+        """
+        self.request = request
+        self.ordering = tuple(ordering or getattr(view, 'keyset_ordering', None) or self.ordering)
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        self.count = None
+        if count is not None and getattr(view, 'allow_count', False) and request.query_params.get(self.count_query_param, '').lower() == 'true':
+            self.count = count()
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(flip(field) for field in ordering)
+
+        # One extra row tells whether there is another page in this direction
+        results = fetch(ordering, position, self.page_size + 1)
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.first_position = self.position(results[0]) if results else None
+        self.last_position = self.position(results[-1]) if results else None
+        if not results and position is not None:
+            # Paging past the end: point back at where the client came from
+            self.first_position = self.last_position = position
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def after(self, ordering, position):
+        """
+        Build the row value comparison (a, b, c) > (x, y, z) as
+        a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        with > turned into < for descending fields. The redundant a >= x in
+        front lets the database seek the index instead of scanning it.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        first = ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': position[0]}) & condition
+
+    def position(self, obj):
+        if isinstance(obj, dict): # A .values() row
+            return [obj[field.lstrip('-')] for field in self.ordering]
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, position, reverse):
+        data = {'p': position}
+        if reverse:
+            data['r'] = 1
+        raw = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = data['p']
+            reverse = bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_link(self, position, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, reverse))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.get_link(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.get_link(self.first_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+                'count': {'type': 'integer'},
+            },
+        }
+
+
+def flip(field):
+    return field[1:] if field.startswith('-') else '-' + field
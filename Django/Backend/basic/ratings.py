@@ -0,0 +1,58 @@
+"""
+Per-accommodation rating totals.
+
+Accommodation.rating_count, rating_sum and rating_avg summarize the active
+ratings of each accommodation. They are never recomputed with a GROUP BY:
+every rating write turns its change into a (count, sum) delta, and
+update_rating_totals() adds the deltas to the stored totals with an UPDATE
+using F() expressions, so concurrent writers never overwrite each other.
+Rating.save() calls it for inserts, edits and active toggles, and the
+post_delete receiver in signals.py for deletes (including cascades).
+"""
+from collections import defaultdict
+
+from django.db.models import Case, F, FloatField, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+
+from .catalogue import record_changes
+from .versions import bump_objects
+
+
+def update_rating_totals(removed=(), added=()):
+    """
+    Take the (accommodation id, rating) pairs in removed out of the totals and
+    add those in added. One UPDATE per distinct delta, none when nothing changes.
+    """
+    from .models import Accommodation
+
+    deltas = defaultdict(lambda: [0, 0])
+    for accommodation_id, rating in removed:
+        deltas[accommodation_id][0] -= 1
+        deltas[accommodation_id][1] -= rating
+    for accommodation_id, rating in added:
+        deltas[accommodation_id][0] += 1
+        deltas[accommodation_id][1] += rating
+
+    by_delta = defaultdict(list)
+    for accommodation_id, (count, total) in deltas.items():
+        if count or total:
+            by_delta[(count, total)].append(accommodation_id)
+    for (count, total), accommodation_ids in by_delta.items():
+        # Every right hand side reads the row as it was before this UPDATE
+        new_count = F('rating_count') + count
+        new_sum = F('rating_sum') + total
+        Accommodation.objects.filter(pk__in=accommodation_ids).update(
+            rating_count=new_count,
+            rating_sum=new_sum,
+            rating_avg=Case(
+                When(GreaterThan(new_count, 0), then=Cast(new_sum, FloatField()) / new_count),
+                default=None,
+                output_field=FloatField(),
+            ),
+        )
+    if by_delta:
+        # update() sends no post_save, the accommodations' representations changed
+        changed = [pk for pks in by_delta.values() for pk in pks]
+        record_changes(changed)
+        bump_objects(Accommodation, changed)
@@ -0,0 +1,142 @@
+"""
+Weighted "best for me" recommendations.
+
+Each active accommodation gets a score between 0 and 1 from its price,
+its distance to a campus, its rating and its number of bedrooms, weighted
+as the student asks. Such a score cannot be read from an index, so instead
+of sorting with an SQL expression every request is answered from a
+columnar snapshot in memory: one NumPy array per attribute, already scaled
+to 0 (worst) .. 1 (best). Scoring is then one matrix-vector product over
+all the rows and the top k are picked with argpartition, a few
+milliseconds however the weights are chosen.
+
+The snapshot is built on first use and tagged with the accommodation and
+campus collection stamps (see versions.py), which every save, delete and
+bulk write bumps. A request whose stamps differ rebuilds it, so a
+recommendation never reflects older data than its ETag claims.
+"""
+import threading
+
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from .distances import haversine
+from .versions import collection_key, current_stamps
+
+# Scored attributes, in the order of the weights
+CRITERIA = ('price', 'distance', 'rating', 'bedrooms')
+
+
+def scaled(values, higher_is_better=True):
+    """
+    Scale values to 0 .. 1, 1 being the best. Missing values (NaN) stay NaN.
+    All equal values score 1, they cannot change the order.
+    """
+    low, high = np.nanmin(values, initial=np.inf), np.nanmax(values, initial=-np.inf)
+    if not high > low:
+        return np.where(np.isnan(values), np.nan, 1.0)
+    if higher_is_better:
+        return (values - low) / (high - low)
+    return (high - values) / (high - low)
+
+
+class Snapshot:
+    """
+    The scaled attributes of the active accommodations, row i being ids[i].
+    Never changed once built except for the per campus distance cache.
+    """
+
+    def __init__(self, rows, campuses, version=None):
+        columns = [np.array(column, dtype=float) for column in zip(*rows)] or [np.empty(0)] * 6
+        ids, price, rating, bedrooms, self.latitude, self.longitude = columns
+        self.ids = ids.astype(np.int64)
+        rating = scaled(rating)
+        # Unrated accommodations score as an average rated one rather than the worst
+        rating[np.isnan(rating)] = np.nanmean(rating) if not np.isnan(rating).all() else 0.5
+        # price, rating, bedrooms: the weights of the rows besides distance
+        self.features = np.vstack([scaled(price, higher_is_better=False), rating, scaled(bedrooms)])
+        self.campuses = campuses # Code -> (latitude, longitude)
+        self.distances = {} # Code -> scaled distance, computed when first asked for
+        self.version = version
+
+    def distance(self, code):
+        """
+        Scaled distance to the campus with this code; rows without coordinates score 0.
+        """
+        if code not in self.distances:
+            latitude, longitude = self.campuses[code]
+            distance = scaled(haversine(latitude, longitude, self.latitude, self.longitude), higher_is_better=False)
+            self.distances[code] = np.nan_to_num(distance, nan=0.0)
+        return self.distances[code]
+
+    def scores(self, weights, campus):
+        """
+        Score of every row: the weighted mean of its scaled attributes.
+        weights maps CRITERIA to weights >= 0, not all 0.
+        """
+        total = sum(weights.values())
+        scores = np.array([weights['price'], weights['rating'], weights['bedrooms']]) @ self.features
+        if weights['distance']:
+            scores += weights['distance'] * self.distance(campus)
+        return scores / total
+
+    def top(self, weights, campus, k):
+        """
+        [(pk, score)] of the k best rows, best first, ties going to the lowest pk.
+        campus must be one of the codes in self.campuses.
+        """
+        scores = self.scores(weights, campus)
+        if k < len(scores):
+            # The k best in no particular order, then whatever ties with the worst of them
+            cutoff = scores[np.argpartition(-scores, k - 1)[:k]].min()
+            rows = np.flatnonzero(scores >= cutoff)
+        else:
+            rows = np.arange(len(scores))
+        rows = rows[np.lexsort((self.ids[rows], -scores[rows]))][:k]
+        return list(zip(self.ids[rows].tolist(), scores[rows].tolist()))
+
+
+class Recommender:
+    """
+    The process wide Snapshot, rebuilt whenever the stamps moved on.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    def load(self, version):
+        from .models import Accommodation, Campus
+
+        rows = Accommodation.objects.filter(active=True).order_by().values_list(
+            # Floats rather than Decimals, a third cheaper to fetch
+            'pk', Cast('price_per_month', FloatField()), 'rating_avg', 'no_of_bedrooms', 'latitude', 'longitude',
+        )
+        campuses = {code: (latitude, longitude) for code, latitude, longitude in Campus.objects.values_list('code', 'latitude', 'longitude')}
+        return Snapshot(list(rows), campuses, version)
+
+    def current(self):
+        """
+        The snapshot of the data as it is now: one stamp lookup, plus a
+        rebuild if anything changed since the last one.
+        """
+        from .models import Accommodation, Campus
+
+        keys = [collection_key(Accommodation), collection_key(Campus)]
+        # updated_at too: a rolled back write may reuse a version number
+        version = tuple((stamp.version, stamp.updated_at) for stamp in current_stamps(keys, ensure=keys))
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.version != version:
+            with self.lock:
+                if self.snapshot is None or self.snapshot.version != version:
+                    self.snapshot = self.load(version)
+                snapshot = self.snapshot
+        return snapshot
+
+    def clear(self):
+        with self.lock:
+            self.snapshot = None
+
+
+recommender = Recommender()
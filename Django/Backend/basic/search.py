@@ -0,0 +1,189 @@
+"""
+Full-text search over SQLite FTS5 tables.
+
+rest_framework's SearchFilter turns ?search= into LIKE '%term%' on every
+search field, joined ones included, which scans the whole table. Here the
+text columns that are searched (building names, managers, member names and
+rating comments) are copied into FTS5 tables keyed by the rowid of their
+object, and FullTextSearchFilter turns each search term into a MATCH on
+those. A term matches the words starting with it (case and accent
+insensitive) rather than any substring.
+
+The tables are created by migration 0020 and kept in sync by the
+post_save / post_delete receivers in signals.py; the bulk imports in
+ingest.py add their rows themselves. `python manage.py rebuild_search_index`
+refills them from scratch. On a database without FTS5 (or another vendor)
+the filter falls back to SearchFilter.
+"""
+import re
+
+from django.db import OperationalError, connection
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+# An FTS5 token needs at least one letter or digit, terms without one are searched with LIKE
+TOKEN = re.compile(r'\w')
+
+_available = set() # Databases known to have the tables
+
+
+class SearchIndex:
+    """
+    FTS5 table holding the text fields of one model, rowid = the object's pk.
+    """
+
+    def __init__(self, label, table, fields):
+        self.label = label
+        self.table = table
+        self.fields = fields
+
+    @property
+    def model(self):
+        from django.apps import apps
+
+        return apps.get_model(self.label)
+
+    def index(self, objects):
+        """
+        Add objects to the index, replacing their previous text.
+        """
+        rows = [(obj.pk, *(getattr(obj, field) or '' for field in self.fields)) for obj in objects]
+        if not rows or not fts_available():
+            return
+        placeholders = ', '.join(['%s'] * (len(self.fields) + 1))
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [row[:1] for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, {", ".join(self.fields)}) VALUES ({placeholders})', rows,
+            )
+
+    def remove(self, pks):
+        pks = list(pks)
+        if not pks or not fts_available():
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in pks])
+
+    def rebuild(self):
+        """
+        Refill the table from the model's table. Returns the number of rows.
+        """
+        db_table = self.model._meta.db_table
+        columns = ', '.join(self.fields)
+        values = ', '.join(f"COALESCE({field}, '')" for field in self.fields)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(f'INSERT INTO {self.table} (rowid, {columns}) SELECT id, {values} FROM {db_table}')
+            return cursor.rowcount
+
+    def query(self, terms, fields=None):
+        """
+        FTS5 query matching rows where every term starts a word of fields.
+        """
+        columns = ' '.join(fields or self.fields)
+        phrases = ' AND '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        return f'{{{columns}}} : ({phrases})'
+
+    def matching(self, terms, fields=None):
+        """
+        Subquery of the pks matching terms, for pk__in= and foreign key __in= lookups.
+        """
+        return RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [self.query(terms, fields)])
+
+    def relevance(self, terms):
+        """
+        Expression for the bm25 rank (lower is more relevant) of each row of
+        the model's queryset matching terms, None for the others.
+        """
+        db_table = self.model._meta.db_table
+        return RawSQL(
+            f'SELECT rank FROM {self.table} WHERE {self.table} MATCH %s AND rowid = "{db_table}"."id"',
+            [self.query(terms)],
+        )
+
+
+INDEXES = {
+    index.label: index for index in (
+        SearchIndex('basic.accommodation', 'basic_accommodation_fts', ('building_name', 'managed_by')),
+        SearchIndex('basic.member', 'basic_member_fts', ('name',)),
+        SearchIndex('basic.rating', 'basic_rating_fts', ('comment',)),
+    )
+}
+
+
+def index_for(model):
+    return INDEXES.get(model._meta.label_lower)
+
+
+def fts_available():
+    """
+    Whether the FTS tables exist in the default database.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _available:
+        # Only a positive answer is remembered: the tables may be migrated in later
+        try:
+            tables = connection.introspection.table_names()
+        except OperationalError:
+            return False
+        if not all(index.table in tables for index in INDEXES.values()):
+            return False
+        _available.add(name)
+    return True
+
+
+def token_terms(terms):
+    return [term for term in terms if TOKEN.search(term)]
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter answering ?search= from the FTS tables. Each term has to
+    match one of the view's search_fields, as with SearchFilter. Fields of
+    an indexed model (the queryset's own or one reached through foreign
+    keys, e.g. 'accommodation__building_name') are looked up in its FTS
+    table, fields with choices against the choices, and anything else with
+    SearchFilter's LIKE.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms or not fts_available():
+            return super().filter_queryset(request, queryset, view)
+        for term in search_terms:
+            queryset = queryset.filter(self.term_condition(queryset, [str(field) for field in search_fields], term))
+        return queryset
+
+    def term_condition(self, queryset, search_fields, term):
+        """
+        Q matching the rows where one of search_fields matches term.
+        """
+        condition = Q()
+        indexed = {} # (relation path, index) -> field names, searched with a single MATCH
+        for field_name in search_fields:
+            if field_name[0] in self.lookup_prefixes:
+                condition |= Q(**{self.construct_search(field_name, queryset): term})
+                continue
+            *path, name = field_name.split(LOOKUP_SEP)
+            model = queryset.model
+            for part in path:
+                model = model._meta.get_field(part).related_model
+            index = index_for(model)
+            if index is not None and name in index.fields and TOKEN.search(term):
+                indexed.setdefault((LOOKUP_SEP.join(path), index), []).append(name)
+                continue
+            field = model._meta.get_field(name)
+            if field.choices:
+                # A handful of stored values, no need to scan for them
+                values = [value for value, _ in field.flatchoices if term.lower() in str(value).lower()]
+                condition |= Q(**{f'{field_name}__in': values})
+            else:
+                condition |= Q(**{self.construct_search(field_name, queryset): term})
+        for (path, index), names in indexed.items():
+            condition |= Q(**{f'{path}__in' if path else 'pk__in': index.matching([term], names)})
+        return condition
@@ -1,10 +1,31 @@
 from rest_framework import serializers
-from .models import Accommodation, Member, Reservation, Rating
+from .models import Accommodation, Member, Reservation, Rating, Campus
+from .recommend import CRITERIA
+
+class SparseFieldsMixin:
+    """
+    Accepts a fields= argument listing the field names to keep; the others
+    are dropped before anything is serialized.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class AccommodationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Compact representation used by the list style endpoints unless ?fields= asks for more
+    LIST_FIELDS = [
+        'id', 'room_number', 'flat_number', 'floor_number', 'building_name',
+        'availability_start', 'availability_end', 'number_of_beds', 'no_of_bedrooms',
+        'type_of_accommodation', 'price_per_month', 'active', 'rating_avg', 'rating_count',
+    ]
 
-class AccommodationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Accommodation
-        fields = '__all__' # Include all fields from the model
+        exclude = ['grid_cell', 'rating_sum'] # Include all fields from the model except the internal spatial index and rating total
+        read_only_fields = ['geocode_status'] # Maintained by Accommodation.save() and the geocode worker
 
 class MemberSerializer(serializers.ModelSerializer):
     class Meta:
@@ -23,7 +44,102 @@ class ReservationSerializer(serializers.ModelSerializer):
         fields = '__all__' # Or specify fields: ['id', 'accommodation', 'start_date', 'end_date', 'member', 'status']
 
 
+class BulkStatusSerializer(serializers.Serializer):
+    """
+    Input of the reservation bulk_status action: which reservations (ids
+    and/or all of one accommodation) and the new active and/or status.
+    """
+    MAX_IDS = 5000
+
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=MAX_IDS)
+    accommodation = serializers.PrimaryKeyRelatedField(queryset=Accommodation.objects.all(), required=False)
+    active = serializers.BooleanField(required=False)
+    status = serializers.ChoiceField(choices=Reservation.STATUS_CHOICES, required=False)
+
+    def validate(self, data):
+        if 'ids' not in data and 'accommodation' not in data:
+            raise serializers.ValidationError("Select reservations with ids and/or accommodation.")
+        if 'active' not in data and 'status' not in data:
+            raise serializers.ValidationError("Give a new active and/or status.")
+        return data
+
+
+class FacetFilterSerializer(serializers.Serializer):
+    """
+    Query parameters of the accommodation faceted_search action. List
+    filters are repeated parameters (?number_of_beds=1&number_of_beds=2)
+    and match any of their values.
+    """
+    MAX_VALUES = 100
+
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False) # Exclusive
+    number_of_beds = serializers.ListField(child=serializers.IntegerField(min_value=0), required=False, max_length=MAX_VALUES)
+    no_of_bedrooms = serializers.ListField(child=serializers.IntegerField(min_value=0), required=False, max_length=MAX_VALUES)
+    type_of_accommodation = serializers.ListField(child=serializers.CharField(), required=False, max_length=MAX_VALUES)
+    managed_by = serializers.ListField(child=serializers.CharField(), required=False, max_length=MAX_VALUES)
+    campus = serializers.SlugRelatedField(slug_field='code', queryset=Campus.objects.all(), required=False) # Default HKU
+    max_distance = serializers.FloatField(min_value=0, required=False) # km from campus
+
+    def validate(self, data):
+        if data.get('min_price') is not None and data.get('max_price') is not None and data['min_price'] >= data['max_price']:
+            raise serializers.ValidationError({'max_price': "Must be greater than min_price."})
+        return data
+
+
+class ListFilterSerializer(FacetFilterSerializer):
+    """
+    Query parameters of the accommodation list: the faceted_search filters,
+    ?active= and ?ordering= (see AccommodationViewSet.list_orderings).
+    """
+    ORDERINGS = ('price_per_month', '-price_per_month', 'availability_start', '-availability_start', 'relevance')
+
+    active = serializers.BooleanField(required=False, allow_null=True, default=None) # None: either
+    ordering = serializers.ChoiceField(choices=ORDERINGS, required=False) # Default: by building
+
+
+class RecommendationSerializer(serializers.Serializer):
+    """
+    Query parameters of the accommodation recommend action: how much each
+    criterion weighs (see recommend.py), the campus and how many results.
+    """
+    price_weight = serializers.FloatField(min_value=0, default=1) # Cheaper is better
+    distance_weight = serializers.FloatField(min_value=0, default=1) # Closer to campus is better
+    rating_weight = serializers.FloatField(min_value=0, default=1) # Better rated is better
+    bedrooms_weight = serializers.FloatField(min_value=0, default=1) # More bedrooms is better
+    campus = serializers.CharField(default='HKU') # Campus code
+    k = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, data):
+        if not any(data[f'{name}_weight'] for name in CRITERIA):
+            raise serializers.ValidationError("Give at least one weight above 0.")
+        return data
+
+
 class RatingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Rating
-        fields = '__all__' # Or specify fields: ['id', 'accommodation', 'member', 'rating', 'comment']
\ No newline at end of file
+        fields = '__all__' # Or specify fields: ['id', 'accommodation', 'member', 'rating', 'comment']
+
+class RatingImportSerializer(RatingSerializer):
+    """
+    Validates one row of a bulk rating import without any query: the
+    references, eligibility and duplicates are checked for a whole batch
+    at once by ingest.ingest_ratings().
+    """
+    accommodation = serializers.IntegerField()
+    member = serializers.IntegerField()
+
+    class Meta(RatingSerializer.Meta):
+        validators = [] # No unique_together query per row
+
+    def validate_rating(self, value):
+        # Same rule as Rating.clean()
+        if not 1 <= value <= 5:
+            raise serializers.ValidationError("Rating must be between 1 and 5.")
+        return value
+
+class CampusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Campus
+        fields = '__all__'
@@ -0,0 +1,82 @@
+"""
+Keep the version stamps in versions.py (and through them the occupancy
+index), the rating totals in ratings.py, the search tables in search.py and
+the autocomplete names in autocomplete.py and the catalogue change log in
+catalogue.py current. Connected in
+apps.BasicConfig.ready().
+"""
+from django.db.models.signals import post_delete, post_save
+
+from .autocomplete import autocomplete
+from .catalogue import record_changes
+from .models import Accommodation, Campus, Member, Rating, Reservation
+from .occupancy import bookings_key
+from .ratings import update_rating_totals
+from .search import INDEXES, index_for
+from .versions import bump, bump_objects
+
+# Models served with ETags, plus the ones their lists search on (member and
+# building names) or are measured against (campuses)
+VERSIONED_MODELS = (Accommodation, Reservation, Rating, Member, Campus)
+
+
+def record_catalogue_change(sender, instance, **kwargs):
+    record_changes([instance.pk])
+
+
+def record_write(sender, instance, **kwargs):
+    bump_objects(sender, [instance.pk])
+
+
+def record_booking(sender, instance, **kwargs):
+    # Both the old and the new accommodation of a moved reservation changed
+    accommodation_ids = {instance.accommodation_id, instance._original_accommodation_id} - {None}
+    bump(*(bookings_key(pk) for pk in accommodation_ids))
+    instance._original_accommodation_id = instance.accommodation_id
+
+
+def remove_rating(sender, instance, **kwargs):
+    # A receiver rather than Rating.delete(), which cascades and queryset deletes skip
+    if instance._counted:
+        update_rating_totals(removed=[instance._counted])
+        instance._counted = None
+
+
+def index_text(sender, instance, update_fields=None, **kwargs):
+    index = index_for(sender)
+    if update_fields is not None and not set(update_fields) & set(index.fields):
+        return # The indexed text did not change
+    index.index([instance])
+
+
+def unindex_text(sender, instance, **kwargs):
+    index_for(sender).remove([instance.pk])
+
+
+def record_name(sender, instance, created=False, update_fields=None, **kwargs):
+    if created:
+        autocomplete.changed(added=[instance.building_name])
+    elif (update_fields is None or 'building_name' in update_fields) and instance.building_name != instance._original_building_name:
+        # Accommodation.save() updates _original_building_name after post_save
+        autocomplete.changed(removed=[instance._original_building_name], added=[instance.building_name])
+
+
+def remove_name(sender, instance, **kwargs):
+    autocomplete.changed(removed=[instance._original_building_name])
+
+
+def connect():
+    # Before the stamps: a process that sees the new stamp must find the change logged
+    post_save.connect(record_catalogue_change, sender=Accommodation, dispatch_uid='catalogue_save')
+    post_delete.connect(record_catalogue_change, sender=Accommodation, dispatch_uid='catalogue_delete')
+    for model in VERSIONED_MODELS:
+        post_save.connect(record_write, sender=model, dispatch_uid=f'version_save_{model._meta.model_name}')
+        post_delete.connect(record_write, sender=model, dispatch_uid=f'version_delete_{model._meta.model_name}')
+    post_save.connect(record_booking, sender=Reservation, dispatch_uid='bookings_save')
+    post_delete.connect(record_booking, sender=Reservation, dispatch_uid='bookings_delete')
+    post_delete.connect(remove_rating, sender=Rating, dispatch_uid='rating_totals_delete')
+    for index in INDEXES.values():
+        post_save.connect(index_text, sender=index.model, dispatch_uid=f'search_save_{index.table}')
+        post_delete.connect(unindex_text, sender=index.model, dispatch_uid=f'search_delete_{index.table}')
+    post_save.connect(record_name, sender=Accommodation, dispatch_uid='autocomplete_save')
+    post_delete.connect(remove_name, sender=Accommodation, dispatch_uid='autocomplete_delete')
@@ -0,0 +1,92 @@
+"""
+Grid based spatial index for accommodations.
+
+Every geocoded accommodation stores the grid cell its coordinates fall in
+(Accommodation.grid_cell, indexed). Cells are GRID_SIZE degrees square and
+numbered row by row, so the cells of one grid row form a contiguous integer
+range. A radius query only reads the rows in the few cell ranges covering
+the circle's bounding box, then keeps the exact matches with a vectorized
+haversine.
+"""
+import math
+
+import numpy as np
+from django.db.models import Q
+
+from .distances import haversine
+
+GRID_SIZE = 0.01 # Degrees, about 1.1 km north-south and 1 km east-west in Hong Kong
+GRID_COLUMNS = int(round(360 / GRID_SIZE))
+
+KM_PER_DEGREE = 6371 * math.pi / 180 # Along a meridian
+
+# nearest() widens its search radius until it finds enough listings or reaches this
+MAX_SEARCH_RADIUS_KM = 100
+
+
+def grid_cell(latitude, longitude):
+    """
+    Return the grid cell number for a coordinate, or None if it is missing.
+    """
+    if latitude is None or longitude is None:
+        return None
+    row = math.floor((latitude + 90) / GRID_SIZE)
+    column = min(math.floor((longitude + 180) / GRID_SIZE), GRID_COLUMNS - 1)
+    return row * GRID_COLUMNS + column
+
+
+def cell_ranges(latitude, longitude, radius_km):
+    """
+    Return (first, last) cell number ranges, one per grid row, covering a
+    circle of radius_km around the point.
+    """
+    delta_lat = radius_km / KM_PER_DEGREE
+    delta_lon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    first_row = math.floor((max(latitude - delta_lat, -90) + 90) / GRID_SIZE)
+    last_row = math.floor((min(latitude + delta_lat, 90) + 90) / GRID_SIZE)
+    first_column = max(math.floor((longitude - delta_lon + 180) / GRID_SIZE), 0)
+    last_column = min(math.floor((longitude + delta_lon + 180) / GRID_SIZE), GRID_COLUMNS - 1)
+    ranges = []
+    for row in range(first_row, last_row + 1):
+        base = row * GRID_COLUMNS
+        ranges.append((base + first_column, base + last_column))
+    return ranges
+
+
+def _candidates(queryset, latitude, longitude, radius_km):
+    condition = Q()
+    for first, last in cell_ranges(latitude, longitude, radius_km):
+        condition |= Q(grid_cell__range=(first, last))
+    rows = list(queryset.filter(condition).values_list('pk', 'latitude', 'longitude'))
+    if not rows:
+        return np.array([], dtype=np.int64), np.array([], dtype=float)
+    ids, lats, lons = (np.array(column) for column in zip(*rows))
+    return ids, haversine(latitude, longitude, lats, lons)
+
+
+def within_radius(queryset, latitude, longitude, radius_km, limit=None):
+    """
+    Return [(pk, distance in km)] for accommodations within radius_km of
+    the point, closest first (ties broken by pk).
+    """
+    ids, distances = _candidates(queryset, latitude, longitude, radius_km)
+    inside = distances <= radius_km
+    ids, distances = ids[inside], distances[inside]
+    order = np.lexsort((ids, distances))
+    if limit is not None:
+        order = order[:limit]
+    return list(zip(ids[order].tolist(), distances[order].tolist()))
+
+
+def nearest(queryset, latitude, longitude, k, max_radius_km=MAX_SEARCH_RADIUS_KM):
+    """
+    Return [(pk, distance in km)] for the k accommodations closest to the
+    point, closest first. The search radius doubles from 1 km until k
+    listings lie inside it, so sparse areas cost a few extra queries.
+    """
+    radius_km = 1.0
+    while True:
+        found = within_radius(queryset, latitude, longitude, radius_km, limit=k)
+        if len(found) >= k or radius_km >= max_radius_km:
+            return found
+        radius_km = min(radius_km * 2, max_radius_km)
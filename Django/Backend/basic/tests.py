@@ -1,15 +1,65 @@
+import base64
 import datetime
+import io
+import json
+import os
+import tempfile
 from unittest.mock import patch, MagicMock
-from django.test import TestCase
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.core.cache import caches
+from django.core import mail
+from django.core.mail import get_connection
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from .models import Accommodation, Member, Reservation, Rating
+from .models import Accommodation, Member, Reservation, Rating, GeocodeCache, Campus, GeocodeJob, NotificationOutbox, CatalogueChange
+from .notifications import queue_email, send_queued_emails
+from .geocode_queue import process_geocode_jobs, _resolve
+from .occupancy import Intervals, occupancy
+from .autocomplete import NAMES_KEY, NameIndex, autocomplete
+from .recommend import CRITERIA, recommender
+from .catalogue import engine as catalogue_engine
+from .ratings import update_rating_totals
+from .versions import bump
+from .distances import LEGACY_DISTANCE_FIELDS, haversine, round_sig
+from .serializers import AccommodationSerializer
+from .spatial import grid_cell
+from .geocoding import (
+    Geocoder, GazetteerGeocoder, cache_stats, get_lat_long, get_transformer, hk1980_to_wgs84, hk1980_to_wgs84_many, normalize_address, reset_cache_stats,
+)
 
 # filepath: Django/Backend/basic/test_models.py
 from django.core.mail import send_mail # Import send_mail for mocking check
 
 # Use relative import based on the project structure
 
+def create_accommodation(**overrides):
+    """Create an accommodation offered for the next 100 days, with any field overridden."""
+    data = {
+        'flat_number': '1A',
+        'floor_number': 1,
+        'building_name': 'Test Building',
+        'availability_start': datetime.date.today(),
+        'availability_end': datetime.date.today() + datetime.timedelta(days=100),
+        'type_of_accommodation': 'Single',
+        'price_per_month': 5000.00,
+        'managed_by': 'UniHaven Test',
+    }
+    data.update(overrides)
+    return Accommodation.objects.create(**data)
+
+
+def reserve(accommodation, member, start, end, **overrides):
+    """Create a reservation of accommodation from start to end, 'Not Signed' unless overridden."""
+    data = {'accommodation': accommodation, 'member': member, 'status': 'Not Signed', 'start_date': start, 'end_date': end}
+    data.update(overrides)
+    return Reservation.objects.create(**data)
+
+
 class MemberModelTests(TestCase):
     """Tests for the Member model."""
 
@@ -47,9 +97,8 @@ class MemberModelTests(TestCase):
             Member.objects.get(pk=member_id)
 
 # Mock external dependencies for Accommodation tests
-@patch('basic.models.googlemaps.Client') # Mock the googlemaps client
-@patch('basic.models.requests.get') # Mock requests.get used in get_lat_long
-@patch('basic.models.pyproj.Transformer') # Mock pyproj Transformer
+@patch('basic.geocoding.requests.get') # Mock requests.get used in get_lat_long
+@patch('basic.geocoding.get_transformer') # Mock pyproj Transformer
 class AccommodationModelTests(TestCase):
     """Tests for the Accommodation model."""
 
@@ -68,12 +117,9 @@ class AccommodationModelTests(TestCase):
             'managed_by': 'UniHaven Test',
         }
 
-    def test_accommodation_creation(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_accommodation_creation(self, mock_transformer, mock_requests_get):
         """Test creating an Accommodation instance with mocked external calls."""
         # Configure mocks
-        mock_gmaps_instance = mock_gmaps_client.return_value
-        mock_gmaps_instance.geocode.return_value = [{'geometry': {'location': {'lat': 22.2830, 'lng': 114.1365}}}] # Mock geocode if used
-
         # Mock the response from geodata.gov.hk API
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -82,7 +128,7 @@ class AccommodationModelTests(TestCase):
         mock_requests_get.return_value = mock_response
 
         # Mock the coordinate transformation result (WGS84 lat/lon)
-        mock_transformer_instance = mock_transformer.from_crs.return_value
+        mock_transformer_instance = mock_transformer.return_value
         mock_transformer_instance.transform.return_value = (114.1365621, 22.2830891) # lon, lat
 
         # Create accommodation - this will trigger the save method and mocked calls
@@ -104,37 +150,66 @@ class AccommodationModelTests(TestCase):
         mock_transformer_instance.transform.assert_called_once()
 
 
-    def test_accommodation_update(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_accommodation_update(self, mock_transformer, mock_requests_get):
         """Test updating an Accommodation instance."""
         # Configure mocks as in creation test
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = [{'x': 833500, 'y': 816500}]
         mock_requests_get.return_value = mock_response
-        mock_transformer_instance = mock_transformer.from_crs.return_value
+        mock_transformer_instance = mock_transformer.return_value
         mock_transformer_instance.transform.return_value = (114.1365621, 22.2830891)
 
         accommodation = Accommodation.objects.create(**self.accommodation_data)
         accommodation.price_per_month = 6500.00
         accommodation.active = False
-        accommodation.save() # Save triggers mocks again
+        accommodation.save() # Building is served from the geocode cache
 
         updated_accommodation = Accommodation.objects.get(pk=accommodation.pk)
         self.assertEqual(updated_accommodation.price_per_month, 6500.00)
         self.assertFalse(updated_accommodation.active)
-        # Ensure mocks were called multiple times (creation + update)
-        self.assertEqual(mock_requests_get.call_count, 2)
-        self.assertEqual(mock_transformer_instance.transform.call_count, 2)
+        # Ensure the external API was only called on creation
+        self.assertEqual(mock_requests_get.call_count, 1)
+        self.assertEqual(mock_transformer_instance.transform.call_count, 1)
 
 
-    def test_accommodation_deletion(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_accommodation_update_skips_geocoding(self, mock_transformer, mock_requests_get):
+        """Test saving without changing building_name does not geocode again."""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = [{'x': 833500, 'y': 816500}]
+        mock_requests_get.return_value = mock_response
+        mock_transformer.return_value.transform.return_value = (114.1365621, 22.2830891)
+
+        accommodation = Accommodation.objects.create(**self.accommodation_data)
+        with patch('basic.models.geocode') as mock_geocode:
+            accommodation.price_per_month = 7000.00
+            accommodation.active = False
+            accommodation.save()
+            # Reloaded instances snapshot building_name too
+            reloaded = Accommodation.objects.get(pk=accommodation.pk)
+            reloaded.number_of_beds = 2
+            reloaded.save()
+            Accommodation.objects.get(pk=accommodation.pk).save(update_fields=['active'])
+            mock_geocode.assert_not_called()
+
+            mock_geocode.return_value = (22.3964, 114.2002)
+            reloaded.building_name = 'Moved Building'
+            reloaded.save()
+            mock_geocode.assert_called_once_with('Moved Building')
+
+        moved = Accommodation.objects.get(pk=accommodation.pk)
+        self.assertEqual(moved.latitude, 22.3964)
+        self.assertLess(moved.distance_to_CUHKcampus, 0.1)
+
+    def test_accommodation_deletion(self, mock_transformer, mock_requests_get):
         """Test deleting an Accommodation instance."""
         # Configure mocks
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = [{'x': 833500, 'y': 816500}]
         mock_requests_get.return_value = mock_response
-        mock_transformer_instance = mock_transformer.from_crs.return_value
+        mock_transformer_instance = mock_transformer.return_value
         mock_transformer_instance.transform.return_value = (114.1365621, 22.2830891)
 
         accommodation = Accommodation.objects.create(**self.accommodation_data)
@@ -143,10 +218,1723 @@ class AccommodationModelTests(TestCase):
         with self.assertRaises(Accommodation.DoesNotExist):
             Accommodation.objects.get(pk=accommodation_id)
 
+@patch('basic.geocoding.requests.get')
+@patch('basic.geocoding.get_transformer')
+class GeocodeCacheTests(TestCase):
+    """Tests for the geocode cache in front of Accommodation.save()."""
+
+    def setUp(self):
+        reset_cache_stats()
+
+    def configure_mocks(self, mock_transformer, mock_requests_get):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = [{'x': 833500, 'y': 816500}]
+        mock_requests_get.return_value = mock_response
+        mock_transformer.return_value.transform.return_value = (114.1365621, 22.2830891)
+
+    def test_same_building_is_served_from_cache(self, mock_transformer, mock_requests_get):
+        """Test a second flat in the same building does not call the API again."""
+        self.configure_mocks(mock_transformer, mock_requests_get)
+        first = create_accommodation(building_name='Cache Tower')
+        second = create_accommodation(building_name='  cache   TOWER ', flat_number='2B') # Same address after normalization
+        self.assertEqual(mock_requests_get.call_count, 1)
+        self.assertEqual((first.latitude, first.longitude), (second.latitude, second.longitude))
+
+        entry = GeocodeCache.objects.get(address=normalize_address('Cache Tower'))
+        self.assertEqual(entry.hits, 1)
+        stats = cache_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    @override_settings(GEOCODE_CACHE_TTL=0)
+    def test_expired_entry_is_refreshed(self, mock_transformer, mock_requests_get):
+        """Test entries older than the TTL are looked up again."""
+        self.configure_mocks(mock_transformer, mock_requests_get)
+        create_accommodation(building_name='Expiring Tower')
+        create_accommodation(building_name='Expiring Tower', flat_number='2B')
+        self.assertEqual(mock_requests_get.call_count, 2)
+        self.assertEqual(GeocodeCache.objects.count(), 1)
+
+    @override_settings(GEOCODE_CACHE_MAX_ENTRIES=2)
+    def test_least_recently_used_entry_is_evicted(self, mock_transformer, mock_requests_get):
+        """Test the least recently used address is evicted when the cache is full."""
+        self.configure_mocks(mock_transformer, mock_requests_get)
+        create_accommodation(building_name='Tower A')
+        create_accommodation(building_name='Tower B')
+        create_accommodation(building_name='Tower A', flat_number='2B') # Tower A is now more recently used than Tower B
+        create_accommodation(building_name='Tower C')
+        self.assertEqual(
+            set(GeocodeCache.objects.values_list('address', flat=True)),
+            {'tower a', 'tower c'}
+        )
+
+
+class CoordinateTransformTests(TestCase):
+    """Tests for the HK1980 -> WGS84 transformation helpers."""
+
+    def test_grid_origin(self):
+        """Test the HK1980 grid origin (near Tsim Sha Tsui) maps to the expected WGS84 position."""
+        lat, lon = hk1980_to_wgs84(836694.05, 819069.80)
+        self.assertAlmostEqual(lat, 22.3106, places=3)
+        self.assertAlmostEqual(lon, 114.1810, places=3)
+
+    def test_batch_matches_single(self):
+        """Test the vectorized transform agrees with the single point transform."""
+        eastings = [833500, 836694.05, 840000]
+        northings = [816500, 819069.80, 825000]
+        lats, lons = hk1980_to_wgs84_many(eastings, northings)
+        self.assertEqual(len(lats), 3)
+        for easting, northing, lat, lon in zip(eastings, northings, lats, lons):
+            self.assertEqual(hk1980_to_wgs84(easting, northing), (lat, lon))
+
+    def test_transformer_is_cached(self):
+        """Test the transformer is only built once per thread."""
+        self.assertIs(get_transformer(), get_transformer())
+
+
+@patch('basic.models.geocode', return_value=(22.2830891, 114.1365621))
+class CampusDistanceTests(TestCase):
+    """Tests for the Campus registry and the CampusDistance table."""
+
+    def test_seeded_campuses(self, mock_geocode):
+        """Test the original campuses are seeded with a mirrored distance column each."""
+        self.assertEqual(set(Campus.objects.values_list('code', flat=True)), set(LEGACY_DISTANCE_FIELDS))
+
+    def test_accommodation_save_stores_distances(self, mock_geocode):
+        """Test saving an accommodation fills the distance table and the legacy columns."""
+        accommodation = create_accommodation(building_name='Distance Building')
+        self.assertEqual(accommodation.campus_distances.count(), Campus.objects.count())
+        hku = accommodation.campus_distances.get(campus__code='HKU')
+        self.assertEqual(hku.distance, 0.0)
+        self.assertEqual(accommodation.distance_to_HKUcampus, 0.0)
+        cuhk = accommodation.campus_distances.get(campus__code='CUHK')
+        self.assertEqual(cuhk.distance, accommodation.distance_to_CUHKcampus)
+
+    def test_new_campus_recomputes_without_geocoding(self, mock_geocode):
+        """Test adding a campus computes distances from stored coordinates only."""
+        first = create_accommodation(building_name='Distance Building')
+        second = create_accommodation(building_name='Other Building')
+        mock_geocode.reset_mock()
+        campus = Campus.objects.create(code='PolyU', name='PolyU Campus', latitude=22.3045, longitude=114.1794)
+        mock_geocode.assert_not_called()
+        self.assertEqual(campus.distances.count(), 2)
+        expected = float('{:.4g}'.format(haversine(first.latitude, first.longitude, 22.3045, 114.1794)))
+        self.assertEqual(campus.distances.get(accommodation=second).distance, expected)
+
+    def test_moving_campus_updates_legacy_column(self, mock_geocode):
+        """Test moving one of the original campuses updates its distance_to_* column."""
+        accommodation = create_accommodation(building_name='Distance Building')
+        campus = Campus.objects.get(code='HKUST')
+        campus.latitude, campus.longitude = 22.2830891, 114.1365621
+        campus.save()
+        accommodation.refresh_from_db()
+        self.assertEqual(accommodation.distance_to_HKUSTcampus, 0.0)
+        self.assertEqual(campus.distances.get(accommodation=accommodation).distance, 0.0)
+
+    def test_round_sig_matches_string_formatting(self, mock_geocode):
+        """Test the vectorized rounding agrees with the original '{:.4g}' formatting."""
+        values = [0.0, 0.0123456, 1.23456, 12.3456, 123.456, 7.891011, 31.41592]
+        expected = [float('{:.4g}'.format(value)) for value in values]
+        self.assertEqual(round_sig(values).tolist(), expected)
+
+
+class GazetteerGeocoderTests(TestCase):
+    """Tests for the local gazetteer geocoder and the provider chain."""
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='') as handle:
+            handle.write('name,easting,northing\n')
+            handle.write('Gazetteer Tower Block 1,833500,816500\n')
+            handle.write('Gazetteer Tower Block 2,836694.05,819069.80\n')
+            handle.write("St. Mary's Court,840000,825000\n")
+        self.addCleanup(os.remove, handle.name)
+        self.path = handle.name
+
+    def test_exact_and_prefix_lookup(self):
+        """Test normalized exact matches and prefix matches."""
+        gazetteer = GazetteerGeocoder(self.path)
+        self.assertEqual(len(gazetteer), 3)
+        self.assertEqual(gazetteer.lookup('gazetteer tower, block 2'), hk1980_to_wgs84(836694.05, 819069.80))
+        self.assertEqual(gazetteer.lookup('ST MARYS COURT'), gazetteer.lookup("st marys court")) # Punctuation ignored
+        self.assertEqual(gazetteer.lookup('St Mary'), gazetteer.lookup("St. Mary's Court")) # Unique prefix
+        with self.assertRaises(ValueError):
+            gazetteer.lookup('Unknown Building')
+
+    def test_ambiguous_prefix_is_a_miss(self):
+        """Test a prefix shared by several buildings matches none of them."""
+        with open(self.path, 'a', newline='') as handle:
+            handle.write('Hong Kong Tower,833000,816000\n')
+            handle.write('Ho Man Tin Court,837000,820000\n')
+        gazetteer = GazetteerGeocoder(self.path)
+        for address in ('H', 'Ho', 'Gazetteer Tower'):
+            with self.assertRaises(ValueError):
+                gazetteer.lookup(address)
+        self.assertEqual(gazetteer.lookup('Hong'), hk1980_to_wgs84(833000, 816000))
+        self.assertEqual(gazetteer.lookup('Ho Man'), hk1980_to_wgs84(837000, 820000))
+
+    @patch('basic.geocoding.requests.get')
+    def test_ambiguous_prefix_falls_back_to_geodata(self, mock_requests_get):
+        """Test the provider chain asks the GeoData API when the gazetteer prefix is ambiguous."""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = [{'x': 840000, 'y': 825000}]
+        mock_requests_get.return_value = mock_response
+        with self.settings(GEOCODER_GAZETTEER_PATH=self.path):
+            self.assertEqual(get_lat_long('Gazetteer Tower'), hk1980_to_wgs84(840000, 825000))
+        mock_requests_get.assert_called_once()
+
+    @patch('basic.geocoding.requests.get')
+    def test_gazetteer_hit_skips_network(self, mock_requests_get):
+        """Test the provider chain only calls the GeoData API on a gazetteer miss."""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = [{'x': 840000, 'y': 825000}]
+        mock_requests_get.return_value = mock_response
+
+        with self.settings(GEOCODER_GAZETTEER_PATH=self.path):
+            self.assertEqual(get_lat_long('Gazetteer Tower Block 1'), hk1980_to_wgs84(833500, 816500))
+            mock_requests_get.assert_not_called()
+            self.assertEqual(get_lat_long('Somewhere Else'), hk1980_to_wgs84(840000, 825000))
+            mock_requests_get.assert_called_once()
+
+    @patch('basic.geocoding.requests.get')
+    def test_chain_raises_when_every_provider_misses(self, mock_requests_get):
+        """Test a ValueError is raised when no provider finds the address."""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = []
+        mock_requests_get.return_value = mock_response
+        with self.settings(GEOCODER_GAZETTEER_PATH=self.path):
+            with self.assertRaisesRegex(ValueError, "Could not find location for address: Nowhere Hong Kong"):
+                get_lat_long('Nowhere')
+
+    def test_provider_without_lookup_fails_when_created(self):
+        """Test a provider class that does not implement lookup() cannot be instantiated."""
+        class Incomplete(Geocoder):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+def fake_get_lat_long(address):
+    """Stand-in for the GeoData API used by the bulk import tests."""
+    if 'Nowhere' in address:
+        raise ValueError(f"Could not find location for address: {address} Hong Kong")
+    return (22.3964, 114.2002) if 'CUHK' in address else (22.2830891, 114.1365621)
+
+
+@patch('basic.geocoding.get_lat_long', side_effect=fake_get_lat_long)
+class BulkImportTests(TestCase):
+    """Tests for the bulk accommodation import command and endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.row = {
+            'flat_number': '1A', 'floor_number': 1, 'building_name': 'Bulk Tower',
+            'availability_start': '2025-09-01', 'availability_end': '2026-06-30',
+            'type_of_accommodation': 'Single', 'price_per_month': '5000.00', 'managed_by': 'Bulk Test',
+        }
+
+    def test_json_import_reports_row_errors(self, mock_get_lat_long):
+        """Test valid rows are imported while invalid and unknown rows are reported."""
+        rows = [
+            self.row,
+            dict(self.row, flat_number='2B', building_name='bulk  tower'), # Same building after normalization
+            dict(self.row, price_per_month='not a price'),
+            dict(self.row, building_name='Nowhere Court'),
+            dict(self.row, building_name='Near CUHK Hall'),
+        ]
+        response = self.client.post(reverse('accommodation-bulk-import'), rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4])
+        self.assertIn('price_per_month', response.data['errors'][0]['errors'])
+        # Three distinct buildings, each geocoded once
+        self.assertEqual(mock_get_lat_long.call_count, 3)
+
+        imported = Accommodation.objects.get(building_name='Near CUHK Hall')
+        self.assertLess(imported.distance_to_CUHKcampus, 0.1)
+        self.assertEqual(imported.campus_distances.count(), Campus.objects.count())
+        self.assertEqual(
+            imported.campus_distances.get(campus__code='CUHK').distance, imported.distance_to_CUHKcampus
+        )
+
+    def test_csv_import_uses_geocode_cache(self, mock_get_lat_long):
+        """Test a CSV body is imported and already cached buildings are not looked up again."""
+        GeocodeCache.objects.create(address='bulk tower', latitude=22.2830891, longitude=114.1365621)
+        header = ','.join(self.row)
+        lines = [header] + [','.join(str(value) for value in dict(self.row, flat_number=str(i)).values()) for i in range(5)]
+        response = self.client.generic(
+            'POST', reverse('accommodation-bulk-import'), '\n'.join(lines) + '\n', content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 5)
+        mock_get_lat_long.assert_not_called()
+        self.assertEqual(Accommodation.objects.filter(building_name='Bulk Tower').count(), 5)
+
+    def test_import_command_jsonl(self, mock_get_lat_long):
+        """Test the management command imports a JSON Lines file in batches."""
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            for i in range(5):
+                handle.write(json.dumps(dict(self.row, flat_number=str(i))) + '\n')
+            handle.write('{not json\n')
+        self.addCleanup(os.remove, handle.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_accommodations', handle.name, '--batch-size', '2', stdout=out, stderr=err)
+        self.assertIn('Imported 5 of 6 rows', out.getvalue())
+        self.assertIn('Row 6', err.getvalue())
+        self.assertEqual(Accommodation.objects.count(), 5)
+        self.assertEqual(mock_get_lat_long.call_count, 1)
+
+
+@override_settings(GEOCODE_ASYNC=True, GEOCODE_JOB_MAX_ATTEMPTS=2)
+@patch('basic.geocoding.get_lat_long', side_effect=fake_get_lat_long)
+class AsyncGeocodingTests(TestCase):
+    """Tests for deferred geocoding with GEOCODE_ASYNC enabled."""
+
+    def test_save_is_pending_until_worker_runs(self, mock_get_lat_long):
+        """Test an uncached building is saved as pending and resolved by the worker."""
+        accommodation = create_accommodation(building_name='Near CUHK Hall')
+        mock_get_lat_long.assert_not_called()
+        self.assertEqual(accommodation.geocode_status, 'pending')
+        self.assertIsNone(accommodation.latitude)
+        self.assertTrue(GeocodeJob.objects.filter(accommodation=accommodation).exists())
+
+        accommodation.price_per_month = 5500.00
+        accommodation.save() # Does not re-queue or reset the job
+        self.assertEqual(GeocodeJob.objects.get(accommodation=accommodation).attempts, 0)
+
+        counts = process_geocode_jobs()
+        self.assertEqual(counts['resolved'], 1)
+        accommodation.refresh_from_db()
+        self.assertEqual(accommodation.geocode_status, 'resolved')
+        self.assertEqual(accommodation.latitude, 22.3964)
+        self.assertLess(accommodation.distance_to_CUHKcampus, 0.1)
+        self.assertEqual(accommodation.campus_distances.count(), Campus.objects.count())
+        self.assertFalse(GeocodeJob.objects.exists())
+
+    def test_cached_building_resolves_immediately(self, mock_get_lat_long):
+        """Test a building already in the geocode cache is resolved during save."""
+        GeocodeCache.objects.create(address='cached tower', latitude=22.2830891, longitude=114.1365621)
+        accommodation = create_accommodation(building_name='Cached Tower')
+        self.assertEqual(accommodation.geocode_status, 'resolved')
+        self.assertEqual(accommodation.distance_to_HKUcampus, 0.0)
+        self.assertFalse(GeocodeJob.objects.exists())
+
+    def test_failed_lookups_are_retried_then_given_up(self, mock_get_lat_long):
+        """Test failures back off and the accommodation is marked failed after the last attempt."""
+        accommodation = create_accommodation(building_name='Nowhere Court')
+        self.assertEqual(process_geocode_jobs()['retried'], 1)
+        job = GeocodeJob.objects.get(accommodation=accommodation)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.next_attempt_at, timezone.now())
+        self.assertEqual(process_geocode_jobs(), {'resolved': 0, 'retried': 0, 'failed': 0}) # Not due yet
+
+        GeocodeJob.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_geocode_jobs()['failed'], 1)
+        accommodation.refresh_from_db()
+        self.assertEqual(accommodation.geocode_status, 'failed')
+        self.assertIsNone(GeocodeJob.objects.get(accommodation=accommodation).next_attempt_at)
+
+    def test_readdressed_job_is_not_overwritten(self, mock_get_lat_long):
+        """Test a job for an old address does not overwrite a newer one."""
+        accommodation = create_accommodation(building_name='Nowhere Court')
+        stale = GeocodeJob.objects.get(accommodation=accommodation)
+        accommodation.building_name = 'Near CUHK Hall'
+        accommodation.save()
+        _resolve(stale, (22.2830891, 114.1365621), list(Campus.objects.all()))
+        accommodation.refresh_from_db()
+        self.assertEqual(accommodation.geocode_status, 'pending')
+        self.assertEqual(GeocodeJob.objects.get().building_name, 'Near CUHK Hall')
+
+
+SPATIAL_BUILDINGS = {
+    'Central Point': (22.2820, 114.1580),
+    'Kennedy Town Point': (22.2830, 114.1290), # About 3 km west of Central Point
+    'Sai Ying Pun Point': (22.2860, 114.1420), # About 1.7 km west of Central Point
+    'Sha Tin Point': (22.3820, 114.1880), # About 11.6 km north of Central Point
+}
+
+
+@patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+class SpatialSearchTests(TestCase):
+    """Tests for the grid index and the within_radius / nearest actions."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def create_accommodations(self):
+        return {
+            name: create_accommodation(building_name=name)
+            for name in SPATIAL_BUILDINGS
+        }
+
+    def test_grid_cell_follows_location(self, mock_geocode):
+        """Test the grid cell is set on save and updated when the building changes."""
+        accommodation = self.create_accommodations()['Central Point']
+        self.assertEqual(accommodation.grid_cell, grid_cell(22.2820, 114.1580))
+        accommodation.building_name = 'Sha Tin Point'
+        accommodation.save()
+        accommodation.refresh_from_db()
+        self.assertEqual(accommodation.grid_cell, grid_cell(22.3820, 114.1880))
+
+    def test_within_radius(self, mock_geocode):
+        """Test only active accommodations inside the radius are returned, closest first."""
+        accommodations = self.create_accommodations()
+        Accommodation.objects.filter(pk=accommodations['Sai Ying Pun Point'].pk).update(active=False)
+        url = reverse('accommodation-within-radius')
+        response = self.client.get(url, {'latitude': 22.2820, 'longitude': 114.1580, 'radius': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['building_name'] for item in response.data], ['Central Point', 'Kennedy Town Point'])
+        self.assertEqual(response.data[0]['distance'], 0.0)
+        self.assertAlmostEqual(response.data[1]['distance'], 2.99, delta=0.05)
+        self.assertNotIn('grid_cell', response.data[0])
+
+        response = self.client.get(url, {'latitude': 22.2820, 'longitude': 114.1580, 'radius': 1})
+        self.assertEqual([item['building_name'] for item in response.data], ['Central Point'])
+
+    def test_nearest(self, mock_geocode):
+        """Test the k closest accommodations are returned, widening the search as needed."""
+        self.create_accommodations()
+        url = reverse('accommodation-nearest')
+        response = self.client.get(url, {'latitude': 22.3820, 'longitude': 114.1880, 'k': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['building_name'] for item in response.data], ['Sha Tin Point', 'Central Point'])
+
+        response = self.client.get(url, {'campus': 'HKU', 'k': 10})
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(response.data[0]['building_name'], 'Sai Ying Pun Point')
+
+    def test_deleted_while_searching(self, mock_geocode):
+        """Test an accommodation deleted after the spatial lookup is left out rather than failing."""
+        accommodations = self.create_accommodations()
+        found = [(accommodations['Central Point'].pk, 0.0), (accommodations['Sha Tin Point'].pk, 11.0)]
+        accommodations['Central Point'].delete()
+        with patch('basic.spatial.nearest', return_value=found):
+            response = self.client.get(reverse('accommodation-nearest'), {'latitude': 22.2820, 'longitude': 114.1580, 'k': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(item['building_name'], item['distance']) for item in response.data], [('Sha Tin Point', 11.0)])
+
+    def test_invalid_parameters(self, mock_geocode):
+        """Test missing coordinates and unknown campuses are rejected."""
+        url = reverse('accommodation-within-radius')
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url, {'campus': 'MIT'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'latitude': 22.3, 'longitude': 114.1, 'radius': 'far'}).status_code, 400)
+
+
+@patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+class RankedByDistanceTests(TestCase):
+    """Tests for ranked_by_distance and its keyset pagination."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('accommodation-ranked-by-distance')
+
+    def create_accommodations(self):
+        # Two flats in Central Point tie on distance, so paging relies on the id tie-break
+        names = ['Central Point', 'Sha Tin Point', 'Central Point', 'Kennedy Town Point', 'Sai Ying Pun Point']
+        return [
+            create_accommodation(flat_number=str(i), building_name=name)
+            for i, name in enumerate(names)
+        ]
+
+    def walk(self, params):
+        """Follow the next links from the first page and return every id seen."""
+        response = self.client.get(self.url, params)
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), params['page_size'])
+            ids.extend(item['id'] for item in response.data['results'])
+            if response.data['next'] is None:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_pages_follow_distance_order(self, mock_geocode):
+        """Test every page is in distance order, ties by id, without repeats."""
+        accommodations = self.create_accommodations()
+        expected = [a.pk for a in sorted(accommodations, key=lambda a: (a.distance_to_HKUcampus, a.pk))]
+        self.assertEqual(self.walk({'campus': 'HKU', 'page_size': 2}), expected)
+        self.assertEqual(self.walk({'campus': 'HKU', 'page_size': 2, 'reverse': 'true'}), expected[::-1])
+
+        expected = [a.pk for a in sorted(accommodations, key=lambda a: (a.distance_to_CUHKcampus, a.pk))]
+        self.assertEqual(self.walk({'campus': 'CUHK', 'page_size': 2}), expected)
+
+    def test_previous_link(self, mock_geocode):
+        """Test the previous link of the second page returns the first page."""
+        self.create_accommodations()
+        first = self.client.get(self.url, {'page_size': 2})
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNotNone(back.data['next'])
+
+    def test_inactive_and_unlocated_excluded(self, mock_geocode):
+        """Test inactive accommodations and ones without a distance are left out."""
+        accommodations = self.create_accommodations()
+        Accommodation.objects.filter(pk=accommodations[0].pk).update(active=False)
+        Accommodation.objects.filter(pk=accommodations[1].pk).update(distance_to_HKUcampus=None)
+        ids = self.walk({'page_size': 10})
+        self.assertEqual(len(ids), 3)
+        self.assertNotIn(accommodations[0].pk, ids)
+        self.assertNotIn(accommodations[1].pk, ids)
+
+    def test_campus_without_legacy_column(self, mock_geocode):
+        """Test campuses added later are ranked through CampusDistance."""
+        Campus.objects.create(code='TEST', name='Sha Tin Test Campus', latitude=22.3820, longitude=114.1880)
+        self.create_accommodations()
+        response = self.client.get(self.url, {'campus': 'TEST', 'page_size': 1})
+        self.assertEqual(response.data['results'][0]['building_name'], 'Sha Tin Point')
+        self.assertEqual(response.data['results'][0]['distance'], 0.0)
+        self.assertEqual(len(self.walk({'campus': 'TEST', 'page_size': 2})), 5)
+
+    def test_invalid_parameters(self, mock_geocode):
+        """Test unknown campuses and malformed cursors are rejected."""
+        self.assertEqual(self.client.get(self.url, {'campus': 'MIT'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 404)
+
+
+@patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+class SparseFieldsTests(TestCase):
+    """Tests for ?fields= / ?omit= and the compact list representation."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_is_compact_by_default(self, mock_geocode):
+        """Test the list leaves out the distance columns unless asked for."""
+        accommodation = create_accommodation(building_name='Central Point')
+        response = self.client.get(reverse('accommodation-list'))
+        self.assertEqual(list(response.data['results'][0]), AccommodationSerializer.LIST_FIELDS)
+        # A single accommodation still has every field
+        response = self.client.get(reverse('accommodation-detail', args=[accommodation.pk]))
+        self.assertIn('distance_to_HKUSTcampus', response.data)
+
+    def test_fields_limit_columns_fetched(self, mock_geocode):
+        """Test ?fields= drives the serializer and the SELECT list."""
+        create_accommodation(building_name='Central Point')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('accommodation-list'), {'fields': 'id,price_per_month,distance_to_CUHKcampus'})
+        self.assertEqual(list(response.data['results'][0]), ['id', 'price_per_month', 'distance_to_CUHKcampus'])
+        queries = [query['sql'] for query in queries if 'basic_resourceversion' not in query['sql']] # Not the ETag lookup
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('managed_by', queries[0])
+        self.assertNotIn('distance_to_HKUSTcampus', queries[0])
+
+        with self.assertNumQueries(2): # Version stamps and the page
+            response = self.client.get(reverse('accommodation-ranked-by-distance'), {'fields': 'id'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'distance'})
+
+    def test_omit(self, mock_geocode):
+        """Test ?omit= removes fields from the default set."""
+        accommodation = create_accommodation(building_name='Central Point')
+        response = self.client.get(reverse('accommodation-detail', args=[accommodation.pk]), {'omit': 'latitude,longitude'})
+        self.assertNotIn('latitude', response.data)
+        self.assertIn('distance_to_HKUcampus', response.data)
+        response = self.client.get(reverse('accommodation-list'), {'omit': 'active'})
+        self.assertEqual(
+            list(response.data['results'][0]), [name for name in AccommodationSerializer.LIST_FIELDS if name != 'active'],
+        )
+
+    def test_unknown_field_rejected(self, mock_geocode):
+        """Test unknown field names are reported."""
+        response = self.client.get(reverse('accommodation-list'), {'fields': 'id,grid_cell'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('grid_cell', str(response.data['fields']))
+
+
+class PaginationTests(TestCase):
+    """Tests for the default keyset pagination of the list endpoints."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def walk(self, url, params=None):
+        response = self.client.get(url, params)
+        names = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            names.extend(response.data['results'])
+            if response.data['next'] is None:
+                return names
+            response = self.client.get(response.data['next'])
+
+    def test_members_paginated_by_name(self):
+        """Test members come back a page at a time, ordered by name then id."""
+        for name in ['Carol', 'Alice', 'Bob', 'Alice', 'Dave']:
+            Member.objects.create(name=name, contact='1', institute='HKU', email='m@test.com')
+        url = reverse('member-list')
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+        self.assertNotIn('count', response.data)
+
+        members = self.walk(url, {'page_size': 2})
+        self.assertEqual([member['name'] for member in members], ['Alice', 'Alice', 'Bob', 'Carol', 'Dave'])
+        self.assertLess(members[0]['id'], members[1]['id'])
+
+    def test_page_size_is_capped(self):
+        """Test page_size cannot exceed the maximum."""
+        Member.objects.bulk_create([
+            Member(name=f'Member {i:03}', contact='1', institute='HKU', email='m@test.com')
+            for i in range(120)
+        ])
+        response = self.client.get(reverse('member-list'), {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 100)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_count_only_where_allowed(self):
+        """Test ?count=true is honoured for campuses but ignored for members."""
+        response = self.client.get(reverse('campus-list'), {'count': 'true', 'page_size': 2})
+        self.assertEqual(response.data['count'], Campus.objects.count())
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(reverse('member-list'), {'count': 'true'})
+        self.assertNotIn('count', response.data)
+
+    @patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+    def test_custom_actions_paginated(self, mock_geocode):
+        """Test the reservation and rating custom actions return pages."""
+        member = Member.objects.create(name='Page Member', contact='1', institute='HKU', email='m@test.com')
+        today = datetime.date.today()
+        for i, name in enumerate(SPATIAL_BUILDINGS):
+            accommodation = create_accommodation(building_name=name)
+            Reservation.objects.create(
+                accommodation=accommodation, member=member, status='Signed',
+                start_date=today - datetime.timedelta(days=30 - i), end_date=today - datetime.timedelta(days=1),
+            )
+            Rating.objects.create(accommodation=accommodation, member=member, rating=i + 1)
+
+        reservations = self.walk(reverse('reservation-get-Unsigned-reservations'), {'unsigned': 'true', 'page_size': 3})
+        self.assertEqual([r['start_date'] for r in reservations], sorted(r['start_date'] for r in reservations))
+        self.assertEqual(len(reservations), 4)
+
+        ratings = self.walk(reverse('rating-ranked-by-rating'), {'page_size': 3})
+        self.assertEqual([r['rating'] for r in ratings], [4, 3, 2, 1])
+        ratings = self.walk(reverse('rating-ranked-by-rating'), {'page_size': 3, 'reverse': 'true'})
+        self.assertEqual([r['rating'] for r in ratings], [1, 2, 3, 4])
+
+
+class FastReadPathTests(TestCase):
+    """Tests that the .values() path and FastJSONRenderer match the normal output byte for byte."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    @override_settings(RESPONSE_CACHE=None) # Both paths must actually run
+    @patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+    def test_list_endpoints_match_serializer_output(self, mock_geocode):
+        """Test every list style endpoint returns the same bytes on both paths."""
+        member = Member.objects.create(name='Zoë   "Quote"', contact='1', institute='HKU', email='z@test.com')
+        today = datetime.date.today()
+        for i, name in enumerate(SPATIAL_BUILDINGS):
+            accommodation = create_accommodation(floor_number=i, building_name=name, room_number=i or None, price_per_month='5000.5')
+            Reservation.objects.create(
+                accommodation=accommodation, member=member, status='Not Signed',
+                start_date=today - datetime.timedelta(days=30 - i), end_date=today - datetime.timedelta(days=1),
+            )
+            Rating.objects.create(accommodation=accommodation, member=member, rating=i + 1, comment='Good' if i else None)
+
+        requests = [
+            (reverse('accommodation-list'), {}),
+            (reverse('accommodation-list'), {'fields': 'id,latitude,distance_to_CUHKcampus,geocode_status'}),
+            (reverse('accommodation-ranked-by-distance'), {'campus': 'CUHK', 'page_size': 2}),
+            (reverse('member-list'), {}),
+            (reverse('reservation-list'), {}),
+            (reverse('reservation-get-Unsigned-reservations'), {}),
+            (reverse('rating-list'), {}),
+            (reverse('rating-ranked-by-rating'), {'reverse': 'true'}),
+            (reverse('campus-list'), {'count': 'true'}),
+        ]
+        for url, params in requests:
+            fast = self.client.get(url, params)
+            with override_settings(FAST_LIST_RESPONSES=False):
+                slow = self.client.get(url, params)
+            self.assertEqual(fast.status_code, 200)
+            self.assertEqual(fast.content, slow.content, url)
+
+    def test_renderer_matches_json_renderer(self):
+        """Test FastJSONRenderer output equals JSONRenderer's, including its fallbacks."""
+        from decimal import Decimal
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import FastJSONRenderer
+
+        samples = [
+            {'price': Decimal('12.50'), 'when': timezone.now(), 'day': datetime.date(2025, 1, 2)},
+            {'text': 'line\u2028sep\u2029 \u00e9 \n \x01', 'lazy': gettext_lazy('Hello'), 'nested': [1, 2.5, None, True]},
+            {'small': 0.00001234, 'big': 1e16, 'normal': 22.2830891, 1: 'int key'},
+            [],
+        ]
+        for data in samples:
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+            JSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+        )
+
+
+
+@patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+class AvailabilityTests(TestCase):
+    """Tests for the available action (date range search excluding booked accommodations)."""
+
+    offered = {'availability_start': '2025-08-01', 'availability_end': '2026-07-31'}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('accommodation-available')
+        self.member = Member.objects.create(name='Avail Tester', contact='1', institute='HKU', email='a@test.com')
+
+    def available(self, **params):
+        response = self.client.get(self.url, {'start': '2025-09-01', 'end': '2025-12-20', **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['building_name'] for item in response.data['results']]
+
+    def test_booked_and_unoffered_accommodations_are_excluded(self, mock_geocode):
+        """Test overlapping active reservations and the availability window both count."""
+        free = create_accommodation(building_name='Central Point', **self.offered)
+        booked = create_accommodation(building_name='Kennedy Town Point', **self.offered)
+        reserve(booked, self.member, datetime.date(2025, 12, 1), datetime.date(2026, 1, 31))
+        create_accommodation(building_name='Sai Ying Pun Point', availability_start='2025-10-01', availability_end='2026-07-31') # Offered too late
+        create_accommodation(building_name='Sha Tin Point', active=False, **self.offered)
+        # Back to back with the period (same rule as Reservation.clean) and a cancelled booking
+        reserve(free, self.member, datetime.date(2025, 8, 1), datetime.date(2025, 9, 1))
+        reserve(free, self.member, datetime.date(2025, 10, 1), datetime.date(2025, 10, 31), active=False)
+
+        self.assertEqual(self.available(), ['Central Point'])
+        self.assertEqual(
+            self.available(start='2026-02-01', end='2026-03-01'),
+            ['Central Point', 'Kennedy Town Point', 'Sai Ying Pun Point'],
+        )
+        self.assertEqual(self.available(search='Kennedy', start='2026-02-01', end='2026-03-01'), ['Kennedy Town Point'])
+
+    def test_new_reservation_changes_the_etag(self, mock_geocode):
+        """Test the results are not served from a stale cache after a booking."""
+        accommodation = create_accommodation(building_name='Central Point', **self.offered)
+        params = {'start': '2025-09-01', 'end': '2025-12-20'}
+        etag = self.client.get(self.url, params)['ETag']
+        reserve(accommodation, self.member, datetime.date(2025, 9, 10), datetime.date(2025, 9, 20))
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_invalid_dates(self, mock_geocode):
+        """Test missing, malformed and reversed dates are rejected."""
+        for params in [{}, {'start': '2025-09-01'}, {'start': '2025-09-01', 'end': '2025-13-01'}, {'start': '2025-09-01', 'end': '2025-08-01'}]:
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+
+@override_settings(RESPONSE_CACHE=None)
+@patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+class CalendarTests(TestCase):
+    """Tests for the occupancy index and the calendar action."""
+
+    offered = {'availability_start': '2025-01-01', 'availability_end': '2026-12-31'}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('accommodation-calendar')
+        occupancy.clear()
+        self.member = Member.objects.create(name='Calendar Tester', contact='1', institute='HKU', email='c@test.com')
+
+    def calendar(self, accommodations, start='2025-09-01', end='2025-09-10', **params):
+        response = self.client.get(self.url, {
+            'ids': ','.join(str(accommodation.pk) for accommodation in accommodations), 'start': start, 'end': end, **params,
+        })
+        self.assertEqual(response.status_code, 200)
+        return [item['occupancy'] for item in response.data['results']]
+
+    def test_intervals_overlapping(self, mock_geocode):
+        """Test the interval search with nested intervals, whose ends are not sorted."""
+        day = lambda n: datetime.date(2025, 9, n)
+        intervals = Intervals([(day(1), day(20)), (day(3), day(5)), (day(10), day(12)), (day(25), day(28))])
+        self.assertEqual(list(intervals.overlapping(day(6), day(9))), [(day(1), day(20))])
+        self.assertEqual(list(intervals.overlapping(day(20), day(25))), [])
+        self.assertEqual(
+            list(intervals.overlapping(day(11), day(26))),
+            [(day(1), day(20)), (day(10), day(12)), (day(25), day(28))],
+        )
+
+    def test_day_and_month_bitmaps(self, mock_geocode):
+        """Test bitmaps for several accommodations, with the end date free again."""
+        booked = create_accommodation(building_name='Central Point', **self.offered)
+        free = create_accommodation(building_name='Sha Tin Point', **self.offered)
+        reserve(booked, self.member, datetime.date(2025, 8, 20), datetime.date(2025, 9, 3))
+        reserve(booked, self.member, datetime.date(2025, 9, 8), datetime.date(2025, 11, 1))
+        reserve(free, self.member, datetime.date(2025, 9, 2), datetime.date(2025, 9, 5), active=False)
+
+        self.assertEqual(self.calendar([booked, free]), ['1100000111', '0000000000'])
+        # Checking out on November 1st leaves November free
+        self.assertEqual(self.calendar([booked, free], end='2025-12-31', resolution='month'), ['1100', '0000'])
+
+    def test_changes_are_picked_up(self, mock_geocode):
+        """Test saves and deletes reload only the accommodations they touch."""
+        first = create_accommodation(building_name='Central Point', **self.offered)
+        second = create_accommodation(building_name='Sha Tin Point', **self.offered)
+        reservation = reserve(first, self.member, datetime.date(2025, 9, 1), datetime.date(2025, 9, 3))
+        self.assertEqual(self.calendar([first, second]), ['1100000000', '0000000000'])
+        with CaptureQueriesContext(connection) as queries:
+            self.calendar([first, second])
+        self.assertFalse([query for query in queries if 'basic_reservation' in query['sql']]) # Served from memory
+
+        reservation.accommodation = second # Moved: both calendars change
+        reservation.save()
+        self.assertEqual(self.calendar([first, second]), ['0000000000', '1100000000'])
+        reservation.delete()
+        self.assertEqual(self.calendar([first, second]), ['0000000000', '0000000000'])
+
+    def test_invalid_parameters(self, mock_geocode):
+        """Test bad ids, dates and resolutions are rejected, unknown ids left out."""
+        accommodation = create_accommodation(building_name='Central Point', **self.offered)
+        params = {'ids': str(accommodation.pk), 'start': '2025-09-01', 'end': '2025-09-30'}
+        for bad in [{'ids': ''}, {'ids': 'a,b'}, {'end': '2025-08-01'}, {'end': '2030-01-01'}, {'resolution': 'week'}]:
+            self.assertEqual(self.client.get(self.url, {**params, **bad}).status_code, 400, bad)
+        response = self.client.get(self.url, {**params, 'ids': f'{accommodation.pk},999999'})
+        self.assertEqual([item['accommodation'] for item in response.data['results']], [accommodation.pk])
+
+
+class BulkStatusTests(TestCase):
+    """Tests for the reservation bulk_status action."""
+
+    def setUp(self):
+        geocode_patcher = patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+        geocode_patcher.start()
+        self.addCleanup(geocode_patcher.stop)
+        self.client = APIClient()
+        self.url = reverse('reservation-bulk-status')
+        occupancy.clear()
+        self.alice = Member.objects.create(name='Alice', contact='1', institute='HKU', email='alice@test.com')
+        self.bob = Member.objects.create(name='Bob', contact='2', institute='HKU', email='bob@test.com')
+        self.withdrawn = create_accommodation(building_name='Central Point', availability_start='2025-01-01', availability_end='2026-12-31')
+        self.other = create_accommodation(building_name='Sha Tin Point', availability_start='2025-01-01', availability_end='2026-12-31')
+        self.reservations = [
+            self.reserve_month(self.withdrawn, self.alice, 1), self.reserve_month(self.withdrawn, self.alice, 2),
+            self.reserve_month(self.withdrawn, self.bob, 3), self.reserve_month(self.other, self.bob, 1),
+        ]
+
+    def reserve_month(self, accommodation, member, month, **overrides):
+        """Reserve the 1st to the 20th of a month of 2025."""
+        return reserve(accommodation, member, datetime.date(2025, month, 1), datetime.date(2025, month, 20), **overrides)
+
+    def test_deactivate_accommodation_reservations(self):
+        """Test one request deactivates every reservation of an accommodation and queues a digest per member."""
+        calendar = {'ids': self.withdrawn.pk, 'start': '2025-01-01', 'end': '2025-01-01'}
+        self.assertEqual(self.client.get(reverse('accommodation-calendar'), calendar).data['results'][0]['occupancy'], '1')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'accommodation': self.withdrawn.pk, 'active': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'matched': 3, 'updated': 3, 'notified': 2})
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "basic_reservation"')]), 1)
+        self.assertEqual(list(Reservation.objects.filter(active=True)), [self.reservations[3]])
+
+        digests = {message.recipient: message.body for message in NotificationOutbox.objects.all()}
+        self.assertEqual(set(digests), {'alice@test.com', 'bob@test.com'})
+        self.assertEqual(digests['alice@test.com'].count('\n- '), 2)
+        self.assertIn('updated to: Inactive', digests['bob@test.com'])
+        # The occupancy calendar sees the change although update() sends no signals
+        self.assertEqual(self.client.get(reverse('accommodation-calendar'), calendar).data['results'][0]['occupancy'], '0')
+
+        # Nothing left to change, nobody notified again
+        response = self.client.post(self.url, {'accommodation': self.withdrawn.pk, 'active': False}, format='json')
+        self.assertEqual(response.data, {'matched': 3, 'updated': 0, 'notified': 0})
+
+    def test_signed_reservations_cannot_be_deactivated(self):
+        """Test the signed rule is checked for the whole set and nothing changes on failure."""
+        signed = self.reserve_month(self.other, self.alice, 5, status='Signed')
+        ids = [self.reservations[3].pk, signed.pk]
+        for data in [{'ids': ids, 'active': False}, {'ids': ids[:1], 'active': False, 'status': 'Signed'}]:
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+            self.assertIn('signed contract', response.data['non_field_errors'][0])
+        self.assertTrue(all(reservation.active for reservation in Reservation.objects.all()))
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+        response = self.client.post(self.url, {'ids': ids, 'status': 'Signed'}, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['notified'], 0) # Only (de)activation is emailed
+
+    def test_reactivation_must_not_overlap(self):
+        """Test reactivating reservations that overlap an active one is refused."""
+        self.client.post(self.url, {'ids': [self.reservations[0].pk], 'active': False}, format='json')
+        self.reserve_month(self.withdrawn, self.bob, 1) # Takes the freed dates
+        response = self.client.post(self.url, {'ids': [self.reservations[0].pk], 'active': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('overlap', response.data['non_field_errors'][0])
+        self.assertFalse(Reservation.objects.get(pk=self.reservations[0].pk).active)
+
+    def test_invalid_input(self):
+        """Test a selection and a change are both required."""
+        for data in [{'active': False}, {'ids': [self.reservations[0].pk]}, {'ids': 'x', 'active': False}, {'accommodation': 999999, 'active': False}]:
+            self.assertEqual(self.client.post(self.url, data, format='json').status_code, 400, data)
+
+
+class RatingTotalsTests(TestCase):
+    """Tests for the incrementally maintained rating totals and the accommodation ranked_by_rating action."""
+
+    def setUp(self):
+        geocode_patcher = patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+        geocode_patcher.start()
+        self.addCleanup(geocode_patcher.stop)
+        self.client = APIClient()
+        self.url = reverse('accommodation-ranked-by-rating')
+        self.members = [
+            Member.objects.create(name=f'Rater {i}', contact=str(i), institute='HKU', email=f'rater{i}@test.com')
+            for i in range(3)
+        ]
+        self.accommodations = {}
+        for name in SPATIAL_BUILDINGS:
+            accommodation = create_accommodation(building_name=name, availability_start='2024-01-01', availability_end='2026-12-31')
+            self.accommodations[name] = accommodation
+            for member in self.members: # Every member may rate every accommodation
+                Reservation.objects.create(
+                    accommodation=accommodation, member=member, status='Signed',
+                    start_date=datetime.date(2024, 1 + self.members.index(member), 1),
+                    end_date=datetime.date(2024, 1 + self.members.index(member), 20),
+                )
+
+    def rate(self, name, member, value, **kwargs):
+        return Rating.objects.create(
+            accommodation=self.accommodations[name], member=self.members[member], rating=value, **kwargs
+        )
+
+    def assertTotalsMatchRatings(self):
+        for accommodation in Accommodation.objects.all():
+            values = list(accommodation.ratings.filter(active=True).values_list('rating', flat=True))
+            self.assertEqual(accommodation.rating_count, len(values))
+            self.assertEqual(accommodation.rating_sum, sum(values))
+            self.assertEqual(accommodation.rating_avg, sum(values) / len(values) if values else None)
+
+    def test_totals_follow_every_write(self):
+        """Test creating, editing, toggling, moving and deleting ratings keeps the totals exact."""
+        rating = self.rate('Central Point', 0, 4)
+        self.rate('Central Point', 1, 5)
+        self.rate('Sha Tin Point', 0, 2, active=False)
+        self.assertTotalsMatchRatings()
+        central = Accommodation.objects.get(pk=self.accommodations['Central Point'].pk)
+        self.assertEqual((central.rating_count, central.rating_avg), (2, 4.5))
+
+        rating.rating = 1
+        rating.save()
+        self.assertTotalsMatchRatings()
+        rating.active = False
+        rating.save()
+        self.assertTotalsMatchRatings()
+        rating.active = True
+        rating.accommodation = self.accommodations['Kennedy Town Point']
+        rating.save()
+        self.assertTotalsMatchRatings()
+
+        Rating.objects.get(pk=rating.pk).delete()
+        self.assertTotalsMatchRatings()
+        self.rate('Kennedy Town Point', 1, 3)
+        self.members[1].delete() # Cascades to the member's ratings
+        self.assertTotalsMatchRatings()
+        self.assertIsNone(Accommodation.objects.get(pk=self.accommodations['Central Point'].pk).rating_avg)
+
+    def test_rejected_rating_changes_nothing(self):
+        """Test a rating failing validation leaves the totals alone."""
+        with self.assertRaises(ValidationError):
+            self.rate('Central Point', 0, 6)
+        self.assertEqual(Accommodation.objects.get(pk=self.accommodations['Central Point'].pk).rating_count, 0)
+
+    def test_ranked_by_rating(self):
+        """Test accommodations come back by average rating, then rating count, with a minimum count."""
+        self.rate('Central Point', 0, 5)
+        self.rate('Central Point', 1, 3) # 4.0 from 2 ratings
+        self.rate('Kennedy Town Point', 0, 4) # 4.0 from 1 rating
+        self.rate('Sai Ying Pun Point', 0, 5)
+        self.rate('Sai Ying Pun Point', 1, 5)
+        self.rate('Sai Ying Pun Point', 2, 2, active=False) # 5.0 from 2 active ratings
+        # Sha Tin Point has no ratings and is never ranked
+
+        names = []
+        response = self.client.get(self.url, {'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            names.extend(item['building_name'] for item in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(names, ['Sai Ying Pun Point', 'Central Point', 'Kennedy Town Point'])
+        self.assertEqual(response.data['results'][-1]['rating_avg'], 4.0)
+        self.assertEqual(response.data['results'][-1]['rating_count'], 1)
+
+        response = self.client.get(self.url, {'reverse': 'true'})
+        self.assertEqual(
+            [item['building_name'] for item in response.data['results']],
+            ['Kennedy Town Point', 'Central Point', 'Sai Ying Pun Point'],
+        )
+        response = self.client.get(self.url, {'min_count': 2})
+        self.assertEqual(
+            [item['building_name'] for item in response.data['results']], ['Sai Ying Pun Point', 'Central Point'],
+        )
+        response = self.client.get(self.url, {'min_count': 'many'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rating_changes_accommodation_etag(self):
+        """Test a new rating invalidates cached accommodation responses, though it only updates them."""
+        url = reverse('accommodation-detail', args=[self.accommodations['Central Point'].pk])
+        first = self.client.get(url)
+        self.assertIsNone(first.data['rating_avg'])
+        self.rate('Central Point', 0, 4)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['rating_avg'], 4.0)
+        self.assertNotIn('rating_sum', json.loads(response.content))
+
+
+class BulkRatingImportTests(TestCase):
+    """Tests for the bulk rating import endpoint and command."""
+
+    def setUp(self):
+        geocode_patcher = patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+        geocode_patcher.start()
+        self.addCleanup(geocode_patcher.stop)
+        self.client = APIClient()
+        self.url = reverse('rating-bulk-import')
+        self.members = [
+            Member.objects.create(name=f'Rater {i}', contact=str(i), institute='HKU', email=f'rater{i}@test.com')
+            for i in range(12)
+        ]
+        self.stayed, self.staying = [
+            create_accommodation(building_name=name, availability_start='2024-01-01', availability_end='2030-12-31')
+            for name in ('Central Point', 'Sha Tin Point')
+        ]
+        today = datetime.date.today()
+        for i, member in enumerate(self.members[:10]):
+            Reservation.objects.create( # Completed, so these members may rate
+                accommodation=self.stayed, member=member, status='Signed',
+                start_date=datetime.date(2024, 1, 1) + datetime.timedelta(days=20 * i),
+                end_date=datetime.date(2024, 1, 15) + datetime.timedelta(days=20 * i),
+            )
+        Reservation.objects.create( # Still ongoing
+            accommodation=self.staying, member=self.members[0], status='Signed',
+            start_date=today - datetime.timedelta(days=5), end_date=today + datetime.timedelta(days=5),
+        )
+
+    def row(self, member, rating, accommodation=None, **extra):
+        return {'accommodation': (accommodation or self.stayed).pk, 'member': self.members[member].pk, 'rating': rating, **extra}
+
+    def test_json_import_reports_row_errors(self):
+        """Test valid ratings are imported while ineligible, invalid and duplicate rows are reported."""
+        Rating.objects.create(accommodation=self.stayed, member=self.members[9], rating=2)
+        rows = [
+            self.row(0, 5, comment='Great'),
+            self.row(1, 6), # Out of range
+            self.row(0, 3, accommodation=self.staying), # Reservation not over yet
+            self.row(10, 4), # Never stayed
+            dict(self.row(2, 4), accommodation=999999), # No such accommodation
+            self.row(9, 4), # Already rated
+            self.row(0, 1), # Repeats row 1
+            self.row(2, 'five'),
+            self.row(3, 4, active=False),
+            self.row(4, 3),
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['rows'], response.data['created'], response.data['failed']), (10, 3, 7))
+        errors = {error['row']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(errors[2]['rating'], ["Rating must be between 1 and 5."])
+        self.assertIn("after your reservation period has ended", errors[3]['non_field_errors'][0])
+        self.assertIn("after your reservation period has ended", errors[4]['non_field_errors'][0])
+        self.assertIn('accommodation', errors[5])
+        self.assertIn('unique set', errors[6]['non_field_errors'][0])
+        self.assertIn('unique set', errors[7]['non_field_errors'][0])
+        self.assertIn('rating', errors[8])
+        self.assertNotIn('buildings', response.data)
+
+        self.assertEqual(Rating.objects.get(member=self.members[0]).comment, 'Great')
+        self.assertFalse(Rating.objects.get(member=self.members[3]).active)
+        stayed = Accommodation.objects.get(pk=self.stayed.pk)
+        self.assertEqual((stayed.rating_count, stayed.rating_sum, stayed.rating_avg), (3, 10, 10 / 3)) # 2, 5 and 3
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Test eligibility and duplicates are checked set-wise, not per row."""
+        def queries(rows):
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.client.post(self.url, rows, format='json').data['created'], len(rows))
+            return len(captured)
+
+        few = queries([self.row(i, 4) for i in range(2)])
+        Rating.objects.all().delete()
+        self.assertEqual(queries([self.row(i, 4) for i in range(10)]), few)
+
+    def test_import_command_jsonl(self):
+        """Test the management command imports in batches and reports repeats across batches."""
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            for i in range(5):
+                handle.write(json.dumps(self.row(i, i + 1)) + '\n')
+            handle.write(json.dumps(self.row(1, 5)) + '\n')
+            handle.write('{not json\n')
+        self.addCleanup(os.remove, handle.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_ratings', handle.name, '--batch-size', '2', stdout=out, stderr=err)
+        self.assertIn('Imported 5 of 7 rows', out.getvalue())
+        self.assertIn('Row 6', err.getvalue())
+        self.assertIn('Row 7', err.getvalue())
+        self.assertEqual(Accommodation.objects.get(pk=self.stayed.pk).rating_avg, 3.0)
+
+
+class FullTextSearchTests(TestCase):
+    """Tests for the FTS5 search index and FullTextSearchFilter."""
+
+    def setUp(self):
+        geocode_patcher = patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS.get(address, (22.28, 114.15)))
+        geocode_patcher.start()
+        self.addCleanup(geocode_patcher.stop)
+        self.client = APIClient()
+        self.central = create_accommodation(building_name='Central Point', managed_by='Café Lettings')
+        self.shatin = create_accommodation(building_name='Sha Tin Point', managed_by='Campus Housing')
+        self.kennedy = create_accommodation(building_name='Kennedy Town Point', managed_by='Central Estates')
+        self.alice = Member.objects.create(name='Alice Wong', contact='1', institute='HKU', email='alice@test.com')
+        self.bob = Member.objects.create(name='Bob Chan', contact='2', institute='HKU', email='bob@test.com')
+        self.reservations = [
+            Reservation.objects.create(
+                accommodation=accommodation, member=member, status=status,
+                start_date=datetime.date(2024, 1, 1), end_date=datetime.date(2024, 1, 20),
+            )
+            for accommodation, member, status in (
+                (self.central, self.alice, 'Signed'), (self.shatin, self.bob, 'Not Signed'), (self.kennedy, self.alice, 'Not Signed'),
+            )
+        ]
+
+    def search(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_accommodation_search_matches_word_prefixes(self):
+        """Test terms match the start of words of either field, ignoring case and accents, all terms required."""
+        self.assertEqual(set(self.search('accommodation-list', search='point')), {self.central.pk, self.shatin.pk, self.kennedy.pk})
+        self.assertEqual(set(self.search('accommodation-list', search='cent')), {self.central.pk, self.kennedy.pk})
+        self.assertEqual(self.search('accommodation-list', search='CAFE'), [self.central.pk])
+        self.assertEqual(self.search('accommodation-list', search='point campus'), [self.shatin.pk])
+        self.assertEqual(self.search('accommodation-list', search='oint'), []) # Not a substring search
+
+    def test_index_follows_writes(self):
+        """Test renamed and deleted accommodations are found under their new name only."""
+        self.shatin.building_name = 'Sai Ying Pun Point'
+        self.shatin.save()
+        self.assertEqual(self.search('accommodation-list', search='sha'), [])
+        self.assertEqual(self.search('accommodation-list', search='ying'), [self.shatin.pk])
+        self.kennedy.delete()
+        self.assertEqual(self.search('accommodation-list', search='kennedy'), [])
+
+    def test_joined_fields_use_the_index(self):
+        """Test reservations and ratings are searched through the indexed accommodation, member and comment text."""
+        self.assertEqual(set(self.search('reservation-list', search='alice')), {self.reservations[0].pk, self.reservations[2].pk})
+        self.assertEqual(self.search('reservation-list', search='alice kennedy'), [self.reservations[2].pk])
+        self.assertEqual(set(self.search('reservation-list', search='not')), {self.reservations[1].pk, self.reservations[2].pk})
+        rating = Rating.objects.create(accommodation=self.central, member=self.alice, rating=4, comment='Quiet and bright')
+        self.assertEqual(self.search('rating-list', search='bright'), [rating.pk])
+        self.assertEqual(self.search('rating-list', search='wong'), [rating.pk])
+
+        with CaptureQueriesContext(connection) as captured:
+            self.search('reservation-list', search='alice kennedy')
+        sql = '\n'.join(query['sql'] for query in captured if 'basic_reservation' in query['sql'])
+        self.assertIn('MATCH', sql)
+        self.assertNotIn('LIKE', sql)
+
+    def test_relevance_ordering(self):
+        """Test ?ordering=relevance puts the best match first."""
+        create_accommodation(building_name='Central Central Point', managed_by='Central Estates')
+        ids = self.search('accommodation-list', search='central', ordering='relevance')
+        self.assertEqual(ids[0], Accommodation.objects.get(building_name='Central Central Point').pk)
+        self.assertEqual(set(ids[1:]), {self.central.pk, self.kennedy.pk})
+        paged = []
+        response = self.client.get(reverse('accommodation-list'), {'search': 'central', 'ordering': 'relevance', 'page_size': 1})
+        while True:
+            paged.extend(item['id'] for item in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(paged, ids)
+
+    def test_punctuation_terms_fall_back_to_like(self):
+        """Test a term without letters or digits is still searched."""
+        create_accommodation(building_name='Sha Tin Point', managed_by='A & B Agents')
+        self.assertEqual(len(self.search('accommodation-list', search='&')), 1)
+
+
+class AutocompleteTests(TestCase):
+    """Tests for the in-memory building name autocomplete."""
+
+    def setUp(self):
+        geocode_patcher = patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS.get(address, (22.28, 114.15)))
+        geocode_patcher.start()
+        self.addCleanup(geocode_patcher.stop)
+        self.client = APIClient()
+        self.url = reverse('accommodation-autocomplete')
+        autocomplete.clear()
+        self.addCleanup(autocomplete.clear)
+        for name, count in (('Kennedy Town Point', 1), ('Central Point', 2), ('Sha Tin Point', 1), ('Chôi Hung Estate', 1)):
+            for floor in range(count):
+                create_accommodation(building_name=name, floor_number=floor)
+
+    def suggest(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['building_name'] for item in response.data['results']]
+
+    def test_name_index(self):
+        """Test word prefixes, ranking by accommodations, accents, typos and removal."""
+        index = NameIndex({'Sha Tin Point': 1, 'Central Point': 3, 'Kennedy Town Point': 2, 'Chôi Hung Estate': 1})
+        self.assertEqual(index.suggest('po'), [('Central Point', 3), ('Kennedy Town Point', 2), ('Sha Tin Point', 1)])
+        self.assertEqual(index.suggest('TIN'), [('Sha Tin Point', 1)])
+        self.assertEqual(index.suggest('choi h'), [('Chôi Hung Estate', 1)])
+        self.assertEqual(index.suggest('kenedy')[0], ('Kennedy Town Point', 2))
+        self.assertEqual(index.suggest('po', limit=1), [('Central Point', 3)])
+        index.add('Sha Tin Point', 4)
+        self.assertEqual(index.suggest('po')[0], ('Sha Tin Point', 5))
+        index.remove('Sha Tin Point', 5)
+        self.assertEqual(index.suggest('sha'), [])
+        self.assertEqual(len(index), 3)
+
+    def test_suggestions_need_no_queries(self):
+        """Test suggestions come from memory once the names are loaded."""
+        self.assertEqual(self.suggest('po'), ['Central Point', 'Kennedy Town Point', 'Sha Tin Point'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('cent'), ['Central Point'])
+            self.assertEqual(self.suggest('sha tim'), ['Sha Tin Point'])
+        response = self.client.get(self.url, {'q': 'cent'})
+        self.assertEqual(response.data['results'], [{'building_name': 'Central Point', 'accommodations': 2}])
+        self.assertNotIn('ETag', response)
+
+    def test_writes_update_the_index(self):
+        """Test created, renamed and deleted accommodations show up without a reload."""
+        self.suggest('po')
+        with self.captureOnCommitCallbacks(execute=True):
+            added = create_accommodation(building_name='Sai Ying Pun Point')
+        with self.captureOnCommitCallbacks(execute=True):
+            renamed = Accommodation.objects.get(building_name='Kennedy Town Point')
+            renamed.building_name = 'Kowloon Tong Point'
+            renamed.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            added.delete()
+        with patch.object(autocomplete, 'load') as load:
+            self.assertEqual(self.suggest('k'), ['Kowloon Tong Point'])
+            self.assertEqual(self.suggest('sai'), [])
+            self.assertEqual(self.suggest('central'), ['Central Point'])
+            load.assert_not_called()
+
+    @override_settings(AUTOCOMPLETE_REFRESH_INTERVAL=0)
+    def test_other_processes_changes_are_picked_up(self):
+        """Test names written elsewhere are loaded once the stamp moves."""
+        self.suggest('po')
+        # As another process would: no signal reaches this process's index
+        Accommodation.objects.bulk_create([Accommodation(
+            flat_number='1A', floor_number=1, building_name='Tai Koo Point',
+            availability_start='2024-01-01', availability_end='2026-12-31',
+            type_of_accommodation='Single', price_per_month=5000.00, managed_by='Autocomplete Test'
+        )])
+        self.assertEqual(self.suggest('tai'), [])
+        bump(NAMES_KEY)
+        self.assertEqual(self.suggest('tai'), ['Tai Koo Point'])
+
+
+class FacetedSearchTests(TestCase):
+    """Tests for the faceted_search action and its facet counts."""
+
+    def setUp(self):
+        geocode_patcher = patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+        geocode_patcher.start()
+        self.addCleanup(geocode_patcher.stop)
+        self.client = APIClient()
+        self.url = reverse('accommodation-faceted-search')
+        buildings = list(SPATIAL_BUILDINGS)
+        self.accommodations = [
+            Accommodation.objects.create(
+                flat_number=str(i), floor_number=1, building_name=buildings[i % len(buildings)],
+                availability_start='2024-01-01', availability_end='2026-12-31',
+                number_of_beds=1 + i % 3, no_of_bedrooms=1 + i % 2,
+                type_of_accommodation=('Single', 'Double', 'Studio')[i % 3 // 2 + i % 2],
+                price_per_month=2500 + 1500 * i, managed_by=('Agent A', 'Agent B')[i // 6],
+            )
+            for i in range(12)
+        ]
+        self.accommodations[0].active = False
+        self.accommodations[0].save()
+
+    def search(self, **params):
+        response = self.client.get(self.url, {'page_size': 100, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def expected(self, campus='HKU', exclude=None, **filters):
+        """The active accommodations matching filters, checked one by one in Python."""
+        field = LEGACY_DISTANCE_FIELDS.get(campus)
+        matches = []
+        for accommodation in Accommodation.objects.filter(active=True):
+            distance = getattr(accommodation, field) if field else accommodation.campus_distances.get(campus__code=campus).distance
+            checks = {
+                'price_per_month': filters.get('min_price', 0) <= accommodation.price_per_month < filters.get('max_price', 10 ** 9),
+                'distance': 'max_distance' not in filters or distance <= filters['max_distance'],
+            }
+            for name in ('number_of_beds', 'no_of_bedrooms', 'type_of_accommodation', 'managed_by'):
+                checks[name] = name not in filters or getattr(accommodation, name) in filters[name]
+            if all(ok for name, ok in checks.items() if name != exclude):
+                matches.append((accommodation, distance))
+        return matches
+
+    def check(self, campus='HKU', **filters):
+        data = self.search(campus=campus, **filters)
+        self.assertEqual(data['count'], len(self.expected(campus, **filters)))
+        self.assertEqual({item['id'] for item in data['results']}, {a.pk for a, _ in self.expected(campus, **filters)})
+        for name in ('number_of_beds', 'no_of_bedrooms', 'type_of_accommodation', 'managed_by'):
+            counts = {}
+            for accommodation, _ in self.expected(campus, exclude=name, **filters):
+                counts[getattr(accommodation, name)] = counts.get(getattr(accommodation, name), 0) + 1
+            for value in filters.get(name, ()):
+                counts.setdefault(value, 0)
+            self.assertEqual(data['facets'][name], [{'value': value, 'count': counts[value]} for value in sorted(counts)], name)
+        by_price = self.expected(campus, exclude='price_per_month', **filters)
+        for option in data['facets']['price_per_month']:
+            low, high = option['min'] or 0, option['max'] or 10 ** 9
+            self.assertEqual(option['count'], sum(low <= a.price_per_month < high for a, _ in by_price), option)
+        by_distance = self.expected(campus, exclude='distance', **filters)
+        for option in data['facets']['distance']:
+            self.assertEqual(option['count'], sum(distance <= option['max_distance'] for _, distance in by_distance), option)
+        return data
+
+    def test_counts_ignore_their_own_selection(self):
+        """Test every facet counts with the other selections applied but not its own."""
+        self.check()
+        data = self.check(type_of_accommodation=['Studio'])
+        self.assertEqual([option['value'] for option in data['facets']['type_of_accommodation']], ['Double', 'Single', 'Studio'])
+        self.check(number_of_beds=[1, 3], managed_by=['Agent B'])
+        self.check(min_price=5000, max_price=14000, no_of_bedrooms=[2], max_distance=2)
+        self.check(campus='CUHK', max_distance=15, type_of_accommodation=['Single', 'Double'])
+
+    def test_selected_values_without_results_are_listed(self):
+        """Test a selected value nobody has is counted as 0 rather than left out."""
+        data = self.check(managed_by=['Agent C'])
+        self.assertEqual(data['count'], 0)
+        self.assertIn({'value': 'Agent C', 'count': 0}, data['facets']['managed_by'])
+
+    def test_other_campuses(self):
+        """Test a campus without a distance column is measured through its CampusDistance rows."""
+        Campus.objects.create(code='HKU_MED', name='Medical Campus', latitude=22.2700, longitude=114.1310)
+        self.check(campus='HKU_MED', max_distance=2, number_of_beds=[1, 2])
+
+    def test_query_count_does_not_grow_with_the_values(self):
+        """Test the facets take the same queries however many options they have."""
+        self.search() # Creates the version stamps
+        with CaptureQueriesContext(connection) as before:
+            self.search(max_distance=5)
+        for i in range(5):
+            Accommodation.objects.create(
+                flat_number='9', floor_number=i, building_name='Central Point',
+                availability_start='2024-01-01', availability_end='2026-12-31', number_of_beds=4 + i, no_of_bedrooms=3 + i,
+                type_of_accommodation=f'Type {i}', price_per_month=50000, managed_by=f'Agent {i}',
+            )
+        with CaptureQueriesContext(connection) as after:
+            data = self.search(max_distance=5)
+        self.assertEqual(len(after), len(before))
+        self.assertEqual(len(data['facets']['managed_by']), 7)
+
+    def test_invalid_parameters(self):
+        """Test bad filters are a 400 naming the parameter."""
+        for params, field in (
+            ({'number_of_beds': 'two'}, 'number_of_beds'),
+            ({'min_price': 8000, 'max_price': 5000}, 'max_price'),
+            ({'campus': 'NOPE'}, 'campus'),
+            ({'max_distance': -1}, 'max_distance'),
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(field, response.data)
+
+
+class RecommendTests(TestCase):
+    """Tests for the recommend action and its in-memory snapshot."""
+
+    def setUp(self):
+        geocode_patcher = patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+        geocode_patcher.start()
+        self.addCleanup(geocode_patcher.stop)
+        recommender.clear()
+        self.addCleanup(recommender.clear)
+        self.client = APIClient()
+        self.url = reverse('accommodation-recommend')
+        buildings = list(SPATIAL_BUILDINGS)
+        self.accommodations = [
+            Accommodation.objects.create(
+                flat_number=str(i), floor_number=1, building_name=buildings[i % len(buildings)],
+                availability_start='2024-01-01', availability_end='2026-12-31',
+                number_of_beds=1, no_of_bedrooms=1 + i % 3, type_of_accommodation='Single',
+                price_per_month=3000 + 700 * i, managed_by='Agent',
+            )
+            for i in range(10)
+        ]
+        for i, accommodation in enumerate(self.accommodations[:6]):
+            Accommodation.objects.filter(pk=accommodation.pk).update(rating_count=1, rating_sum=1 + i % 5, rating_avg=1 + i % 5)
+
+    def recommend(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        # Parsed from the body: a repeated request is answered from the response cache
+        return [(item['id'], item['score']) for item in json.loads(response.content)]
+
+    def expected(self, campus='HKU', k=10, **weights):
+        """[(id, score)] of the active accommodations, scored one by one in Python."""
+        weights = {name: weights.get(f'{name}_weight', 1) for name in CRITERIA}
+        accommodations = list(Accommodation.objects.filter(active=True))
+        campus = Campus.objects.get(code=campus)
+
+        def scale(values, higher_is_better=True):
+            low, high = min(v for v in values if v is not None), max(v for v in values if v is not None)
+            if high == low:
+                return [None if v is None else 1.0 for v in values]
+            return [None if v is None else ((v - low) if higher_is_better else (high - v)) / (high - low) for v in values]
+
+        ratings = scale([a.rating_avg for a in accommodations])
+        average = sum(r for r in ratings if r is not None) / len([r for r in ratings if r is not None])
+        criteria = {
+            'price': scale([float(a.price_per_month) for a in accommodations], higher_is_better=False),
+            'distance': scale([haversine(campus.latitude, campus.longitude, a.latitude, a.longitude) for a in accommodations], higher_is_better=False),
+            'rating': [average if r is None else r for r in ratings],
+            'bedrooms': scale([a.no_of_bedrooms for a in accommodations]),
+        }
+        scores = [
+            (sum(weights[name] * criteria[name][i] for name in CRITERIA) / sum(weights.values()), a.pk)
+            for i, a in enumerate(accommodations)
+        ]
+        return [(pk, score) for score, pk in sorted(scores, key=lambda found: (-found[0], found[1]))][:k]
+
+    def check(self, **params):
+        found, expected = self.recommend(**params), self.expected(**params)
+        self.assertEqual([pk for pk, _ in found], [pk for pk, _ in expected], params)
+        for (_, score), (_, expected_score) in zip(found, expected):
+            self.assertAlmostEqual(score, expected_score, places=4)
+
+    def test_matches_a_python_reference(self):
+        """Test the ranking and scores for several weights and campuses."""
+        self.check()
+        self.check(k=3, price_weight=3, distance_weight=0)
+        self.check(campus='CUHK', k=5, distance_weight=4, rating_weight=0.5)
+        self.check(price_weight=0, distance_weight=0, rating_weight=1, bedrooms_weight=0)
+
+    def test_ties_go_to_the_lowest_id(self):
+        """Test equal scores are ordered by id, also across the top k cutoff."""
+        found = self.recommend(k=2, price_weight=0, distance_weight=0, rating_weight=0)
+        best = [a.pk for a in self.accommodations if a.no_of_bedrooms == 3]
+        self.assertEqual(found, [(best[0], 1.0), (best[1], 1.0)])
+
+    def test_snapshot_follows_saves(self):
+        """Test the snapshot is reused until an accommodation or campus is saved."""
+        self.check(price_weight=5)
+        snapshot = recommender.snapshot
+        self.check(price_weight=1, campus='CUHK')
+        self.assertIs(recommender.snapshot, snapshot)
+
+        cheapest = self.accommodations[-1]
+        cheapest.price_per_month = 100
+        cheapest.save()
+        self.assertEqual(self.recommend(price_weight=5)[0][0], cheapest.pk)
+        cheapest.active = False
+        cheapest.save()
+        self.assertNotIn(cheapest.pk, [pk for pk, _ in self.recommend(price_weight=5)])
+        self.check(price_weight=5)
+
+        Campus.objects.create(code='HKU_MED', name='Medical Campus', latitude=22.2700, longitude=114.1310)
+        self.check(campus='HKU_MED', distance_weight=3)
+
+    def test_invalid_parameters(self):
+        """Test bad weights, campus or k are a 400."""
+        for params, field in (
+            ({'price_weight': -1}, 'price_weight'),
+            ({'k': 0}, 'k'),
+            ({'campus': 'NOPE'}, 'campus'),
+            ({'price_weight': 0, 'distance_weight': 0, 'rating_weight': 0, 'bedrooms_weight': 0}, 'non_field_errors'),
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(field, response.data)
+
+
+@override_settings(CATALOGUE_ENGINE=True, RESPONSE_CACHE=None)
+class CatalogueTests(TestCase):
+    """Tests for the in-memory catalogue answering ?active=true accommodation lists."""
+
+    def setUp(self):
+        geocode_patcher = patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+        geocode_patcher.start()
+        self.addCleanup(geocode_patcher.stop)
+        catalogue_engine.clear()
+        self.addCleanup(catalogue_engine.clear)
+        self.client = APIClient()
+        self.url = reverse('accommodation-list')
+        buildings = list(SPATIAL_BUILDINGS)
+        self.accommodations = [
+            Accommodation.objects.create(
+                room_number=i % 3 or None, flat_number='ABC'[i % 3], floor_number=i % 4, building_name=buildings[i % len(buildings)],
+                availability_start=datetime.date(2025, 1 + i % 6, 1), availability_end='2026-12-31',
+                number_of_beds=1 + i % 3, no_of_bedrooms=1 + i % 2, type_of_accommodation=('Single', 'Double', 'Studio')[i % 3],
+                price_per_month=4000 + 750 * (i % 7) + (0.5 if i % 5 == 0 else 0), managed_by=('Agent A', 'Agent B')[i // 7],
+            )
+            for i in range(14)
+        ]
+        self.accommodations[0].active = False
+        self.accommodations[0].save()
+        update_rating_totals(added=[(self.accommodations[1].pk, 4), (self.accommodations[2].pk, 5), (self.accommodations[2].pk, 2)])
+
+    def pages(self, enabled, **params):
+        """Bodies of every page of the list, following next links and then previous links back."""
+        with override_settings(CATALOGUE_ENGINE=enabled):
+            bodies, response = [], self.client.get(self.url, {'page_size': 3, **params})
+            bodies.append(response.content)
+            while response.status_code == 200 and response.data['next']:
+                response = self.client.get(response.data['next'])
+                bodies.append(response.content)
+            while response.status_code == 200 and response.data['previous']:
+                response = self.client.get(response.data['previous'])
+                bodies.append(response.content)
+        return bodies
+
+    def check(self, **params):
+        """Assert the catalogue and the ORM give the same bytes on every page."""
+        memory = self.pages(True, **params)
+        self.assertEqual(memory, self.pages(False, **params), params)
+        self.assertEqual(catalogue_engine.catalogue.differences(Accommodation.objects.filter(active=True)), [])
+        return memory
+
+    def test_responses_match_the_orm(self):
+        """Test every ordering with and without filters, page by page in both directions."""
+        for ordering in [None, 'price_per_month', '-price_per_month', 'availability_start', '-availability_start']:
+            for filters in (
+                {},
+                {'type_of_accommodation': ['Single', 'Studio'], 'number_of_beds': [1, 3]},
+                {'managed_by': 'Agent B', 'min_price': '4750.5', 'max_price': 7750},
+                {'max_distance': 2.5, 'no_of_bedrooms': 2},
+                {'campus': 'CUHK', 'max_distance': 40, 'fields': 'id,price_per_month,rating_avg,room_number'},
+            ):
+                params = {'active': 'true', **filters}
+                if ordering:
+                    params['ordering'] = ordering
+                self.check(**params)
+        self.assertIsNotNone(catalogue_engine.catalogue)
+
+    def test_answered_without_reading_accommodations(self):
+        """Test a list answered from memory only looks up the version stamps."""
+        self.client.get(self.url, {'active': 'true'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'active': 'true', 'ordering': 'price_per_month', 'number_of_beds': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('basic_resourceversion', queries[0]['sql'])
+
+    def test_other_requests_use_the_orm(self):
+        """Test what the catalogue cannot answer exactly is read from the database, with the same results."""
+        Campus.objects.create(code='HKU_MED', name='Medical Campus', latitude=22.2700, longitude=114.1310)
+        self.client.get(self.url, {'active': 'true'})
+        for params in ({}, {'active': 'false'}, {'active': 'true', 'search': 'point'}, {'active': 'true', 'campus': 'HKU_MED', 'max_distance': 3}):
+            with CaptureQueriesContext(connection) as queries:
+                self.check(**params)
+            self.assertTrue(any('FROM "basic_accommodation"' in query['sql'] for query in queries), params)
+        # A cursor whose values are not of the ordering's types, e.g. edited by hand
+        cursor = base64.urlsafe_b64encode(json.dumps({'p': ['Central Point', '1', 'A', 5]}).encode()).decode()
+        self.check(active='true', cursor=cursor)
+
+    def test_follows_writes_without_reloading(self):
+        """Test saves, deletes, rating totals and imports are applied to the loaded catalogue row by row."""
+        self.check(active='true', ordering='price_per_month')
+        with patch.object(catalogue_engine, 'load', wraps=catalogue_engine.load) as load:
+            moved = self.accommodations[3]
+            moved.price_per_month = 100
+            moved.save()
+            self.assertEqual(json.loads(self.check(active='true', ordering='price_per_month')[0])['results'][0]['id'], moved.pk)
+            self.accommodations[0].active = True # Back in the catalogue
+            self.accommodations[0].save()
+            self.accommodations[4].active = False
+            self.accommodations[4].save()
+            self.accommodations[5].delete()
+            self.check(active='true')
+            update_rating_totals(added=[(self.accommodations[6].pk, 3)])
+            Accommodation.objects.create(
+                flat_number='Z', floor_number=9, building_name='Sha Tin Point', availability_start='2025-03-01',
+                availability_end='2026-12-31', type_of_accommodation='Newtype', price_per_month=99999, managed_by='Agent C',
+            )
+            self.check(active='true', ordering='-price_per_month', type_of_accommodation='Newtype')
+            load.assert_not_called()
+
+            # Moving a campus may change every row's distance
+            cuhk = Campus.objects.get(code='CUHK')
+            cuhk.latitude += 0.01
+            cuhk.save()
+            self.check(active='true', campus='CUHK', max_distance=12)
+            load.assert_called_once()
+
+    def test_reloads_when_the_log_was_pruned(self):
+        """Test a catalogue further behind than the log keeps is reloaded."""
+        self.check(active='true')
+        with patch('basic.catalogue.MAX_LOGGED_CHANGES', 2), patch.object(catalogue_engine, 'load', wraps=catalogue_engine.load) as load:
+            for accommodation in self.accommodations[1:5]:
+                accommodation.price_per_month += 1
+                accommodation.save()
+            self.check(active='true', ordering='price_per_month')
+            load.assert_called_once()
+        self.assertEqual(CatalogueChange.objects.count(), 2)
+
+    def test_list_filters_and_orderings(self):
+        """Test the list's own filters and orderings, and invalid ones."""
+        data = json.loads(self.check(active='false')[0])
+        self.assertEqual([item['id'] for item in data['results']], [self.accommodations[0].pk])
+        data = json.loads(self.pages(True, active='true', ordering='-price_per_month', page_size=100)[0])
+        prices = [float(item['price_per_month']) for item in data['results']]
+        self.assertEqual(prices, sorted(prices, reverse=True))
+        for params, field in (({'ordering': 'nope'}, 'ordering'), ({'active': 'maybe'}, 'active'), ({'number_of_beds': 'x'}, 'number_of_beds')):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(field, response.data)
+
+    def test_check_catalogue_command(self):
+        """Test the consistency check passes and reports the memory use."""
+        out = io.StringIO()
+        call_command('check_catalogue', '--pages', '2', stdout=out)
+        self.assertIn('Loaded 13 active accommodations', out.getvalue())
+        self.assertIn('MiB per 100k rows', out.getvalue())
+        self.assertIn('Rows: 0 difference(s)', out.getvalue())
+        self.assertIn(', 0 differ', out.getvalue())
+
+
+@patch('basic.models.geocode', side_effect=lambda address: SPATIAL_BUILDINGS[address])
+class ConditionalGetTests(TestCase):
+    """Tests for ETag / Last-Modified stamps, 304 responses and the response cache."""
+
+    # Offered since before the past stays the tests book
+    offered = {'availability_start': datetime.date.today() - datetime.timedelta(days=60)}
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['default'].clear()
+        self.member = Member.objects.create(name='Etag Tester', contact='1', institute='HKU', email='e@test.com')
+
+    def test_unchanged_list_is_not_modified(self, mock_geocode):
+        """Test a repeated list request gets a 304 after only the version lookup."""
+        create_accommodation(building_name='Central Point', **self.offered)
+        url = reverse('accommodation-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        # Another representation of the same collection has its own tag
+        response = self.client.get(url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_writes_change_the_etag(self, mock_geocode):
+        """Test saves and deletes of accommodations, reservations and ratings invalidate their lists."""
+        accommodation = create_accommodation(building_name='Central Point', **self.offered)
+        urls = [reverse('accommodation-list'), reverse('reservation-list'), reverse('rating-list')]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+
+        reservation = Reservation.objects.create(
+            accommodation=accommodation, member=self.member, status='Signed',
+            start_date=datetime.date.today() - datetime.timedelta(days=30),
+            end_date=datetime.date.today() - datetime.timedelta(days=1),
+        )
+        self.assertEqual(self.client.get(urls[0], HTTP_IF_NONE_MATCH=etags[urls[0]]).status_code, 304)
+        response = self.client.get(urls[1], HTTP_IF_NONE_MATCH=etags[urls[1]])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+        rating = Rating.objects.create(accommodation=accommodation, member=self.member, rating=4)
+        response = self.client.get(urls[2], HTTP_IF_NONE_MATCH=etags[urls[2]])
+        self.assertEqual(response.status_code, 200)
+        etags[urls[2]] = response['ETag']
+        rating.delete()
+        response = self.client.get(urls[2], HTTP_IF_NONE_MATCH=etags[urls[2]])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+        accommodation.price_per_month = 6000
+        accommodation.save()
+        response = self.client.get(urls[0], HTTP_IF_NONE_MATCH=etags[urls[0]])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['price_per_month'], '6000.00')
+
+    def test_detail_depends_on_its_own_object(self, mock_geocode):
+        """Test a detail ETag survives writes to other objects but not to its own."""
+        accommodation = create_accommodation(building_name='Central Point', **self.offered)
+        other = create_accommodation(building_name='Sha Tin Point', **self.offered)
+        url = reverse('accommodation-detail', args=[accommodation.pk])
+        etag = self.client.get(url)['ETag']
+
+        other.active = False
+        other.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(reverse('accommodation-detail', args=[f'0{accommodation.pk}']), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        accommodation.active = False
+        accommodation.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['active'])
+
+        # Moving a campus rewrites a distance column of every accommodation
+        etag = response['ETag']
+        campus = Campus.objects.get(code='HKU')
+        campus.latitude += 0.01
+        campus.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bulk_writes_change_the_etag(self, mock_geocode):
+        """Test bulk imports and the geocode worker, which bypass post_save, still invalidate."""
+        url = reverse('accommodation-list')
+        etag = self.client.get(url)['ETag']
+        rows = [{
+            'flat_number': '1A', 'floor_number': 1, 'building_name': 'Central Point',
+            'availability_start': '2025-09-01', 'availability_end': '2026-08-31',
+            'type_of_accommodation': 'Single', 'price_per_month': '5000.00', 'managed_by': 'Bulk',
+        }]
+        with patch('basic.ingest.geocode_many', return_value={'central point': SPATIAL_BUILDINGS['Central Point']}):
+            self.assertEqual(self.client.post(reverse('accommodation-bulk-import'), rows, format='json').status_code, 201)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+        accommodation = Accommodation.objects.get()
+        job = GeocodeJob.objects.create(accommodation=accommodation, building_name=accommodation.building_name)
+        detail = reverse('accommodation-detail', args=[accommodation.pk])
+        etag = self.client.get(detail)['ETag']
+        _resolve(job, (22.3, 114.2), list(Campus.objects.all()))
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_repeated_requests_are_served_from_cache(self, mock_geocode):
+        """Test an unconditional repeat is answered from the response cache."""
+        create_accommodation(building_name='Central Point', **self.offered)
+        url = reverse('accommodation-list')
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        # The browsable API is neither stamped nor cached
+        response = self.client.get(url, HTTP_ACCEPT='text/html')
+        self.assertNotIn('ETag', response)
+
+
 # Need to mock external calls for Accommodation save within Reservation tests too
-@patch('basic.models.googlemaps.Client')
-@patch('basic.models.requests.get')
-@patch('basic.models.pyproj.Transformer')
+@patch('basic.geocoding.requests.get')
+@patch('basic.geocoding.get_transformer')
 class ReservationModelTests(TestCase):
     """Tests for the Reservation model."""
 
@@ -156,11 +1944,11 @@ class ReservationModelTests(TestCase):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = [{'x': 833500, 'y': 816500}]
-        requests_get_patcher = patch('basic.models.requests.get', return_value=mock_response)
-        transformer_patcher = patch('basic.models.pyproj.Transformer')
+        requests_get_patcher = patch('basic.geocoding.requests.get', return_value=mock_response)
+        transformer_patcher = patch('basic.geocoding.get_transformer')
         self.mock_requests_get = requests_get_patcher.start()
         self.mock_transformer = transformer_patcher.start()
-        self.mock_transformer_instance = self.mock_transformer.from_crs.return_value
+        self.mock_transformer_instance = self.mock_transformer.return_value
         self.mock_transformer_instance.transform.return_value = (114.1365621, 22.2830891)
 
         self.member = Member.objects.create(name='Res Member', contact='333', institute='HKU', email='res@test.com')
@@ -178,7 +1966,7 @@ class ReservationModelTests(TestCase):
         transformer_patcher.stop()
 
 
-    def test_reservation_creation(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_reservation_creation(self, mock_transformer, mock_requests_get):
         """Test creating a Reservation instance."""
         reservation = Reservation.objects.create(
             accommodation=self.accommodation,
@@ -196,7 +1984,7 @@ class ReservationModelTests(TestCase):
             f"Reservation for {self.accommodation} by {self.member} ({self.start_date} to {self.end_date})"
         )
 
-    def test_reservation_update(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_reservation_update(self, mock_transformer, mock_requests_get):
         """Test updating a Reservation instance."""
         reservation = Reservation.objects.create(
             accommodation=self.accommodation, member=self.member,
@@ -207,7 +1995,7 @@ class ReservationModelTests(TestCase):
         updated_reservation = Reservation.objects.get(pk=reservation.pk)
         self.assertEqual(updated_reservation.status, 'Signed')
 
-    def test_reservation_deletion(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_reservation_deletion(self, mock_transformer, mock_requests_get):
         """Test deleting a Reservation instance."""
         reservation = Reservation.objects.create(
             accommodation=self.accommodation, member=self.member,
@@ -218,7 +2006,7 @@ class ReservationModelTests(TestCase):
         with self.assertRaises(Reservation.DoesNotExist):
             Reservation.objects.get(pk=reservation_id)
 
-    def test_reservation_clean_dates(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_reservation_clean_dates(self, mock_transformer, mock_requests_get):
         """Test validation preventing end_date before start_date."""
         with self.assertRaisesRegex(ValidationError, "End date cannot be before start date."):
             Reservation(
@@ -226,7 +2014,7 @@ class ReservationModelTests(TestCase):
                 start_date=self.end_date, end_date=self.start_date, status='Not Signed'
             ).full_clean()
 
-    def test_reservation_clean_overlap(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_reservation_clean_overlap(self, mock_transformer, mock_requests_get):
         """Test validation preventing overlapping reservations."""
         Reservation.objects.create(
             accommodation=self.accommodation, member=self.member,
@@ -253,8 +2041,23 @@ class ReservationModelTests(TestCase):
         except ValidationError as e:
             self.fail(f"Non-overlapping reservation raised ValidationError: {e}")
 
+    def test_reservation_api_rejects_overlap(self, mock_transformer, mock_requests_get):
+        """Test a booking for taken dates is a 400 and is not stored."""
+        client = APIClient()
+        data = {
+            'accommodation': self.accommodation.pk, 'member': self.member.pk,
+            'start_date': self.start_date, 'end_date': self.end_date, 'status': 'Not Signed',
+        }
+        self.assertEqual(client.post(reverse('reservation-list'), data, format='json').status_code, 201)
+        response = client.post(reverse('reservation-list'), {
+            **data, 'start_date': self.start_date + datetime.timedelta(days=5), 'end_date': self.end_date + datetime.timedelta(days=5),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("already reserved during the period", response.data['non_field_errors'][0])
+        self.assertEqual(Reservation.objects.count(), 1)
 
-    def test_reservation_clean_inactive_signed(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+
+    def test_reservation_clean_inactive_signed(self, mock_transformer, mock_requests_get):
         """Test validation preventing inactive status for signed contracts."""
         with self.assertRaisesRegex(ValidationError, "cannot be set to inactive"):
             Reservation(
@@ -273,45 +2076,81 @@ class ReservationModelTests(TestCase):
         except ValidationError as e:
             self.fail(f"Valid active signed reservation raised ValidationError: {e}")
 
-    @patch('basic.models.send_mail') # Mock send_mail specifically for this test
-    def test_reservation_save_email_notification(self, mock_send_mail, mock_transformer, mock_requests_get, mock_gmaps_client):
-        """Test email notification is sent when active status changes."""
+    def test_reservation_save_email_notification(self, mock_transformer, mock_requests_get):
+        """Test an email is queued when active status changes and sent by the worker."""
         # Create initial reservation
         reservation = Reservation.objects.create(
             accommodation=self.accommodation, member=self.member,
             start_date=self.start_date, end_date=self.end_date,
             status='Not Signed', active=True
         )
-        mock_send_mail.assert_not_called() # No email on creation
+        self.assertFalse(NotificationOutbox.objects.exists()) # No email on creation
 
         # Update active status to False
         reservation.active = False
         reservation.save()
-        mock_send_mail.assert_called_once() # Email should be sent
-        args, kwargs = mock_send_mail.call_args
-        self.assertEqual(args[0], 'Your Reservation Status Has Changed') # Subject
-        self.assertIn('updated to: Inactive', args[1]) # Message content
-        self.assertEqual(args[3], [self.member.email]) # Recipient list
-
-        # Reset mock and update active status back to True
-        mock_send_mail.reset_mock()
+        self.assertEqual(len(mail.outbox), 0) # Queued, not sent during save
+        queued = NotificationOutbox.objects.get()
+        self.assertEqual(queued.subject, 'Your Reservation Status Has Changed')
+        self.assertIn('updated to: Inactive', queued.body)
+        self.assertEqual(queued.recipient, self.member.email)
+
+        # Update active status back to True
         reservation.active = True
         reservation.save()
-        mock_send_mail.assert_called_once() # Email should be sent again
-        args, kwargs = mock_send_mail.call_args
-        self.assertIn('updated to: Active', args[1]) # Message content
+        self.assertIn('updated to: Active', NotificationOutbox.objects.latest('pk').body)
 
-        # Reset mock and save without changing active status
-        mock_send_mail.reset_mock()
+        # Save without changing active status
         reservation.status = 'Signed' # Change something else
         reservation.save()
-        mock_send_mail.assert_not_called() # No email if active status didn't change
+        self.assertEqual(NotificationOutbox.objects.count(), 2) # No email if active status didn't change
+
+        self.assertEqual(send_queued_emails(), {'sent': 2, 'retried': 0, 'failed': 0})
+        self.assertEqual([message.to for message in mail.outbox], [[self.member.email]] * 2)
+        self.assertIn('updated to: Inactive', mail.outbox[0].body)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_rolled_back_save_queues_nothing(self, mock_transformer, mock_requests_get):
+        """Test the outbox row is part of the reservation's transaction."""
+        reservation = Reservation.objects.create(
+            accommodation=self.accommodation, member=self.member,
+            start_date=self.start_date, end_date=self.end_date, status='Not Signed'
+        )
+        reservation.active = False
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                reservation.save()
+                raise RuntimeError
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    @override_settings(NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_outbox_retries_then_dead_letters(self, mock_transformer, mock_requests_get):
+        """Test failed sends back off, are dead-lettered, and share one connection per batch."""
+        queue_email('Hello', 'Body', ['a@test.com', 'b@test.com', 'c@test.com'])
+        with patch('basic.notifications.get_connection', wraps=get_connection) as mock_connection:
+            self.assertEqual(send_queued_emails(), {'sent': 3, 'retried': 0, 'failed': 0})
+        mock_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+
+        queue_email('Hello', 'Body', ['d@test.com'])
+        with patch('django.core.mail.EmailMessage.send', side_effect=OSError('Connection refused')):
+            self.assertEqual(send_queued_emails(), {'sent': 0, 'retried': 1, 'failed': 0})
+            queued = NotificationOutbox.objects.get()
+            self.assertGreater(queued.next_attempt_at, timezone.now())
+            self.assertEqual(send_queued_emails(), {'sent': 0, 'retried': 0, 'failed': 0}) # Not due yet
+
+            NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(send_queued_emails(), {'sent': 0, 'retried': 0, 'failed': 1})
+        queued.refresh_from_db()
+        self.assertIsNone(queued.next_attempt_at)
+        self.assertEqual(queued.attempts, 2)
+        self.assertIn('Connection refused', queued.last_error)
+        self.assertEqual(len(mail.outbox), 3)
 
 
 # Need to mock external calls for Accommodation save within Rating tests too
-@patch('basic.models.googlemaps.Client')
-@patch('basic.models.requests.get')
-@patch('basic.models.pyproj.Transformer')
+@patch('basic.geocoding.requests.get')
+@patch('basic.geocoding.get_transformer')
 class RatingModelTests(TestCase):
     """Tests for the Rating model."""
 
@@ -321,11 +2160,11 @@ class RatingModelTests(TestCase):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = [{'x': 833500, 'y': 816500}]
-        requests_get_patcher = patch('basic.models.requests.get', return_value=mock_response)
-        transformer_patcher = patch('basic.models.pyproj.Transformer')
+        requests_get_patcher = patch('basic.geocoding.requests.get', return_value=mock_response)
+        transformer_patcher = patch('basic.geocoding.get_transformer')
         self.mock_requests_get = requests_get_patcher.start()
         self.mock_transformer = transformer_patcher.start()
-        self.mock_transformer_instance = self.mock_transformer.from_crs.return_value
+        self.mock_transformer_instance = self.mock_transformer.return_value
         self.mock_transformer_instance.transform.return_value = (114.1365621, 22.2830891)
 
         self.member = Member.objects.create(name='Rating Member', contact='444', institute='CUHK', email='rating@test.com')
@@ -358,7 +2197,7 @@ class RatingModelTests(TestCase):
         requests_get_patcher.stop()
         transformer_patcher.stop()
 
-    def test_rating_creation_valid(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_rating_creation_valid(self, mock_transformer, mock_requests_get):
         """Test creating a valid Rating instance after reservation ended."""
         rating = Rating(
             accommodation=self.accommodation,
@@ -376,7 +2215,7 @@ class RatingModelTests(TestCase):
             f"Rating for {self.accommodation} by {self.member}: 5"
         )
 
-    def test_rating_update(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_rating_update(self, mock_transformer, mock_requests_get):
         """Test updating a Rating instance."""
         rating = Rating.objects.create(
             accommodation=self.accommodation, member=self.member, rating=4
@@ -391,7 +2230,7 @@ class RatingModelTests(TestCase):
         self.assertEqual(updated_rating.comment, "Updated comment")
         self.assertFalse(updated_rating.active)
 
-    def test_rating_deletion(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_rating_deletion(self, mock_transformer, mock_requests_get):
         """Test deleting a Rating instance."""
         rating = Rating.objects.create(
             accommodation=self.accommodation, member=self.member, rating=5
@@ -401,7 +2240,7 @@ class RatingModelTests(TestCase):
         with self.assertRaises(Rating.DoesNotExist):
             Rating.objects.get(pk=rating_id)
 
-    def test_rating_clean_invalid_period(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_rating_clean_invalid_period(self, mock_transformer, mock_requests_get):
         """Test validation preventing rating before reservation ends."""
         # Create a member and accommodation without a *completed* reservation
         new_member = Member.objects.create(name='New Member', contact='555', email='new@test.com', institute='HKUST')
@@ -429,7 +2268,7 @@ class RatingModelTests(TestCase):
             ).full_clean()
 
 
-    def test_rating_clean_invalid_value(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_rating_clean_invalid_value(self, mock_transformer, mock_requests_get):
         """Test validation for rating value (1-5)."""
         with self.assertRaisesRegex(ValidationError, "Rating must be between 1 and 5."):
             Rating(
@@ -447,7 +2286,7 @@ class RatingModelTests(TestCase):
         except ValidationError as e:
             self.fail(f"Valid rating raised ValidationError: {e}")
 
-    def test_rating_unique_together(self, mock_transformer, mock_requests_get, mock_gmaps_client):
+    def test_rating_unique_together(self, mock_transformer, mock_requests_get):
         """Test unique constraint for (accommodation, member)."""
         # Create the first rating
         Rating.objects.create(
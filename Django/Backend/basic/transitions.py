@@ -0,0 +1,120 @@
+"""
+Bulk status changes of reservations.
+
+bulk_transition() changes `active` and/or `status` of many reservations at
+once. Reservation.save() would run full_clean(), an overlap query and an
+email per row; here the rules are checked with a few set-wise queries, the
+change is one UPDATE, and every member gets one digest email (queued in the
+notification outbox) listing all of their reservations that changed.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .notifications import queue_emails
+from .occupancy import bookings_key
+from .versions import bump, bump_objects
+
+
+class TransitionReport:
+    """
+    Outcome of a bulk transition, returned by the bulk_status endpoint.
+    """
+
+    def __init__(self):
+        self.matched = 0
+        self.updated = 0
+        self.notified = 0 # Members sent a digest
+
+    def as_dict(self):
+        return {'matched': self.matched, 'updated': self.updated, 'notified': self.notified}
+
+
+def bulk_transition(reservations, active=None, status=None):
+    """
+    Set active and/or status on every reservation in the queryset. Raises
+    ValidationError, changing nothing, if any row would break the rules of
+    Reservation.clean().
+    """
+    from .models import Accommodation, Reservation
+
+    values = {name: value for name, value in (('active', active), ('status', status)) if value is not None}
+    report = TransitionReport()
+    with transaction.atomic():
+        selected = Reservation.objects.filter(pk__in=reservations.values('pk'))
+        accommodation_ids = set(selected.values_list('accommodation', flat=True))
+        # The same per-accommodation locks as Reservation.save(), see its comment
+        list(Accommodation.objects.select_for_update().filter(pk__in=accommodation_ids).values_list('pk'))
+
+        report.matched = selected.count()
+        # Signed contracts cannot be inactive: check the resulting combination of every row
+        if status == 'Signed' and active is False:
+            invalid = selected
+        elif status == 'Signed':
+            invalid = selected.filter(active=False)
+        elif active is False and status is None:
+            invalid = selected.filter(status='Signed')
+        else:
+            invalid = selected.none()
+        invalid_ids = list(invalid.values_list('pk', flat=True)[:20])
+        if invalid_ids:
+            raise ValidationError(
+                f"A reservation with a signed contract cannot be set to inactive (reservations {', '.join(map(str, invalid_ids))})."
+            )
+
+        changed = selected.exclude(**values) # Rows already in the target state are left alone
+        toggled = []
+        if active is not None:
+            toggled = list(
+                selected.exclude(active=active).select_related('accommodation', 'member')
+                .order_by('member', 'start_date')
+            )
+        changed_ids = list(changed.values_list('pk', flat=True))
+        report.updated = Reservation.objects.filter(pk__in=changed_ids).update(**values)
+
+        if active:
+            # Reactivated reservations must not overlap each other or other active ones
+            overlapping = Reservation.objects.filter(pk__in=[reservation.pk for reservation in toggled]).filter(Exists(
+                Reservation.objects.filter(
+                    accommodation=OuterRef('accommodation'), active=True,
+                    start_date__lt=OuterRef('end_date'), end_date__gt=OuterRef('start_date'),
+                ).exclude(pk=OuterRef('pk'))
+            ))
+            overlapping_ids = list(overlapping.values_list('pk', flat=True)[:20])
+            if overlapping_ids:
+                raise ValidationError(
+                    f"Reactivating would overlap other active reservations (reservations {', '.join(map(str, overlapping_ids))})."
+                )
+
+        # update() sends no post_save, record the change for ETags and the occupancy calendar
+        bump_objects(Reservation, changed_ids)
+        if active is not None:
+            bump(*(bookings_key(pk) for pk in {reservation.accommodation_id for reservation in toggled}))
+        report.notified = queue_digests(toggled, active)
+    return report
+
+
+def queue_digests(reservations, active):
+    """
+    Queue one email per member listing their reservations whose active status changed.
+    """
+    new_status = "Active" if active else "Inactive"
+    emails = []
+    by_member = {}
+    for reservation in reservations:
+        by_member.setdefault(reservation.member_id, []).append(reservation)
+    for member_reservations in by_member.values():
+        member = member_reservations[0].member
+        lines = "\n".join(
+            f"- {reservation.accommodation} from {reservation.start_date} to {reservation.end_date}"
+            for reservation in member_reservations
+        )
+        message = (
+            f"Dear {member.name},\n\n"
+            f"The status of the following reservations has been updated to: {new_status}.\n\n"
+            f"{lines}\n\n"
+            f"Thank you,\nUniHaven Team"
+        )
+        emails.append(('Your Reservation Status Has Changed', message, [member.email]))
+    queue_emails(emails)
+    return len(emails)
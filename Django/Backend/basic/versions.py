@@ -0,0 +1,192 @@
+"""
+Version stamps for conditional GET requests.
+
+Every write to a model with stamps bumps two ResourceVersion rows through
+the post_save / post_delete receivers in signals.py: the object's own stamp
+('basic.accommodation:42') and its collection's ('basic.accommodation').
+Bulk writes skip the signals, so ingest, the geocode worker and the
+distance recomputation call bump_objects() or bump_all() themselves.
+bump_all() is for writes that may change any object: it bumps the
+collection and a model wide stamp ('basic.accommodation:*') that every
+object's ETag includes.
+
+ConditionalGetMixin turns the stamps a GET depends on into ETag and
+Last-Modified headers. When the client's If-None-Match / If-Modified-Since
+still match it answers 304 after one indexed lookup of the stamps.
+Otherwise the rendered body is looked up in the RESPONSE_CACHE cache under
+the ETag, and only on a miss does the view run. With several server
+processes point RESPONSE_CACHE at a shared backend (Redis, Memcached) so
+they all reuse each other's responses.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+DEFAULT_RESPONSE_CACHE_TIMEOUT = 300
+
+
+def collection_key(model):
+    return model._meta.label_lower
+
+
+def object_key(model, pk):
+    return f'{model._meta.label_lower}:{pk}'
+
+
+def generation_key(model):
+    return f'{model._meta.label_lower}:*'
+
+
+def bump(*keys):
+    """
+    Increment the stamps with these keys, creating missing ones. Two
+    queries however many keys there are.
+    """
+    from .models import ResourceVersion
+
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return
+    now = timezone.now()
+    # Create missing stamps first, so concurrent writers all end up incrementing
+    ResourceVersion.objects.bulk_create([ResourceVersion(key=key) for key in keys], ignore_conflicts=True)
+    ResourceVersion.objects.filter(key__in=keys).update(version=F('version') + 1, updated_at=now)
+
+
+def bump_objects(model, pks=()):
+    """
+    Record a write to these objects (none for pure inserts) and their collection.
+    """
+    bump(*(object_key(model, pk) for pk in pks), collection_key(model))
+
+
+def bump_all(model):
+    """
+    Record a write that may have changed every object of model.
+    """
+    bump(generation_key(model), collection_key(model))
+
+
+def current_stamps(keys, ensure=()):
+    """
+    Return the stamps for keys in order, None where there is none. Stamps in
+    ensure are created when missing, so an ETag always includes at least one
+    timestamp and never matches a response cached against another database.
+    """
+    from .models import ResourceVersion
+
+    stamps = {stamp.key: stamp for stamp in ResourceVersion.objects.filter(key__in=keys)}
+    missing = [key for key in ensure if key not in stamps]
+    if missing:
+        ResourceVersion.objects.bulk_create([ResourceVersion(key=key) for key in missing], ignore_conflicts=True)
+        stamps.update((stamp.key, stamp) for stamp in ResourceVersion.objects.filter(key__in=missing))
+    return [stamps.get(key) for key in keys]
+
+
+def response_cache():
+    alias = getattr(settings, 'RESPONSE_CACHE', 'default')
+    return caches[alias] if alias else None
+
+
+class _Respond(Exception):
+    """
+    Raised from initial() to answer without running the handler.
+    """
+
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    Viewset mixin adding ETag / Last-Modified to JSON GET responses, answering
+    304 to matching conditional requests and serving repeated requests from
+    the response cache. Lists depend on the collections of version_models
+    (default: the queryset's model), details on their object's stamp.
+    """
+    version_models = None
+
+    def get_version_models(self):
+        return self.version_models or (self.queryset.model,)
+
+    def get_version_keys(self):
+        """
+        Return (stamp keys this response depends on, keys that must exist).
+        """
+        model = self.queryset.model
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        if lookup in self.kwargs:
+            try:
+                # '05' and '5' are the same object
+                pk = model._meta.pk.to_python(self.kwargs[lookup])
+            except ValidationError:
+                return [], [] # Not found anyway
+            generation = generation_key(model)
+            return [object_key(model, pk), generation], [generation]
+        keys = [collection_key(model) for model in self.get_version_models()]
+        return keys, keys
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = None
+        self.version_stamps = {} # Key -> stamp, for views that keep their own caches current with them
+        # The browsable API renders forms and tokens per user, only JSON is stamped
+        if request.method not in ('GET', 'HEAD') or request.accepted_renderer.format != 'json':
+            return
+        keys, ensure = self.get_version_keys()
+        if not keys:
+            return
+        stamps = current_stamps(keys, ensure)
+        self.version_stamps = dict(zip(keys, stamps))
+        digest = hashlib.sha1(repr([
+            (key, stamp.version, stamp.updated_at.isoformat()) if stamp else (key,)
+            for key, stamp in zip(keys, stamps)
+        ]).encode())
+        # Representations differ per URL (filters, cursors, host in the links) and media type
+        digest.update(request.build_absolute_uri().encode())
+        digest.update(request.accepted_media_type.encode())
+        etag = f'"{digest.hexdigest()}"'
+        last_modified = max((int(stamp.updated_at.timestamp()) for stamp in stamps if stamp), default=None)
+        self.validators = (etag, last_modified)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            cache = response_cache()
+            cached = cache.get(f'response:{etag}') if cache is not None else None
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+        if response is not None:
+            self.add_validators(response)
+            raise _Respond(response)
+
+    def add_validators(self, response):
+        etag, last_modified = self.validators
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'no-cache' # Stored, but revalidated on every use
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _Respond):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'validators', None) and isinstance(response, Response) and response.status_code == 200:
+            self.add_validators(response)
+            cache = response_cache()
+            if cache is not None:
+                response.render()
+                timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', DEFAULT_RESPONSE_CACHE_TIMEOUT)
+                cache.set(f'response:{self.validators[0]}', (response.content, response['Content-Type']), timeout)
+        return response
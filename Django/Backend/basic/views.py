@@ -1,48 +1,492 @@
-from rest_framework import viewsets, filters
-from .models import Accommodation, Member, Reservation, Rating
-from .serializers import AccommodationSerializer, MemberSerializer, ReservationSerializer, RatingSerializer
+from rest_framework import viewsets, filters, status
+from .models import Accommodation, Member, Reservation, Rating, Campus
+from .serializers import AccommodationSerializer, BulkStatusSerializer, FacetFilterSerializer, ListFilterSerializer, MemberSerializer, RecommendationSerializer, ReservationSerializer, RatingSerializer, CampusSerializer
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+from rest_framework.settings import api_settings
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError as DjangoValidationError
+from rest_framework.permissions import SAFE_METHODS
+from django.db.models import Exists, F, OuterRef
+from django.utils.dateparse import parse_date
+from .ingest import READERS, ingest_accommodations, ingest_ratings
+from . import catalogue, spatial
+from .distances import LEGACY_DISTANCE_FIELDS, round_sig
+from .fastpath import FastListMixin, ValuesSerializer
+from .versions import ConditionalGetMixin, collection_key
+from .occupancy import day_bitmap, month_bitmap, occupancy
+from .transitions import bulk_transition
+from .search import FullTextSearchFilter, fts_available, index_for, token_terms
+from .autocomplete import MAX_CACHED_SUGGESTIONS, autocomplete as building_names
+from .facets import FacetedSearch
+from .recommend import CRITERIA, recommender
 
-class AccommodationViewSet(viewsets.ModelViewSet):
+def api_validation_error(error):
+    """
+    Turn a model ValidationError (e.g. from Reservation.clean()) into a 400.
+    """
+    detail = as_serializer_error(error)
+    if NON_FIELD_ERRORS in detail:
+        detail[api_settings.NON_FIELD_ERRORS_KEY] = detail.pop(NON_FIELD_ERRORS)
+    return ValidationError(detail)
+
+# Limits of the calendar action
+MAX_CALENDAR_DAYS = 731
+MAX_CALENDAR_ACCOMMODATIONS = 500
+MAX_RATING_COUNT = 2 ** 31 - 1 # Largest rating_count (PositiveIntegerField) min_count is clamped to
+
+# Content types accepted by the bulk import endpoints, mapped to ingest readers
+BULK_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+}
+
+def bulk_rows(request, expected):
+    """
+    Rows of a bulk import request: a JSON list, a CSV or JSON Lines body, or
+    a multipart upload in a 'file' field. expected names the rows in the
+    error for any other body.
+    """
+    content_type = request.content_type.split(';')[0].strip()
+    if content_type in BULK_CONTENT_TYPES:
+        # Read the raw body line by line instead of parsing it all at once
+        stream = request.stream # None for an empty body
+        lines = (line.decode('utf-8') for line in iter(stream.readline, b'')) if stream is not None else ()
+        return READERS[BULK_CONTENT_TYPES[content_type]](lines)
+    if 'file' in request.FILES:
+        upload = request.FILES['file']
+        input_format = request.query_params.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        if input_format not in READERS:
+            raise ValidationError({'detail': "Upload a .csv or .jsonl file."})
+        return READERS[input_format](line.decode('utf-8') for line in upload)
+    if isinstance(request.data, list):
+        return request.data
+    raise ValidationError({'detail': f"Expected a list of {expected}."})
+
+class AccommodationViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows accommodations to be viewed or edited.
     """
     queryset = Accommodation.objects.all().order_by('building_name', 'floor_number', 'flat_number')
     serializer_class = AccommodationSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ['building_name', 'managed_by']
+    keyset_ordering = ('building_name', 'floor_number', 'flat_number', 'pk') # Pagination key, see accom_listing_idx
+    # ?ordering= of the list -> its keyset ordering, see accom_price_idx and accom_start_idx
+    list_orderings = {
+        'price_per_month': ('price_per_month', 'pk'),
+        '-price_per_month': ('-price_per_month', '-pk'),
+        'availability_start': ('availability_start', 'pk'),
+        '-availability_start': ('-availability_start', '-pk'),
+    }
+    # Actions that return AccommodationSerializer.LIST_FIELDS unless ?fields= says otherwise
+    list_actions = ('list', 'ranked_by_distance', 'ranked_by_rating', 'within_radius', 'nearest', 'available', 'faceted_search', 'recommend')
+    version_models = (Accommodation, Campus) # Lists rank and search by campus too
+
+    def get_version_models(self):
+        if self.action in ('available', 'calendar'):
+            return (*self.version_models, Reservation)
+        return self.version_models
+
+    def get_version_keys(self):
+        if self.action == 'autocomplete':
+            return [], [] # Answered from memory, a stamp lookup would cost more than the answer
+        return super().get_version_keys()
+
+    def get_sparse_fields(self):
+        """
+        Field names selected by ?fields= and ?omit= (comma separated), or None
+        for every field. List actions start from the compact LIST_FIELDS.
+        """
+        if hasattr(self, '_sparse_fields'):
+            return self._sparse_fields
+        params = self.request.query_params if self.request.method in SAFE_METHODS else {}
+        available = list(self.get_serializer_class()().fields)
+        fields = None
+        if params.get('fields'):
+            fields = self.parse_field_list(params['fields'], 'fields', available)
+        elif self.action in self.list_actions:
+            fields = self.get_serializer_class().LIST_FIELDS
+        if params.get('omit'):
+            omit = self.parse_field_list(params['omit'], 'omit', available)
+            fields = [name for name in (fields or available) if name not in omit]
+        self._sparse_fields = fields
+        return fields
+
+    def parse_field_list(self, value, param, available):
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ValidationError({param: f"Unknown field(s): {', '.join(unknown)}."})
+        return names
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        """
+        Only load the columns the response needs (plus the pagination key).
+        """
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            keys = [field.lstrip('-') for field in self.keyset_ordering]
+            queryset = queryset.only(*fields, *keys)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Filtered like faceted_search (without the counts) and by ?active=,
+        ordered by ?ordering= (see list_orderings) or else by building. With
+        ?search= and ?ordering=relevance the best matches (by bm25 in the
+        search index) come first instead. With CATALOGUE_ENGINE on,
+        ?active=true lists are read from memory (see catalogue.py).
+        """
+        serializer = ListFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = serializer.validated_data
+        search_terms = FullTextSearchFilter().get_search_terms(request)
+        terms = token_terms(search_terms)
+        if filters.get('ordering') == 'relevance' and terms and fts_available():
+            queryset = self.filter_list(self.filter_queryset(self.get_queryset()), filters).annotate(
+                relevance=index_for(Accommodation).relevance(terms),
+            )
+            return self.paginated_response(queryset, ordering=('relevance', 'pk'))
+        ordering = self.list_orderings.get(filters.get('ordering'), self.keyset_ordering)
+        if catalogue.enabled() and not search_terms:
+            response = self.catalogue_response(filters, ordering)
+            if response is not None:
+                return response
+        return self.paginated_response(self.filter_list(self.filter_queryset(self.get_queryset()), filters), ordering=ordering)
+
+    def filter_list(self, queryset, filters):
+        if filters.get('active') is not None:
+            queryset = queryset.filter(active=filters['active'])
+        return FacetedSearch(queryset, filters).results()
+
+    def catalogue_response(self, filters, ordering):
+        """
+        The list page read from the in-memory catalogue, or None when it
+        cannot answer this request exactly.
+        """
+        serializer = self.get_serializer()
+        if self.paginator is None or not self.use_values_path(serializer):
+            return None
+        stamps = getattr(self, 'version_stamps', {})
+        snapshot = catalogue.engine.current(stamps.get(collection_key(Accommodation)))
+        values_serializer = ValuesSerializer(serializer)
+        names = [*values_serializer.sources, *(field.lstrip('-') for field in ordering)]
+        try:
+            mask = snapshot.matching(filters)
+            rows = self.paginator.paginate(
+                lambda ordering, position, limit: snapshot.fetch(mask, names, ordering, position, limit),
+                self.request, view=self, ordering=ordering,
+            )
+        except catalogue.Unsupported:
+            return None
+        return self.get_paginated_response(values_serializer.to_representation(rows))
 
     @action(detail=False, methods=['get'])
     def ranked_by_distance(self, request):
         """
-        Custom action to get accommodations ranked by distance to campus.
+        Custom action to get active accommodations ranked by distance to
+        ?campus= (a campus code, default HKU), one cursor paginated page at a time.
         """
+        campus_code = request.query_params.get('campus', 'HKU')
         reversed = request.query_params.get('reverse', 'false').lower() == 'true'
-        order = '-distance_to_campus' if reversed else 'distance_to_campus'
-        queryset = self.queryset.order_by(order)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.get_queryset().filter(active=True)
+        if campus_code in LEGACY_DISTANCE_FIELDS:
+            # The original campuses have their own indexed column
+            field = LEGACY_DISTANCE_FIELDS[campus_code]
+            queryset = queryset.filter(**{f'{field}__isnull': False}).annotate(distance=F(field), ranked_id=F('pk'))
+        else:
+            campus = Campus.objects.filter(code=campus_code).first()
+            if campus is None:
+                raise ValidationError({'campus': f"Unknown campus '{campus_code}'."})
+            # Both keys come from CampusDistance so its (campus, distance, accommodation) index covers the ordering
+            queryset = queryset.filter(campus_distances__campus=campus).annotate(
+                distance=F('campus_distances__distance'),
+                ranked_id=F('campus_distances__accommodation'),
+            )
+
+        ordering = ('-distance', '-ranked_id') if reversed else ('distance', 'ranked_id')
+        return self.paginated_response(queryset, ordering=ordering, extra=('distance',))
+
+    @action(detail=False, methods=['get'])
+    def ranked_by_rating(self, request):
+        """
+        Custom action to get active accommodations ranked by average rating,
+        highest first (?reverse=true for lowest first), ties going to the most
+        rated. Only accommodations with at least ?min_count= active ratings
+        (default 1) are included. Cursor paginated, see accom_rating_idx.
+        """
+        reversed = request.query_params.get('reverse', 'false').lower() == 'true'
+        min_count = self.get_int_param(request, 'min_count', 1, MAX_RATING_COUNT)
+        # min_count >= 1 also keeps out the NULL averages keyset pagination cannot order
+        queryset = self.get_queryset().filter(active=True, rating_count__gte=min_count)
+        ordering = ('rating_avg', 'rating_count', 'pk') if reversed else ('-rating_avg', '-rating_count', '-pk')
+        return self.paginated_response(queryset, ordering=ordering)
+
+    @action(detail=False, methods=['get'])
+    def available(self, request):
+        """
+        Custom action to get active accommodations free for the whole period
+        ?start= to ?end= (YYYY-MM-DD): offered for it and without an
+        overlapping active reservation. Supports ?search= and pagination.
+        """
+        start, end = self.get_date_param(request, 'start'), self.get_date_param(request, 'end')
+        if start > end:
+            raise ValidationError({'end': "Cannot be before start."})
+        # Same overlap rule as Reservation.clean(), see reservation_overlap_idx
+        booked = Reservation.objects.filter(
+            accommodation=OuterRef('pk'), active=True, start_date__lt=end, end_date__gt=start,
+        )
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            active=True, availability_start__lte=start, availability_end__gte=end,
+        ).filter(~Exists(booked))
+        return self.paginated_response(queryset)
+
+    @action(detail=False, methods=['get'])
+    def faceted_search(self, request):
+        """
+        Custom action to filter active accommodations by price range
+        (?min_price=, ?max_price=), ?number_of_beds=, ?no_of_bedrooms=,
+        ?type_of_accommodation=, ?managed_by= (repeat for several values) and
+        ?max_distance= km from ?campus= (default HKU). Returns a page of the
+        matches, their total and how many results each option of each filter
+        would give (see facets.py). Supports ?search= and pagination.
+        """
+        serializer = FacetFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        search = FacetedSearch(self.filter_queryset(self.get_queryset()).filter(active=True), serializer.validated_data)
+        response = self.paginated_response(search.results())
+        response.data['count'], response.data['facets'] = search.counts()
+        return response
+
+    @action(detail=False, methods=['get'])
+    def recommend(self, request):
+        """
+        Custom action to get the ?k= (default 10, max 100) active
+        accommodations best for a student, scored on price, distance to
+        ?campus= (default HKU), rating and bedrooms weighted by ?price_weight=,
+        ?distance_weight=, ?rating_weight= and ?bedrooms_weight= (default 1
+        each). Best first, each with its score from 0 to 1, computed in
+        memory (see recommend.py).
+        """
+        serializer = RecommendationSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        weights = {name: params[f'{name}_weight'] for name in CRITERIA}
+        snapshot = recommender.current()
+        if params['campus'] not in snapshot.campuses:
+            raise ValidationError({'campus': f"Unknown campus '{params['campus']}'."})
+        found = snapshot.top(weights, params['campus'], params['k'])
+        accommodations = self.get_queryset().in_bulk([pk for pk, _ in found])
+        found = [(pk, score) for pk, score in found if pk in accommodations] # Unless deleted since
+        data = self.get_serializer([accommodations[pk] for pk, _ in found], many=True).data
+        for item, (_, score) in zip(data, found):
+            item['score'] = round(score, 4)
+        return Response(data)
 
-class MemberViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Custom action to suggest building names for the partial or misspelled
+        name in ?q=: names with a word starting with it first (most
+        accommodations first), then similar names. At most ?limit= (default
+        10, max 50) suggestions, answered from memory (see autocomplete.py).
+        """
+        limit = self.get_int_param(request, 'limit', 10, MAX_CACHED_SUGGESTIONS)
+        suggestions = building_names.suggest(request.query_params.get('q', ''), limit)
+        return Response({'results': [
+            {'building_name': name, 'accommodations': count} for name, count in suggestions
+        ]})
+
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Custom action to get occupancy bitmaps for the accommodations in ?ids=
+        (comma separated, at most 500) from ?start= to ?end= inclusive. With
+        ?resolution=day (default) each character is a day, with
+        ?resolution=month a month; '1' means booked by an active reservation.
+        """
+        start, end = self.get_date_param(request, 'start'), self.get_date_param(request, 'end')
+        if start > end:
+            raise ValidationError({'end': "Cannot be before start."})
+        if (end - start).days >= MAX_CALENDAR_DAYS:
+            raise ValidationError({'end': f"The range can be at most {MAX_CALENDAR_DAYS} days."})
+        resolution = request.query_params.get('resolution', 'day')
+        if resolution not in ('day', 'month'):
+            raise ValidationError({'resolution': "Must be 'day' or 'month'."})
+        try:
+            ids = [int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()]
+        except ValueError:
+            raise ValidationError({'ids': "Must be comma separated integers."})
+        if not 0 < len(ids) <= MAX_CALENDAR_ACCOMMODATIONS:
+            raise ValidationError({'ids': f"Give between 1 and {MAX_CALENDAR_ACCOMMODATIONS} accommodation ids."})
+
+        existing = set(Accommodation.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        ids = [pk for pk in dict.fromkeys(ids) if pk in existing]
+        bitmap = day_bitmap if resolution == 'day' else month_bitmap
+        intervals = occupancy.intervals(ids)
+        return Response({
+            'start': start, 'end': end, 'resolution': resolution,
+            'results': [{'accommodation': pk, 'occupancy': bitmap(intervals[pk], start, end)} for pk in ids],
+        })
+
+    def get_date_param(self, request, name):
+        value = request.query_params.get(name)
+        try:
+            date = parse_date(value) if value else None
+        except ValueError:
+            date = None
+        if date is None:
+            raise ValidationError({name: "Provide a date as YYYY-MM-DD."})
+        return date
+
+    def get_search_point(self, request):
+        """
+        Read the search point from ?latitude=&longitude= or ?campus=<code>.
+        """
+        campus_code = request.query_params.get('campus')
+        if campus_code:
+            campus = Campus.objects.filter(code=campus_code).first()
+            if campus is None:
+                raise ValidationError({'campus': f"Unknown campus '{campus_code}'."})
+            return campus.latitude, campus.longitude
+        try:
+            latitude = float(request.query_params['latitude'])
+            longitude = float(request.query_params['longitude'])
+        except (KeyError, ValueError):
+            raise ValidationError({'detail': "Provide numeric latitude and longitude, or a campus code."})
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValidationError({'detail': "Latitude or longitude out of range."})
+        return latitude, longitude
+
+    def get_int_param(self, request, name, default, maximum):
+        try:
+            value = int(request.query_params.get(name, default))
+        except ValueError:
+            raise ValidationError({name: "Must be an integer."})
+        return max(1, min(value, maximum))
+
+    def distance_response(self, found):
+        """
+        Serialize [(pk, distance)] in order, adding the distance (km) to each item.
+        """
+        accommodations = self.get_queryset().in_bulk([pk for pk, _ in found])
+        found = [(pk, distance) for pk, distance in found if pk in accommodations] # Unless deleted since
+        data = self.get_serializer([accommodations[pk] for pk, _ in found], many=True).data
+        for item, (_, distance) in zip(data, found):
+            item['distance'] = float(round_sig(distance))
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def within_radius(self, request):
+        """
+        Custom action to get active accommodations within ?radius= km (default 2)
+        of a point, closest first. Limited to ?limit= results (default 100, max 500).
+        """
+        latitude, longitude = self.get_search_point(request)
+        try:
+            radius = float(request.query_params.get('radius', 2))
+        except ValueError:
+            raise ValidationError({'radius': "Must be a number."})
+        if not (0 < radius <= spatial.MAX_SEARCH_RADIUS_KM):
+            raise ValidationError({'radius': f"Must be between 0 and {spatial.MAX_SEARCH_RADIUS_KM} km."})
+        limit = self.get_int_param(request, 'limit', 100, 500)
+        found = spatial.within_radius(Accommodation.objects.filter(active=True), latitude, longitude, radius, limit=limit)
+        return self.distance_response(found)
+
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        """
+        Custom action to get the ?k= (default 10, max 100) active accommodations
+        closest to a point, closest first.
+        """
+        latitude, longitude = self.get_search_point(request)
+        k = self.get_int_param(request, 'k', 10, 100)
+        found = spatial.nearest(Accommodation.objects.filter(active=True), latitude, longitude, k)
+        return self.distance_response(found)
+
+    @action(detail=False, methods=['post'])
+    def bulk_import(self, request):
+        """
+        Custom action to import many accommodations in one request.
+        Accepts a JSON list, a CSV (text/csv) or JSON Lines (application/x-ndjson)
+        body, or a multipart upload in a 'file' field. Rows that fail are
+        reported by row number and the rest are still imported.
+        """
+        report = ingest_accommodations(bulk_rows(request, 'accommodations'))
+        response_status = status.HTTP_201_CREATED if report.created else status.HTTP_400_BAD_REQUEST
+        return Response(report.as_dict(), status=response_status)
+
+class MemberViewSet(FastListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows members to be viewed or edited.
     """
     queryset = Member.objects.all().order_by('name')
     serializer_class = MemberSerializer
+    keyset_ordering = ('name', 'pk') # Pagination key, see member_name_idx
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'contact', 'institute']
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows reservations to be viewed or edited.
     """
     queryset = Reservation.objects.all().order_by('start_date')
     serializer_class = ReservationSerializer
+    keyset_ordering = ('start_date', 'pk') # Pagination key, see reservation_start_idx
+    version_models = (Reservation, Accommodation, Member) # Searched by building and member name
     # Add filtering capabilities if needed
     # filterset_fields = ['accommodation', 'member', 'status', 'start_date', 'end_date']
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ['accommodation__building_name', 'member__name', 'status']
+
+    def perform_create(self, serializer):
+        self.save_booking(serializer)
+
+    def perform_update(self, serializer):
+        self.save_booking(serializer)
+
+    def save_booking(self, serializer):
+        """
+        Save through Reservation.save(), which re-checks overlaps under a lock.
+        A booking that lost the race is a 400, not a server error.
+        """
+        try:
+            serializer.save()
+        except DjangoValidationError as e:
+            raise api_validation_error(e)
+
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        """
+        Custom action to set active and/or status on many reservations at once,
+        selected by ids and/or accommodation. All or nothing: if one
+        reservation breaks a rule nothing is changed. Members whose
+        reservations were (de)activated get one digest email each.
+        """
+        serializer = BulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        reservations = Reservation.objects.all()
+        if 'ids' in data:
+            reservations = reservations.filter(pk__in=data['ids'])
+        if 'accommodation' in data:
+            reservations = reservations.filter(accommodation=data['accommodation'])
+        try:
+            report = bulk_transition(reservations, active=data.get('active'), status=data.get('status'))
+        except DjangoValidationError as e:
+            raise api_validation_error(e)
+        return Response(report.as_dict())
+
     @action(detail=False, methods=['get'])
     def get_Unsigned_reservations(self, request):
         """
@@ -50,20 +494,21 @@ class ReservationViewSet(viewsets.ModelViewSet):
         """
         unsigned = request.query_params.get('unsigned', 'false').lower() == 'true'
         whether_signed = 'Signed' if unsigned else 'Not Signed'
-        queryset = self.queryset.filter(status=whether_signed).order_by('start_date')
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.queryset.filter(status=whether_signed)
+        return self.paginated_response(queryset) # By start date, see reservation_status_idx
 
-class RatingViewSet(viewsets.ModelViewSet):
+class RatingViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows ratings to be viewed or edited.
     """
     queryset = Rating.objects.all().order_by('-rating')
     serializer_class = RatingSerializer
+    keyset_ordering = ('-rating', '-pk') # Pagination key, see rating_value_idx
+    version_models = (Rating, Accommodation, Member) # Searched by building and member name
     # Add filtering capabilities if needed
     # filterset_fields = ['accommodation', 'member', 'rating']
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['accommodation__building_name', 'member__name', 'rating']
+    filter_backends = [FullTextSearchFilter]
+    search_fields = ['accommodation__building_name', 'member__name', 'rating', 'comment']
 
     # ranked_by_rating
     @action(detail=False, methods=['get'])
@@ -72,7 +517,27 @@ class RatingViewSet(viewsets.ModelViewSet):
         Custom action to get ratings ranked by rating value.
         """
         reverse = request.query_params.get('reverse', 'false').lower() == 'true'
-        order = 'rating' if reverse else '-rating'
-        queryset = self.queryset.order_by(order)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        ordering = ('rating', 'pk') if reverse else ('-rating', '-pk')
+        return self.paginated_response(self.queryset, ordering=ordering)
+
+    @action(detail=False, methods=['post'])
+    def bulk_import(self, request):
+        """
+        Custom action to import many ratings in one request, in the same
+        formats as the accommodation bulk_import. Eligibility and duplicates
+        are checked per batch instead of per rating; rows that fail are
+        reported by row number and the rest are still imported.
+        """
+        report = ingest_ratings(bulk_rows(request, 'ratings'))
+        response_status = status.HTTP_201_CREATED if report.created else status.HTTP_400_BAD_REQUEST
+        return Response(report.as_dict(), status=response_status)
+
+class CampusViewSet(FastListMixin, viewsets.ModelViewSet):
+    """
+    API endpoint that allows campuses to be viewed or edited.
+    Adding or moving a campus recomputes its distance to every accommodation.
+    """
+    queryset = Campus.objects.all().order_by('code')
+    serializer_class = CampusSerializer
+    keyset_ordering = ('code',) # Unique, so it is a complete key on its own
+    allow_count = True # A handful of rows, counting them is free